@@ -0,0 +1,183 @@
+"""Agent throughput on repeated queries, with and without the answer cache.
+
+Sends --queries queries drawn from a pool of --distinct questions, with
+popular questions repeating more often (Zipf-like), --concurrency at a
+time, through agent.AgentRuntime. It uses in-process servers, the fake
+Tavily API and the scripted chat model, whose model calls take a fixed
+time. The pool mixes news searches, weather lookups and calculations, so
+answers get the TTLs of different tools.
+
+For the cache off and on it reports throughput, latency (mean, p50, p95),
+model calls and upstream Tavily requests made, and the cache counters
+(hits, coalesced queries and agent runs). A final burst sends --burst
+copies of one new query at once, which the cache answers with one run.
+
+    python benchmarks/answer_cache.py
+    python benchmarks/answer_cache.py --queries 500 --distinct 50 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import pathlib
+import random
+import statistics
+import sys
+import time
+import urllib.request
+from typing import Any, Dict, List, Optional
+
+BENCHMARKS_DIR = pathlib.Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARKS_DIR.parent / "src"))
+sys.path.insert(0, str(BENCHMARKS_DIR))
+
+from fake_llm import ScriptedChatModel  # noqa: E402
+from fake_tavily import FakeTavilyConfig, FakeTavilyServer  # noqa: E402
+from langchain_core.callbacks import AsyncCallbackHandler  # noqa: E402
+
+from agent import SERVER_MODULES, AgentRuntime  # noqa: E402
+
+# Question templates and the tool calls the scripted model makes for them
+TEMPLATES = [
+    (
+        "Latest news about topic {index}?",
+        [{"name": "search_news", "args": {"query": "topic {index}"}}],
+    ),
+    (
+        "What's the weather in City{index}?",
+        [{"name": "get_weather", "args": {"location": "City{index}"}}],
+    ),
+    ("What is {index} * 17?", [{"name": "calculate", "args": {"expression": "{index} * 17"}}]),
+]
+
+class ModelCallCounter(AsyncCallbackHandler):
+    def __init__(self):
+        self.calls = 0
+
+    async def on_chat_model_start(self, serialized, messages, **kwargs: Any) -> None:
+        self.calls += 1
+
+def question(index: int):
+    query, calls = TEMPLATES[index % len(TEMPLATES)]
+    calls = json.loads(json.dumps(calls).replace("{index}", str(index)))
+    return query.format(index=index), [calls]
+
+def tavily_requests(tavily_url: str) -> int:
+    with urllib.request.urlopen(f"{tavily_url}/stats") as response:
+        return json.load(response)["requests"]
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+
+async def run_mode(cache: bool, tavily_url: str, args: argparse.Namespace) -> Dict[str, Any]:
+    os.environ["AGENT_ANSWER_CACHE_TTL"] = "600" if cache else "0"
+    rng = random.Random(args.seed)
+    # Zipf-like popularity: question i is picked with weight 1 / (i + 1)
+    weights = [1 / (index + 1) for index in range(args.distinct)]
+    picks = rng.choices(range(args.distinct), weights=weights, k=args.queries)
+    burst_index = args.distinct
+    script = dict(question(index) for index in range(args.distinct + 1))
+
+    counter = ModelCallCounter()
+    runtime = AgentRuntime(
+        os.environ["TAVILY_API_KEY"],
+        in_process=list(SERVER_MODULES),
+        model=ScriptedChatModel(script=script, latency=args.llm_latency),
+        max_concurrency=args.concurrency,
+    )
+    async with runtime:
+        runtime.callbacks.append(counter)
+        tavily_before = tavily_requests(tavily_url)
+        queue = list(picks)
+        latencies: List[float] = []
+
+        async def worker() -> None:
+            while queue:
+                query, _ = question(queue.pop())
+                started = time.perf_counter()
+                await runtime.ask(query)
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        model_calls = counter.calls
+        tavily = tavily_requests(tavily_url) - tavily_before
+
+        # Identical queries arriving together
+        runs_before = counter.calls
+        burst_query, _ = question(burst_index)
+        burst_started = time.perf_counter()
+        await asyncio.gather(*(runtime.ask(burst_query) for _ in range(args.burst)))
+        burst = {
+            "queries": args.burst,
+            "elapsed_ms": round((time.perf_counter() - burst_started) * 1000, 1),
+            "model_calls": counter.calls - runs_before,
+        }
+        stats = runtime.answers.snapshot().model_dump() if runtime.answers is not None else None
+
+    report: Dict[str, Any] = {
+        "queries_per_second": round(args.queries / elapsed, 1),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 1),
+        "p50_ms": percentile(latencies, 0.5),
+        "p95_ms": percentile(latencies, 0.95),
+        "model_calls": model_calls,
+        "tavily_requests": tavily,
+        "burst": burst,
+    }
+    if stats is not None:
+        report["answer_cache"] = stats
+    return report
+
+async def run(tavily_url: str, args: argparse.Namespace) -> Dict[str, Any]:
+    return {
+        "off": await run_mode(False, tavily_url, args),
+        "on": await run_mode(True, tavily_url, args),
+    }
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--queries", type=int, default=200, help="Queries per mode")
+    parser.add_argument(
+        "--distinct", type=int, default=30, help="Distinct questions they are drawn from"
+    )
+    parser.add_argument("--concurrency", type=int, default=16, help="Queries in flight")
+    parser.add_argument(
+        "--burst", type=int, default=20, help="Copies of one query sent at once at the end"
+    )
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Seconds per model call")
+    parser.add_argument(
+        "--tavily-latency", type=float, default=0.2, help="Seconds per Tavily request"
+    )
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    # In-process servers log every call
+    logging.disable(logging.WARNING)
+    with FakeTavilyServer(FakeTavilyConfig(latency=args.tavily_latency)) as tavily:
+        os.environ.update({
+            "TAVILY_API_KEY": "benchmark",
+            "TAVILY_BASE_URL": tavily.url,
+            "TAVILY_CACHE_TTL": "0",
+            "WEATHER_PROVIDER": "fake",
+            "WEATHER_FAKE_LATENCY": "0.1",
+            "WEATHER_CACHE_TTL": "0",
+            "METRICS_ENABLED": "false",
+        })
+        report = asyncio.run(run(tavily.url, args))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        pathlib.Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
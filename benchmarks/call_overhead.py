@@ -0,0 +1,184 @@
+"""Per-call overhead of the MCP server runtime, with and without its fast paths.
+
+Calls cheap tools (calculate on a tiny expression, get_weather served from
+the cache) so that nearly all of the measured time is protocol overhead:
+schema validation, JSON-RPC framing and transport. Each configuration is
+measured over stdio (a server subprocess) and in-process:
+
+- baseline: MCP_FAST_PATH=false on asyncio, i.e. the stock mcp code paths
+- fast: cached schema checks, orjson frames and the event-loop stdio transport
+- fast_uvloop: the same on uvloop (skipped when uvloop isn't installed)
+
+For each it reports sequential latency per call (mean, p50, p99) and
+throughput with --concurrency calls in flight.
+
+    python benchmarks/call_overhead.py
+    python benchmarks/call_overhead.py --calls 2000 --transports stdio --output overhead.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import pathlib
+import sys
+import time
+from contextlib import AsyncExitStack
+from typing import Any, Dict, List, Optional
+
+BENCHMARKS_DIR = pathlib.Path(__file__).resolve().parent
+SRC_DIR = BENCHMARKS_DIR.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+from mcpclient import open_session  # noqa: E402
+from mcpserver import fastpath  # noqa: E402
+from mcpserver.runtime import run_async  # noqa: E402
+
+TRANSPORTS = ["stdio", "in_process"]
+
+# Environment of each configuration, for the servers and the benchmark's own client sessions
+CONFIGS: Dict[str, Dict[str, str]] = {
+    "baseline": {"MCP_FAST_PATH": "false", "MCP_EVENT_LOOP": "asyncio"},
+    "fast": {"MCP_FAST_PATH": "true", "MCP_EVENT_LOOP": "asyncio"},
+    "fast_uvloop": {"MCP_FAST_PATH": "true", "MCP_EVENT_LOOP": "uvloop"},
+}
+
+# Tool called on each server and its arguments
+TOOLS = {
+    "math": ("mcpserver.math_server", "calculate", {"expression": "1 + 2"}),
+    "weather": ("mcpserver.weather", "get_weather", {"location": "Paris"}),
+}
+
+# Servers answer from memory, with metrics off, so only the call overhead remains
+SERVER_ENV = {"WEATHER_FAKE_LATENCY": "0", "WEATHER_CACHE_TTL": "3600", "METRICS_ENABLED": "false"}
+
+def uvloop_available() -> bool:
+    try:
+        import uvloop  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def connection(transport: str, module: str, env: Dict[str, str]) -> Dict[str, Any]:
+    if transport == "in_process":
+        return {"transport": "in_process", "module": module}
+    return {
+        "transport": "stdio",
+        "command": sys.executable,
+        "args": [
+            "-c",
+            f"import sys; sys.path.insert(0, {str(SRC_DIR)!r}); "
+            f"from {module} import run_server; run_server()",
+        ],
+        # Server logs would go to this process's stderr
+        "env": {**env, "PATH": os.environ.get("PATH", ""), "PYTHONWARNINGS": "ignore"},
+    }
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1e6, 1)
+
+async def measure(
+    session, tool: str, arguments: Dict[str, Any], args: argparse.Namespace
+) -> Dict[str, Any]:
+    for _ in range(args.warmup):
+        await session.call_tool(tool, arguments)
+
+    latencies = []
+    for _ in range(args.calls):
+        started = time.perf_counter()
+        await session.call_tool(tool, arguments)
+        latencies.append(time.perf_counter() - started)
+
+    remaining = args.calls
+
+    async def worker() -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await session.call_tool(tool, arguments)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "mean_us": round(sum(latencies) / len(latencies) * 1e6, 1),
+        "p50_us": percentile(latencies, 0.5),
+        "p99_us": percentile(latencies, 0.99),
+        "calls_per_second": round(args.calls / elapsed, 1),
+    }
+
+async def run_config(
+    transport: str, env: Dict[str, str], args: argparse.Namespace
+) -> Dict[str, Any]:
+    # The client side (and in-process servers) follow the configuration too
+    os.environ.update(env)
+    if fastpath.enabled():
+        fastpath.install()
+    else:
+        fastpath.uninstall()
+
+    results = {}
+    async with AsyncExitStack() as stack:
+        for server_name, (module, tool, arguments) in TOOLS.items():
+            session = await open_session(stack, server_name, connection(transport, module, env))
+            if not fastpath.enabled():
+                # open_session installs the fast path for the client; the baseline goes without
+                fastpath.uninstall()
+            results[tool] = await measure(session, tool, arguments, args)
+    return results
+
+def run_in_loop(transport: str, config: str, args: argparse.Namespace) -> Dict[str, Any]:
+    env = {**SERVER_ENV, **CONFIGS[config]}
+    os.environ.update(env)
+    # On the event loop the servers would pick with the same settings
+    return run_async(run_config(transport, env, args))
+
+def speedup(report: Dict[str, Any], transport: str) -> Dict[str, Any]:
+    baseline = report[transport]["baseline"]
+    return {
+        config: {
+            tool: round(baseline[tool]["mean_us"] / result["mean_us"], 2)
+            for tool, result in results.items()
+        }
+        for config, results in report[transport].items()
+        if config != "baseline"
+    }
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--transports", nargs="+", choices=TRANSPORTS, default=TRANSPORTS)
+    parser.add_argument("--configs", nargs="+", choices=list(CONFIGS), default=list(CONFIGS))
+    parser.add_argument("--calls", type=int, default=500, help="Calls per tool and configuration")
+    parser.add_argument("--warmup", type=int, default=50, help="Unmeasured calls first")
+    parser.add_argument(
+        "--concurrency", type=int, default=16, help="Calls in flight for the throughput run"
+    )
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    # In-process servers log every request, which would be measured too
+    logging.disable(logging.WARNING)
+    configs = [
+        config for config in args.configs
+        if config != "fast_uvloop" or uvloop_available()
+    ]
+    report: Dict[str, Any] = {"orjson": fastpath.orjson is not None, "uvloop": uvloop_available()}
+    for transport in args.transports:
+        report[transport] = {config: run_in_loop(transport, config, args) for config in configs}
+        if "baseline" in configs:
+            report[transport]["speedup"] = speedup(report, transport)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        pathlib.Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
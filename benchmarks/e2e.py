@@ -0,0 +1,414 @@
+"""Offline end-to-end benchmark of the agent and the MCP servers.
+
+Runs everything locally: Tavily is replaced by benchmarks/fake_tavily.py,
+the weather server uses its fake provider and the agent's chat model is
+benchmarks/fake_llm.ScriptedChatModel. Measures, for each transport
+(stdio subprocesses and in-process servers):
+
+- cold_start: time to start each server and list its tools, and to build the agent
+- tools: MCP round-trip latency per tool (p50/p95/p99)
+- servers: throughput of each server at increasing concurrency
+- agent: end-to-end latency per scripted scenario (and time to first token
+  and first tool result when streamed), and throughput at increasing concurrency
+
+    python benchmarks/e2e.py --output results.json
+    python benchmarks/e2e.py --transports in_process --sections tools --calls 200
+
+The report is JSON, including the git commit, so runs can be compared
+across commits. Response caches are disabled unless --cache is given.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import pathlib
+import platform
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+BENCHMARKS_DIR = pathlib.Path(__file__).resolve().parent
+SRC_DIR = BENCHMARKS_DIR.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
+sys.path.insert(0, str(BENCHMARKS_DIR))
+
+from fake_llm import ScriptedChatModel  # noqa: E402
+from fake_tavily import FakeTavilyConfig, FakeTavilyServer  # noqa: E402
+
+from agent import SERVER_MODULES, AgentRuntime, build_server_config  # noqa: E402
+from mcpclient import ServerHandle  # noqa: E402
+
+TRANSPORTS = ["stdio", "in_process"]
+SECTIONS = ["cold_start", "tools", "servers", "agent"]
+
+# Arguments used to call each tool; tools not listed here are skipped
+TOOL_ARGS: Dict[str, Dict[str, Any]] = {
+    "search_web": {"query": "benchmark web query"},
+    "search_news": {"query": "benchmark news query"},
+    "search_web_batch": {
+        "queries": ["benchmark query one", "benchmark query two", "benchmark query three"]
+    },
+    "search_news_batch": {"queries": ["benchmark news one", "benchmark news two"]},
+    "search_cache_stats": {},
+    "get_weather": {"location": "Paris"},
+    "get_weather_many": {"locations": ["Paris", "Berlin", "Tokyo", "Lima"]},
+    "weather_cache_stats": {},
+    "calculate": {"expression": "2^10 + sqrt(16) * sin(pi / 4)"},
+    "calculate_many": {"expression": "x^2 + 3*x + 1", "variables": {"x": list(range(1000))}},
+}
+
+# Tool used for each server's throughput measurement
+SERVER_THROUGHPUT_TOOLS = {
+    "weather": "get_weather",
+    "tavily": "search_web",
+    "math": "calculate",
+}
+
+# Agent scenarios: query and the tool calls the scripted model makes, step by step
+SCENARIOS: Dict[str, Dict[str, Any]] = {
+    "direct_answer": {"query": "Say hello", "steps": []},
+    "weather": {
+        "query": "What's the weather in Paris?",
+        "steps": [[{"name": "get_weather", "args": {"location": "Paris"}}]],
+    },
+    "search": {
+        "query": "What is the latest news on fusion energy?",
+        "steps": [[{"name": "search_news", "args": {"query": "fusion energy"}}]],
+    },
+    "math": {
+        "query": "What is 2^10 + sqrt(16)?",
+        "steps": [[{"name": "calculate", "args": {"expression": "2^10 + sqrt(16)"}}]],
+    },
+    "parallel_tools": {
+        "query": "Find news about Tokyo and tell me the weather there",
+        "steps": [[
+            {"name": "search_web", "args": {"query": "Tokyo news"}},
+            {"name": "get_weather", "args": {"location": "Tokyo"}},
+        ]],
+    },
+    "multi_step": {
+        "query": "How much warmer is Lima than Berlin, and what's in the news about both?",
+        "steps": [
+            [{"name": "get_weather_many", "args": {"locations": ["Lima", "Berlin"]}}],
+            [{"name": "calculate", "args": {"expression": "22.5 - 22.5"}}],
+            [{"name": "search_news_batch", "args": {"queries": ["Lima", "Berlin"]}}],
+        ],
+    },
+}
+
+def summarize(samples_ms: List[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds (nearest-rank percentiles)"""
+    if not samples_ms:
+        return {"count": 0}
+    ordered = sorted(samples_ms)
+
+    def percentile(p: float) -> float:
+        index = min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))
+        return round(ordered[index], 2)
+
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 2),
+        "p50": percentile(50),
+        "p95": percentile(95),
+        "p99": percentile(99),
+        "max": round(ordered[-1], 2),
+    }
+
+def elapsed_ms(started: float) -> float:
+    return (time.perf_counter() - started) * 1000
+
+def connections_for(transport: str) -> Dict[str, Dict[str, Any]]:
+    in_process = list(SERVER_MODULES) if transport == "in_process" else []
+    return build_server_config(os.environ["TAVILY_API_KEY"], in_process=in_process)
+
+async def call_tool(session, name: str, args: Dict[str, Any]) -> bool:
+    """Call a tool; True on success"""
+    result = await session.call_tool(name, args)
+    return not result.isError
+
+async def bench_cold_start(transport: str, runs: int) -> Dict[str, Any]:
+    report: Dict[str, Any] = {}
+    for name, connection in connections_for(transport).items():
+        samples = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            handle = ServerHandle(name, connection)
+            session = await handle.start()
+            await session.list_tools()
+            samples.append(elapsed_ms(started))
+            await handle.stop()
+        # The first in-process start also pays for importing the server module
+        report[name] = {"first_ms": round(samples[0], 2), **summarize(samples)}
+    return report
+
+async def bench_tools(transport: str, calls: int) -> Dict[str, Any]:
+    report: Dict[str, Any] = {}
+    skipped = []
+    for name, connection in connections_for(transport).items():
+        handle = ServerHandle(name, connection)
+        session = await handle.start()
+        try:
+            for tool in (await session.list_tools()).tools:
+                args = TOOL_ARGS.get(tool.name)
+                if args is None:
+                    skipped.append(tool.name)
+                    continue
+                await call_tool(session, tool.name, args)  # warm-up
+                samples, errors = [], 0
+                for _ in range(calls):
+                    started = time.perf_counter()
+                    if not await call_tool(session, tool.name, args):
+                        errors += 1
+                    samples.append(elapsed_ms(started))
+                report[tool.name] = {"server": name, "errors": errors, **summarize(samples)}
+        finally:
+            await handle.stop()
+    if skipped:
+        report["_skipped"] = skipped
+    return report
+
+async def run_concurrently(concurrency: int, total: int, make_call) -> Dict[str, Any]:
+    """Run total calls with at most concurrency in flight; throughput and latency"""
+    semaphore = asyncio.Semaphore(concurrency)
+    samples: List[float] = []
+    errors = 0
+
+    async def one(index: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                if not await make_call(index):
+                    errors += 1
+            except Exception:
+                errors += 1
+            samples.append(elapsed_ms(started))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(total)))
+    wall = time.perf_counter() - started
+    return {
+        "concurrency": concurrency,
+        "completed": total,
+        "errors": errors,
+        "per_second": round(total / wall, 2),
+        **summarize(samples),
+    }
+
+async def bench_servers(transport: str, levels: List[int], calls_per_level: int) -> Dict[str, Any]:
+    report: Dict[str, Any] = {}
+    for name, connection in connections_for(transport).items():
+        tool = SERVER_THROUGHPUT_TOOLS[name]
+        args = TOOL_ARGS[tool]
+        handle = ServerHandle(name, connection)
+        session = await handle.start()
+        try:
+            await call_tool(session, tool, args)  # warm-up
+            report[name] = {
+                "tool": tool,
+                "levels": [
+                    await run_concurrently(
+                        level, calls_per_level, lambda index: call_tool(session, tool, args)
+                    )
+                    for level in levels
+                ],
+            }
+        finally:
+            await handle.stop()
+    return report
+
+async def bench_agent(
+    transport: str,
+    runs: int,
+    levels: List[int],
+    queries_per_level: int,
+    llm_latency: float,
+) -> Dict[str, Any]:
+    model = ScriptedChatModel(
+        script={scenario["query"]: scenario["steps"] for scenario in SCENARIOS.values()},
+        latency=llm_latency,
+    )
+    in_process = list(SERVER_MODULES) if transport == "in_process" else []
+    runtime = AgentRuntime(
+        os.environ["TAVILY_API_KEY"],
+        in_process=in_process,
+        model=model,
+        max_concurrency=max(levels),
+    )
+
+    started = time.perf_counter()
+    async with runtime:
+        report: Dict[str, Any] = {"cold_start_ms": round(elapsed_ms(started), 2), "scenarios": {}}
+
+        for name, scenario in SCENARIOS.items():
+            await runtime.ask(scenario["query"])  # warm-up
+            samples = []
+            for _ in range(runs):
+                started = time.perf_counter()
+                await runtime.ask(scenario["query"])
+                samples.append(elapsed_ms(started))
+
+            # The same scenario streamed, for time to first token / tool result
+            first_token, first_tool_result = [], []
+            for _ in range(runs):
+                async for event in runtime.stream(scenario["query"]):
+                    if event["type"] == "answer":
+                        first_token.append(event["time_to_first_token_ms"])
+                        if event["time_to_first_tool_result_ms"] is not None:
+                            first_tool_result.append(event["time_to_first_tool_result_ms"])
+
+            report["scenarios"][name] = {
+                "tool_steps": len(scenario["steps"]),
+                "tool_calls": sum(len(step) for step in scenario["steps"]),
+                **summarize(samples),
+                "streamed": {
+                    "time_to_first_token": summarize(first_token),
+                    "time_to_first_tool_result": summarize(first_tool_result),
+                },
+            }
+
+        queries = [scenario["query"] for scenario in SCENARIOS.values()]
+
+        async def ask(index: int) -> bool:
+            await runtime.ask(queries[index % len(queries)])
+            return True
+
+        report["throughput"] = [
+            await run_concurrently(level, queries_per_level, ask) for level in levels
+        ]
+    return report
+
+def git_revision() -> Dict[str, Any]:
+    def git(*args: str) -> str:
+        return subprocess.run(
+            ["git", *args], cwd=BENCHMARKS_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+
+    try:
+        return {
+            "commit": git("rev-parse", "HEAD"),
+            "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        }
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    report: Dict[str, Any] = {
+        "meta": {
+            **git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "parameters": {key: value for key, value in vars(args).items() if key != "output"},
+        },
+    }
+    for transport in args.transports:
+        results: Dict[str, Any] = {}
+        if "cold_start" in args.sections:
+            results["cold_start"] = await bench_cold_start(transport, args.cold_runs)
+        if "tools" in args.sections:
+            results["tools"] = await bench_tools(transport, args.calls)
+        if "servers" in args.sections:
+            results["servers"] = await bench_servers(
+                transport, args.concurrency, args.calls_per_level
+            )
+        if "agent" in args.sections:
+            results["agent"] = await bench_agent(
+                transport,
+                args.agent_runs,
+                args.concurrency,
+                args.queries_per_level,
+                args.llm_latency,
+            )
+        report[transport] = results
+    return report
+
+def csv(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Offline end-to-end benchmark of the agent and MCP servers"
+    )
+    parser.add_argument(
+        "--transports", type=csv, default=TRANSPORTS, help="Comma separated: stdio,in_process"
+    )
+    parser.add_argument(
+        "--sections", type=csv, default=SECTIONS, help=f"Comma separated: {','.join(SECTIONS)}"
+    )
+    parser.add_argument("--cold-runs", type=int, default=3, help="Starts per server for cold_start")
+    parser.add_argument("--calls", type=int, default=50, help="Sequential calls per tool")
+    parser.add_argument(
+        "--concurrency",
+        type=lambda value: [int(item) for item in csv(value)],
+        default=[1, 2, 4, 8, 16],
+        help="Concurrency levels for the throughput measurements",
+    )
+    parser.add_argument(
+        "--calls-per-level", type=int, default=64, help="Tool calls per concurrency level"
+    )
+    parser.add_argument("--agent-runs", type=int, default=10, help="Runs per agent scenario")
+    parser.add_argument(
+        "--queries-per-level", type=int, default=32, help="Agent queries per concurrency level"
+    )
+    parser.add_argument(
+        "--llm-latency", type=float, default=0.0, help="Seconds per scripted model step"
+    )
+    parser.add_argument(
+        "--tavily-latency", type=float, default=0.05, help="Seconds per fake Tavily response"
+    )
+    parser.add_argument(
+        "--tavily-results", type=int, default=5, help="Results per fake Tavily response"
+    )
+    parser.add_argument(
+        "--tavily-content-bytes", type=int, default=1000, help="Content size per fake result"
+    )
+    parser.add_argument(
+        "--weather-latency", type=float, default=0.05, help="Seconds per fake weather lookup"
+    )
+    parser.add_argument(
+        "--cache", action="store_true", help="Keep the servers' response caches enabled"
+    )
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    unknown = set(args.transports) - set(TRANSPORTS) or set(args.sections) - set(SECTIONS)
+    if unknown:
+        parser.error(f"Unknown transport or section: {', '.join(sorted(unknown))}")
+    return args
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+
+    config = FakeTavilyConfig(
+        latency=args.tavily_latency,
+        results=args.tavily_results,
+        content_bytes=args.tavily_content_bytes,
+    )
+    with FakeTavilyServer(config) as tavily:
+        # Read by in-process servers directly and forwarded to stdio servers
+        os.environ.update({
+            "TAVILY_API_KEY": "benchmark",
+            "TAVILY_BASE_URL": tavily.url,
+            "WEATHER_PROVIDER": "fake",
+            "WEATHER_FAKE_LATENCY": str(args.weather_latency),
+        })
+        if not args.cache:
+            os.environ["TAVILY_CACHE_TTL"] = "0"
+            os.environ["WEATHER_CACHE_TTL"] = "0"
+
+        report = asyncio.run(run(args))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        pathlib.Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
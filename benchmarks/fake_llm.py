@@ -0,0 +1,126 @@
+"""Scripted stand-in for the agent's chat model.
+
+ScriptedChatModel answers each query with a predetermined sequence of
+tool-calling steps, then a final answer, after a configurable delay per
+step. It lets the agent graph run end to end without calling OpenAI.
+When streamed, the final answer arrives word by word.
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    BaseMessage,
+    HumanMessage,
+    ToolMessage,
+)
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# One step is a list of tool calls made together, each {"name": ..., "args": {...}}
+Step = List[Dict[str, Any]]
+
+class ScriptedChatModel(BaseChatModel):
+    """Chat model whose tool calls per query are scripted.
+
+    script maps a query to its steps. The model finds the query in the
+    conversation, counts the steps already taken and emits the next one;
+    once the steps are used up (or for unknown queries) it answers with a
+    short summary of the tool results.
+    """
+
+    script: Dict[str, List[Step]] = {}
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "ScriptedChatModel":
+        return self
+
+    def _next_message(self, messages: List[BaseMessage]) -> AIMessage:
+        start = max(
+            index for index, message in enumerate(messages) if isinstance(message, HumanMessage)
+        )
+        query = messages[start].content
+        history = messages[start + 1:]
+        steps = self.script.get(query, [])
+        taken = sum(1 for message in history if isinstance(message, AIMessage))
+
+        if taken < len(steps):
+            return AIMessage(
+                content="",
+                tool_calls=[
+                    {
+                        "name": call["name"],
+                        "args": call.get("args", {}),
+                        "id": f"call_{uuid.uuid4().hex[:12]}",
+                    }
+                    for call in steps[taken]
+                ],
+            )
+
+        results = [message for message in history if isinstance(message, ToolMessage)]
+        size = sum(len(str(message.content)) for message in results)
+        return AIMessage(
+            content=f"Answer to {query!r} from {len(results)} tool results ({size} characters)"
+        )
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if self.latency > 0:
+            time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._next_message(messages))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._next_message(messages))])
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        message = self._next_message(messages)
+
+        if message.tool_calls:
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content="",
+                tool_call_chunks=[
+                    {
+                        "name": call["name"],
+                        "args": json.dumps(call["args"]),
+                        "id": call["id"],
+                        "index": index,
+                    }
+                    for index, call in enumerate(message.tool_calls)
+                ],
+            ))
+            return
+
+        words = message.content.split(" ")
+        for index, word in enumerate(words):
+            content = word if index == 0 else f" {word}"
+            yield ChatGenerationChunk(message=AIMessageChunk(content=content))
@@ -0,0 +1,200 @@
+"""Local stand-in for the Tavily search API.
+
+Serves POST /search with canned results of a configurable count and size
+after a configurable delay, optionally failing a fraction of requests (e.g.
+with 429 and a Retry-After header), so the Tavily server can be benchmarked
+and tested without network access. Point the server at it with
+TAVILY_BASE_URL=http://127.0.0.1:<port>.
+
+    python benchmarks/fake_tavily.py --port 8765 --latency 0.1 --results 5
+"""
+
+import argparse
+import asyncio
+import hashlib
+import random
+import socket
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+FILLER = (
+    "The quick brown fox jumps over the lazy dog while benchmark payloads are "
+    "generated from repeated sentences of plain ASCII text. "
+)
+
+class FakeTavilyConfig:
+    """Shape of the canned responses; can be changed while the server runs"""
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        jitter: float = 0.0,
+        results: int = 5,
+        content_bytes: int = 1000,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        retry_after: Optional[float] = None,
+        answer_bytes: int = 0,
+        raw_content_bytes: int = 0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.results = results
+        self.content_bytes = content_bytes
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        # Size of the answer (when asked for) and of each result's raw content (0 leaves it out)
+        self.answer_bytes = answer_bytes
+        self.raw_content_bytes = raw_content_bytes
+
+def filler(size: int) -> str:
+    return (FILLER * (size // len(FILLER) + 1))[:size]
+
+def canned_results(
+    query: str, count: int, content_bytes: int, raw_content_bytes: int = 0
+) -> List[Dict[str, Any]]:
+    """Deterministic results for a query, so repeated queries return the same URLs"""
+    digest = hashlib.sha1(query.encode()).hexdigest()[:12]
+    content = filler(content_bytes)
+    results = [
+        {
+            "title": f"Result {index} for {query}",
+            "url": f"https://example.com/{digest}/{index}",
+            "content": content,
+            "score": round(1.0 - index / max(count, 1), 3),
+        }
+        for index in range(count)
+    ]
+    if raw_content_bytes:
+        for result in results:
+            result["raw_content"] = filler(raw_content_bytes)
+    return results
+
+def create_app(config: FakeTavilyConfig) -> Starlette:
+    stats = {"requests": 0, "errors": 0}
+
+    async def search(request: Request) -> JSONResponse:
+        body = await request.json()
+        stats["requests"] += 1
+
+        delay = config.latency + random.uniform(0, config.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if config.error_rate and random.random() < config.error_rate:
+            stats["errors"] += 1
+            headers = None
+            if config.retry_after is not None:
+                headers = {"Retry-After": f"{config.retry_after:g}"}
+            return JSONResponse(
+                {"detail": "Injected failure"}, status_code=config.error_status, headers=headers
+            )
+
+        query = body.get("query", "")
+        count = min(int(body.get("max_results", 5)), config.results)
+        response: Dict[str, Any] = {"query": query}
+        if body.get("include_answer", True):
+            response["answer"] = f"Canned answer for {query}. {filler(config.answer_bytes)}"
+        response["results"] = canned_results(
+            query, count, config.content_bytes, config.raw_content_bytes
+        )
+        response["response_time"] = round(delay, 3)
+        return JSONResponse(response)
+
+    async def get_stats(request: Request) -> JSONResponse:
+        return JSONResponse(stats)
+
+    return Starlette(routes=[
+        Route("/search", search, methods=["POST"]),
+        Route("/stats", get_stats, methods=["GET"]),
+    ])
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class FakeTavilyServer:
+    """Runs the fake API on a background thread; use as a context manager"""
+
+    def __init__(self, config: Optional[FakeTavilyConfig] = None, port: Optional[int] = None):
+        self.config = config or FakeTavilyConfig()
+        self.port = port or free_port()
+        self._server = uvicorn.Server(uvicorn.Config(
+            create_app(self.config),
+            host="127.0.0.1",
+            port=self.port,
+            log_level="warning",
+            lifespan="off",
+        ))
+        self._thread = threading.Thread(target=self._server.run, name="fake-tavily", daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "FakeTavilyServer":
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if not self._thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError("Fake Tavily server failed to start")
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=10)
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Run a fake Tavily search API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds before each response")
+    parser.add_argument(
+        "--jitter", type=float, default=0.0, help="Extra random delay of up to this many seconds"
+    )
+    parser.add_argument("--results", type=int, default=5, help="Maximum results per response")
+    parser.add_argument(
+        "--content-bytes", type=int, default=1000, help="Size of each result's content"
+    )
+    parser.add_argument(
+        "--answer-bytes", type=int, default=0, help="Extra size of the answer, when requested"
+    )
+    parser.add_argument(
+        "--raw-content-bytes", type=int, default=0, help="Raw content size per result (0 for none)"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="Fraction of requests that fail"
+    )
+    parser.add_argument(
+        "--error-status", type=int, default=503, help="Status code of failed requests"
+    )
+    parser.add_argument(
+        "--retry-after", type=float, help="Retry-After header of failed requests, in seconds"
+    )
+    args = parser.parse_args(argv)
+
+    config = FakeTavilyConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        results=args.results,
+        content_bytes=args.content_bytes,
+        answer_bytes=args.answer_bytes,
+        raw_content_bytes=args.raw_content_bytes,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        retry_after=args.retry_after,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
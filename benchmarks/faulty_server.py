@@ -0,0 +1,60 @@
+"""MCP server that misbehaves on request, for benchmarks/server_recovery.py.
+
+Tools:
+
+- echo(text): answers at once
+- hang(seconds): blocks the server's event loop, like a pathological
+  computation would, so not even pings are answered
+- crash(): exits the process without answering
+- leak(mb): allocates mb megabytes that are never freed
+
+With FAULTY_IGNORE_SIGTERM=1 the server ignores SIGTERM, so only SIGKILL
+stops it.
+
+    python benchmarks/faulty_server.py
+"""
+
+import os
+import signal
+import time
+from typing import List
+
+from mcp.server.fastmcp import FastMCP
+
+_leaked: List[bytes] = []
+
+def create_server() -> FastMCP:
+    mcp = FastMCP("Faulty")
+
+    # Define the echo tool
+    @mcp.tool()
+    def echo(text: str) -> str:
+        """Return text"""
+        return text
+
+    # Define the hang tool
+    @mcp.tool()
+    def hang(seconds: float) -> str:
+        """Block the server for seconds"""
+        time.sleep(seconds)
+        return f"Slept {seconds}s"
+
+    # Define the crash tool
+    @mcp.tool()
+    def crash() -> str:
+        """Exit the server process immediately"""
+        os._exit(1)
+
+    # Define the leak tool
+    @mcp.tool()
+    def leak(mb: int) -> str:
+        """Allocate mb megabytes and keep them"""
+        _leaked.append(b"x" * (mb * 2**20))
+        return f"Holding {sum(len(block) for block in _leaked) // 2**20} MB"
+
+    return mcp
+
+if __name__ == "__main__":
+    if os.environ.get("FAULTY_IGNORE_SIGTERM", "").lower() in ("1", "true", "yes"):
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    create_server().run(transport="stdio")
@@ -0,0 +1,153 @@
+"""Import-time benchmark for the agent and the MCP server modules.
+
+Each module is imported in a fresh interpreter with ``-X importtime`` and the
+best of several runs is compared against the budget in import_budget.json.
+It also checks that importing a server module has no process-wide side
+effects (logging handlers or signal handlers), which matters for servers
+run in-process by the agent.
+
+    python benchmarks/import_time.py            # compare against the budget
+    python benchmarks/import_time.py --update   # record current times as the budget
+
+Prints a JSON report and exits with status 1 if any module is over budget.
+"""
+
+import argparse
+import json
+import pathlib
+import subprocess
+import sys
+from typing import Dict, List
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+SRC_DIR = ROOT / "src"
+BUDGET_PATH = pathlib.Path(__file__).resolve().parent / "import_budget.json"
+
+MODULES = [
+    "mcpserver",
+    "mcpserver.weather",
+    "mcpserver.tavily",
+    "mcpserver.math_server",
+    "mcpclient",
+    "agent",
+]
+
+SERVER_MODULES = ["mcpserver.weather", "mcpserver.tavily", "mcpserver.math_server"]
+
+# Headroom on top of the measured time when recording a budget, since
+# import times vary between runs and machines
+BUDGET_HEADROOM = 1.5
+
+SIDE_EFFECT_CHECK = """
+import importlib, json, logging, signal, sys
+def state():
+    handlers = len(logging.getLogger().handlers)
+    return handlers, signal.getsignal(signal.SIGTERM), signal.getsignal(signal.SIGINT)
+before = state()
+importlib.import_module(sys.argv[1])
+after = state()
+print(json.dumps({
+    "logging_handlers_added": after[0] - before[0],
+    "signal_handlers_changed": after[1] is not before[1] or after[2] is not before[2],
+}))
+"""
+
+def measure_import(module: str) -> Dict[str, float]:
+    """Import module once in a fresh interpreter.
+
+    Returns the cumulative time and its slowest direct imports, in ms.
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    # Lines look like "import time: self [us] | cumulative | imported package",
+    # children before their parent and indented two spaces per nesting level
+    total_us = 0
+    pending: List[tuple] = []
+    children: List[tuple] = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        if level == 1:
+            pending.append((int(cumulative), name.strip()))
+        elif level == 0:
+            if name.strip() == module:
+                total_us = int(cumulative)
+                children = pending
+            pending = []
+
+    slowest = sorted(children, reverse=True)[:5]
+    return {
+        "total_ms": total_us / 1000,
+        "slowest": {name: us / 1000 for us, name in slowest},
+    }
+
+def check_side_effects(module: str) -> Dict[str, object]:
+    completed = subprocess.run(
+        [sys.executable, "-c", SIDE_EFFECT_CHECK, module],
+        cwd=SRC_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(completed.stdout)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--runs", type=int, default=5, help="Imports per module; the fastest is reported"
+    )
+    parser.add_argument(
+        "--update", action="store_true", help="Write the measured times as the new budget"
+    )
+    parser.add_argument("--budget", default=str(BUDGET_PATH), help="Budget file")
+    parser.add_argument("modules", nargs="*", default=MODULES, help="Modules to measure")
+    args = parser.parse_args(argv)
+
+    budget_path = pathlib.Path(args.budget)
+    budget = json.loads(budget_path.read_text()) if budget_path.exists() else {}
+
+    report = {"python": sys.version.split()[0], "modules": {}, "regressions": []}
+    for module in args.modules:
+        runs = [measure_import(module) for _ in range(args.runs)]
+        best = min(runs, key=lambda run: run["total_ms"])
+        entry = {
+            "best_ms": round(best["total_ms"], 1),
+            "median_ms": round(sorted(run["total_ms"] for run in runs)[len(runs) // 2], 1),
+            "slowest_imports_ms": {name: round(ms, 1) for name, ms in best["slowest"].items()},
+        }
+        if module in budget:
+            entry["budget_ms"] = budget[module]
+            if entry["best_ms"] > budget[module]:
+                report["regressions"].append(
+                    f"{module}: {entry['best_ms']}ms > budget {budget[module]}ms"
+                )
+        if module in SERVER_MODULES:
+            effects = check_side_effects(module)
+            entry["side_effects"] = effects
+            if effects["logging_handlers_added"] or effects["signal_handlers_changed"]:
+                report["regressions"].append(
+                    f"{module}: importing it changes process-wide state {effects}"
+                )
+        report["modules"][module] = entry
+
+    if args.update:
+        budget.update({
+            module: max(round(entry["best_ms"] * BUDGET_HEADROOM, -1), 10.0)
+            for module, entry in report["modules"].items()
+        })
+        budget_path.write_text(json.dumps(budget, indent=2) + "\n")
+        report["regressions"] = [item for item in report["regressions"] if "budget" not in item]
+
+    print(json.dumps(report, indent=2))
+    return 1 if report["regressions"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+"""Recovery of the agent's MCP servers from hangs, crashes and leaks, with and without supervision.
+
+Runs benchmarks/faulty_server.py as a stdio server under the agent's
+ProcessTrackingClient and, once with the supervisor off and once on,
+injects one fault per scenario while a probe keeps calling the server:
+
+- hang: a call blocks the server's event loop; reports how long until
+  calls are answered again, and the probe calls that failed
+- crash: a call kills the server process
+- leak: every probe call leaks memory; reports the peak and final resident
+  memory of the server, recycles and failed calls
+- shutdown: a hung server that ignores SIGTERM; reports how long closing
+  the client takes, and whether the exit-time cleanup (the signal handler
+  path) leaves the process running, compared with the previous cleanup
+  that only sent SIGTERM
+
+    python benchmarks/server_recovery.py
+    python benchmarks/server_recovery.py --scenarios hang,leak --duration 10
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import pathlib
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+BENCHMARKS_DIR = pathlib.Path(__file__).resolve().parent
+SRC_DIR = BENCHMARKS_DIR.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+import agent  # noqa: E402
+from agent import ProcessTrackingClient  # noqa: E402
+from supervisor import SupervisorConfig, process_usage  # noqa: E402
+
+SCENARIOS = ("hang", "crash", "leak", "shutdown")
+
+def connection(**env: str) -> Dict[str, Any]:
+    return {
+        "command": sys.executable,
+        "args": [str(BENCHMARKS_DIR / "faulty_server.py")],
+        "transport": "stdio",
+        "env": {"PYTHONPATH": str(SRC_DIR), **env},
+    }
+
+def supervisor_config(supervised: bool, args: argparse.Namespace) -> SupervisorConfig:
+    if not supervised:
+        return SupervisorConfig(interval=0)
+    return SupervisorConfig(
+        interval=args.interval,
+        latency_threshold=args.latency_threshold,
+        failures=args.failures,
+        stop_grace=args.stop_grace,
+        max_rss_mb=args.max_rss_mb,
+        drain=5.0,
+    )
+
+async def start_client(
+    supervised: bool, args: argparse.Namespace, tool_cache: str, **env: str
+) -> ProcessTrackingClient:
+    client = await ProcessTrackingClient(
+        {"faulty": connection(**env)},
+        tool_cache_path=tool_cache,
+        tool_timeouts={"*": args.call_timeout, "hang": 120.0},
+        supervisor=supervisor_config(supervised, args),
+    ).__aenter__()
+    if not supervised:
+        # As before supervision: stopping relies on the mcp stdio client closing the server
+        for server in client.servers.values():
+            server.stop_grace = None
+    return client
+
+async def call(server: Any, tool: str, arguments: Dict[str, Any]) -> bool:
+    """Whether a call succeeded"""
+    try:
+        result = await server.call_tool(tool, arguments)
+    except Exception:
+        return False
+    return not result.isError
+
+async def probe(
+    server: Any, tool: str, arguments: Dict[str, Any], duration: float
+) -> List[Dict[str, Any]]:
+    """Call tool every 100 ms for duration seconds; when each call ended and if it succeeded"""
+    started = time.perf_counter()
+    calls = []
+    while time.perf_counter() - started < duration:
+        ok = await call(server, tool, arguments)
+        calls.append({"at": time.perf_counter() - started, "ok": ok})
+        await asyncio.sleep(0.1)
+    return calls
+
+def recovery(calls: List[Dict[str, Any]], fault_at: float) -> Optional[float]:
+    """Seconds from the fault until calls succeed again (None if they never did)"""
+    failed = False
+    for probe_call in calls:
+        if probe_call["at"] < fault_at:
+            continue
+        if not probe_call["ok"]:
+            failed = True
+        elif failed:
+            return round(probe_call["at"] - fault_at, 2)
+    return None if failed else 0.0
+
+def summary(calls: List[Dict[str, Any]], fault_at: float) -> Dict[str, Any]:
+    return {
+        "probe_calls": len(calls),
+        "failed_calls": sum(1 for probe_call in calls if not probe_call["ok"]),
+        "recovery_seconds": recovery(calls, fault_at),
+    }
+
+async def run_fault(
+    supervised: bool, args: argparse.Namespace, tool_cache: str, fault: str
+) -> Dict[str, Any]:
+    client = await start_client(supervised, args, tool_cache)
+    try:
+        server = client.servers["faulty"]
+        await call(server, "echo", {"text": "warm up"})
+        probing = asyncio.ensure_future(probe(server, "echo", {"text": "probe"}, args.duration))
+        await asyncio.sleep(0.5)
+        fault_at = 0.5
+        if fault == "hang":
+            faulty = asyncio.ensure_future(call(server, "hang", {"seconds": args.duration * 2}))
+        else:
+            faulty = asyncio.ensure_future(call(server, "crash", {}))
+        calls = await probing
+        faulty.cancel()
+        await asyncio.gather(faulty, return_exceptions=True)
+        report = summary(calls, fault_at)
+        report["restarts"] = client.supervisor.stats["faulty"].restarts
+    finally:
+        await client.__aexit__(None, None, None)
+    return report
+
+async def run_leak(supervised: bool, args: argparse.Namespace, tool_cache: str) -> Dict[str, Any]:
+    client = await start_client(supervised, args, tool_cache)
+    try:
+        server = client.servers["faulty"]
+        await call(server, "echo", {"text": "warm up"})
+        peak = 0.0
+
+        async def sample() -> None:
+            nonlocal peak
+            while True:
+                handle = server.handle
+                if handle is not None and handle.process is not None:
+                    usage = process_usage(handle.process.pid)
+                    if usage is not None:
+                        peak = max(peak, usage[0] / 2**20)
+                await asyncio.sleep(0.1)
+
+        sampler = asyncio.ensure_future(sample())
+        calls = await probe(server, "leak", {"mb": args.leak_mb}, args.duration)
+        sampler.cancel()
+        usage = process_usage(server.handle.process.pid)
+        return {
+            "probe_calls": len(calls),
+            "failed_calls": sum(1 for probe_call in calls if not probe_call["ok"]),
+            "peak_rss_mb": round(peak, 1),
+            "final_rss_mb": round(usage[0] / 2**20, 1) if usage else None,
+            "recycles": client.supervisor.stats["faulty"].recycles,
+        }
+    finally:
+        await client.__aexit__(None, None, None)
+
+def process_running(pid: int) -> bool:
+    return not agent.process_exited(pid)
+
+async def run_shutdown(
+    supervised: bool, args: argparse.Namespace, tool_cache: str
+) -> Dict[str, Any]:
+    report: Dict[str, Any] = {}
+
+    # Closing the client while the server is hung and ignores SIGTERM
+    client = await start_client(supervised, args, tool_cache, FAULTY_IGNORE_SIGTERM="1")
+    server = client.servers["faulty"]
+    process = server.handle.process
+    hung = asyncio.ensure_future(call(server, "hang", {"seconds": 60}))
+    await asyncio.sleep(0.3)
+    started = time.perf_counter()
+    await client.__aexit__(None, None, None)
+    report["exit_seconds"] = round(time.perf_counter() - started, 2)
+    report["left_running_after_exit"] = process.returncode is None and process_running(process.pid)
+    hung.cancel()
+    await asyncio.gather(hung, return_exceptions=True)
+
+    # The exit-time cleanup of the signal handler, which runs without the event loop
+    client = await start_client(supervised, args, tool_cache, FAULTY_IGNORE_SIGTERM="1")
+    server = client.servers["faulty"]
+    process = server.handle.process
+    hung = asyncio.ensure_future(call(server, "hang", {"seconds": 60}))
+    await asyncio.sleep(0.3)
+    started = time.perf_counter()
+    if supervised:
+        agent._cleanup_called = False
+        agent.cleanup_processes(args.stop_grace)
+    else:
+        # The previous cleanup: SIGTERM once, no wait
+        process.terminate()
+    report["cleanup_seconds"] = round(time.perf_counter() - started, 2)
+    await asyncio.sleep(args.stop_grace)
+    report["left_running_after_cleanup"] = process_running(process.pid)
+    if report["left_running_after_cleanup"]:
+        process.kill()
+    hung.cancel()
+    await asyncio.gather(hung, return_exceptions=True)
+    await client.__aexit__(None, None, None)
+    return report
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    report: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        tool_cache = os.path.join(tmp, "tool-schemas.json")
+        for scenario in args.scenarios:
+            report[scenario] = {}
+            for mode, supervised in (("unsupervised", False), ("supervised", True)):
+                if scenario in ("hang", "crash"):
+                    result = await run_fault(supervised, args, tool_cache, scenario)
+                elif scenario == "leak":
+                    result = await run_leak(supervised, args, tool_cache)
+                else:
+                    result = await run_shutdown(supervised, args, tool_cache)
+                report[scenario][mode] = result
+    return report
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--scenarios", default=",".join(SCENARIOS), help=f"Comma separated: {','.join(SCENARIOS)}"
+    )
+    parser.add_argument(
+        "--duration", type=float, default=8.0, help="Seconds each scenario probes the server"
+    )
+    parser.add_argument(
+        "--call-timeout", type=float, default=5.0, help="Tool timeout of the probe calls"
+    )
+    parser.add_argument("--interval", type=float, default=0.5, help="Supervisor check interval")
+    parser.add_argument(
+        "--latency-threshold", type=float, default=0.5, help="Supervisor ping latency threshold"
+    )
+    parser.add_argument("--failures", type=int, default=2, help="Failed checks before a restart")
+    parser.add_argument(
+        "--stop-grace", type=float, default=1.0, help="Seconds between SIGTERM and SIGKILL"
+    )
+    parser.add_argument(
+        "--max-rss-mb", type=float, default=150.0, help="Resident memory that triggers a recycle"
+    )
+    parser.add_argument(
+        "--leak-mb", type=int, default=5, help="Megabytes leaked per call in the leak scenario"
+    )
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+    return args
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    # Restarts and failed checks log warnings, which would drown the report
+    logging.disable(logging.WARNING)
+    os.environ["METRICS_ENABLED"] = "false"
+    report = asyncio.run(run(args))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        pathlib.Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""Prompt size and store size of a long agent session, with and without bounded memory.
+
+Runs one multi-turn session through agent.AgentRuntime with in-process
+servers, the fake Tavily API and the scripted chat model. Turns cycle
+through a web search (large results), a weather lookup and a calculation.
+For each memory setting it reports, at checkpoint turns:
+
+- prompt_tokens: estimated tokens sent on the first model call of the turn
+- stored_bytes: bytes of checkpoint data the session's SQLite store holds
+- checkpoints: checkpoints stored for the session
+- turn_ms: latency of the turn
+
+plus the number of summarization calls made. "unbounded" keeps the whole
+history (the naive approach); "bounded" uses the AGENT_MEMORY_* defaults.
+
+    python benchmarks/session_growth.py
+    python benchmarks/session_growth.py --turns 100 --max-tokens 2000
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import pathlib
+import sqlite3
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+BENCHMARKS_DIR = pathlib.Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARKS_DIR.parent / "src"))
+sys.path.insert(0, str(BENCHMARKS_DIR))
+
+from fake_llm import ScriptedChatModel  # noqa: E402
+from fake_tavily import FakeTavilyConfig, FakeTavilyServer  # noqa: E402
+from langchain_core.callbacks import AsyncCallbackHandler  # noqa: E402
+
+from agent import SERVER_MODULES, AgentRuntime  # noqa: E402
+from memory import SUMMARY_PROMPT, history_tokens  # noqa: E402
+
+# Queries of a turn and the tool calls the scripted model makes for them
+TURNS = [
+    (
+        "What's new with fusion energy? ({index})",
+        [[{"name": "search_web", "args": {"query": "fusion energy {index}"}}]],
+    ),
+    (
+        "And the weather in Paris? ({index})",
+        [[{"name": "get_weather", "args": {"location": "Paris"}}]],
+    ),
+    (
+        "What is {index} * 7? ({index})",
+        [[{"name": "calculate", "args": {"expression": "{index} * 7"}}]],
+    ),
+]
+
+class PromptRecorder(AsyncCallbackHandler):
+    """Records the estimated prompt tokens of each model call"""
+
+    def __init__(self):
+        self.prompts: List[int] = []
+        self.summaries = 0
+
+    async def on_chat_model_start(self, serialized, messages, **kwargs: Any) -> None:
+        if messages[0] and messages[0][0].content == SUMMARY_PROMPT:
+            self.summaries += 1
+        else:
+            self.prompts.append(history_tokens(messages[0]))
+
+def store_size(path: pathlib.Path) -> Dict[str, int]:
+    """Checkpoints and bytes of checkpoint data in a store.
+
+    Not the file size: the file keeps freed pages for reuse.
+    """
+    with sqlite3.connect(path) as conn:
+        checkpoints, checkpoint_bytes = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(checkpoint) + LENGTH(metadata)), 0) "
+            "FROM checkpoints"
+        ).fetchone()
+        (write_bytes,) = conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(value)), 0) FROM writes"
+        ).fetchone()
+    return {"stored_bytes": checkpoint_bytes + write_bytes, "checkpoints": checkpoints}
+
+def format_turn(index: int):
+    query, steps = TURNS[index % len(TURNS)]
+    steps = json.loads(json.dumps(steps).replace("{index}", str(index)))
+    return query.format(index=index), steps
+
+async def run_session(memory_env: Dict[str, str], args: argparse.Namespace) -> Dict[str, Any]:
+    turns = [format_turn(index) for index in range(args.turns)]
+    model = ScriptedChatModel(script={query: steps for query, steps in turns})
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = pathlib.Path(directory) / "sessions.sqlite"
+        os.environ.update({"AGENT_MEMORY_PATH": str(store), **memory_env})
+        runtime = AgentRuntime(
+            os.environ["TAVILY_API_KEY"], in_process=list(SERVER_MODULES), model=model
+        )
+        recorder = PromptRecorder()
+        report: Dict[str, Any] = {"turns": {}}
+        async with runtime:
+            runtime.callbacks.append(recorder)
+            for index, (query, _) in enumerate(turns, start=1):
+                calls_before = len(recorder.prompts)
+                started = time.perf_counter()
+                await runtime.ask(query, session_id="benchmark")
+                elapsed = time.perf_counter() - started
+                if index in args.report_turns or index == args.turns:
+                    report["turns"][index] = {
+                        "prompt_tokens": recorder.prompts[calls_before],
+                        **store_size(store),
+                        "turn_ms": round(elapsed * 1000, 1),
+                    }
+        report["max_prompt_tokens"] = max(recorder.prompts)
+        report["summaries"] = recorder.summaries
+    return report
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    settings = {
+        "unbounded": {
+            "AGENT_MEMORY_MAX_TOKENS": str(10 ** 9),
+            "AGENT_MEMORY_TOOL_TURNS": str(10 ** 6),
+        },
+        "bounded": {
+            "AGENT_MEMORY_MAX_TOKENS": str(args.max_tokens),
+            "AGENT_MEMORY_TOOL_TURNS": str(args.tool_turns),
+        },
+    }
+    return {name: await run_session(env, args) for name, env in settings.items()}
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--turns", type=int, default=60, help="Turns in the session")
+    parser.add_argument(
+        "--report-turns", type=int, nargs="+", default=[1, 5, 10, 20, 40], help="Turns to report"
+    )
+    parser.add_argument(
+        "--max-tokens", type=int, default=4000, help="AGENT_MEMORY_MAX_TOKENS of the bounded run"
+    )
+    parser.add_argument(
+        "--tool-turns", type=int, default=2, help="AGENT_MEMORY_TOOL_TURNS of the bounded run"
+    )
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    # In-process servers log every call
+    logging.disable(logging.WARNING)
+    with FakeTavilyServer(FakeTavilyConfig()) as tavily:
+        os.environ.update({
+            "TAVILY_API_KEY": "benchmark",
+            "TAVILY_BASE_URL": tavily.url,
+            "TAVILY_CACHE_TTL": "0",
+            "WEATHER_PROVIDER": "fake",
+            "WEATHER_FAKE_LATENCY": "0",
+            "METRICS_ENABLED": "false",
+        })
+        report = asyncio.run(run(args))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        pathlib.Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
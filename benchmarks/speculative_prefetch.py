@@ -0,0 +1,166 @@
+"""Latency of the agent with and without speculative tool prefetch.
+
+Runs a mix of queries through agent.AgentRuntime with in-process servers,
+the fake Tavily API and the scripted chat model, whose model calls and
+tool calls both take a fixed time:
+
+- hit: the prefetch rules pick the call the model then makes
+  ("What's the weather in Paris?" -> get_weather)
+- miss: the rules pick a call the model doesn't make (it asks for the
+  weather in other units), so the prefetch is wasted
+- none: no rule matches (a calculation), nothing is prefetched
+
+For prefetch off and on it reports mean and p50 latency per kind of query,
+the upstream Tavily and weather requests made, and the prefetch counters
+(hit rate, time saved, wasted calls and their time).
+
+    python benchmarks/speculative_prefetch.py
+    python benchmarks/speculative_prefetch.py --queries 60 --llm-latency 0.8 --tool-latency 0.5
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import pathlib
+import statistics
+import sys
+import time
+import urllib.request
+from typing import Any, Dict, List, Optional, Tuple
+
+BENCHMARKS_DIR = pathlib.Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARKS_DIR.parent / "src"))
+sys.path.insert(0, str(BENCHMARKS_DIR))
+
+from fake_llm import ScriptedChatModel  # noqa: E402
+from fake_tavily import FakeTavilyConfig, FakeTavilyServer  # noqa: E402
+
+from agent import SERVER_MODULES, AgentRuntime  # noqa: E402
+from mcpserver.metrics import METRICS, UPSTREAM_DURATION  # noqa: E402
+
+# Kind of query -> query template and the tool calls the scripted model makes for it
+QUERIES = {
+    "hit": [
+        (
+            "What's the weather in City{index} today?",
+            [{"name": "get_weather", "args": {"location": "City{index}"}}],
+        ),
+        (
+            "Latest news on fusion reactor {index}",
+            [{"name": "search_news", "args": {"query": "fusion reactor {index} news"}}],
+        ),
+    ],
+    "miss": [
+        (
+            "What's the weather in Town{index}, in Fahrenheit?",
+            [{"name": "get_weather", "args": {"location": "Town{index}", "units": "imperial"}}],
+        ),
+    ],
+    "none": [
+        ("What is {index} * 7?", [{"name": "calculate", "args": {"expression": "{index} * 7"}}]),
+    ],
+}
+
+def build_queries(count: int) -> List[Tuple[str, str, List[List[Dict[str, Any]]]]]:
+    """(kind, query, steps) for count queries, cycling through the kinds.
+
+    The queries are unique, so no cache answers them.
+    """
+    templates = [(kind, template) for kind, templates in QUERIES.items() for template in templates]
+    queries = []
+    for index in range(count):
+        kind, (query, calls) = templates[index % len(templates)]
+        calls = json.loads(json.dumps(calls).replace("{index}", str(index)))
+        queries.append((kind, query.format(index=index), [calls]))
+    return queries
+
+def upstream_requests(tavily_url: str) -> Dict[str, int]:
+    """Requests made to Tavily (counted by the fake API) and the weather provider (by metrics)"""
+    with urllib.request.urlopen(f"{tavily_url}/stats") as response:
+        tavily = json.load(response)["requests"]
+    weather = sum(
+        histogram.count for histogram in METRICS.snapshot().histograms
+        if histogram.name == UPSTREAM_DURATION and histogram.labels.get("service") == "weather"
+    )
+    return {"tavily": tavily, "weather": weather}
+
+async def run_mode(prefetch: bool, tavily_url: str, args: argparse.Namespace) -> Dict[str, Any]:
+    queries = build_queries(args.queries)
+    script = {query: steps for _, query, steps in queries}
+    model = ScriptedChatModel(script=script, latency=args.llm_latency)
+    runtime = AgentRuntime(
+        os.environ["TAVILY_API_KEY"],
+        in_process=list(SERVER_MODULES),
+        model=model,
+        prefetch=prefetch,
+    )
+    latencies: Dict[str, List[float]] = {kind: [] for kind in QUERIES}
+    async with runtime:
+        before = upstream_requests(tavily_url)
+        for kind, query, _ in queries:
+            started = time.perf_counter()
+            await runtime.ask(query)
+            latencies[kind].append(time.perf_counter() - started)
+        # Let cancelled prefetches settle before counting upstream requests
+        await asyncio.sleep(0.05)
+        after = upstream_requests(tavily_url)
+
+    every = [seconds for values in latencies.values() for seconds in values]
+    report: Dict[str, Any] = {
+        kind: {
+            "queries": len(values),
+            "mean_ms": round(statistics.mean(values) * 1000, 1),
+            "p50_ms": round(statistics.median(values) * 1000, 1),
+        }
+        for kind, values in latencies.items() if values
+    }
+    report["all"] = {"queries": len(every), "mean_ms": round(statistics.mean(every) * 1000, 1)}
+    report["upstream_requests"] = {name: after[name] - before[name] for name in after}
+    if runtime.prefetcher is not None:
+        report["prefetch"] = runtime.prefetcher.stats.model_dump()
+    return report
+
+async def run(tavily_url: str, args: argparse.Namespace) -> Dict[str, Any]:
+    return {
+        "off": await run_mode(False, tavily_url, args),
+        "on": await run_mode(True, tavily_url, args),
+    }
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--queries", type=int, default=40, help="Queries per mode, cycling through the kinds"
+    )
+    parser.add_argument("--llm-latency", type=float, default=0.4, help="Seconds per model call")
+    parser.add_argument(
+        "--tool-latency", type=float, default=0.3, help="Seconds per Tavily or weather request"
+    )
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    # In-process servers log every call
+    logging.disable(logging.WARNING)
+    with FakeTavilyServer(FakeTavilyConfig(latency=args.tool_latency)) as tavily:
+        os.environ.update({
+            "TAVILY_API_KEY": "benchmark",
+            "TAVILY_BASE_URL": tavily.url,
+            "TAVILY_CACHE_TTL": "0",
+            "WEATHER_PROVIDER": "fake",
+            "WEATHER_FAKE_LATENCY": str(args.tool_latency),
+            "WEATHER_CACHE_TTL": "0",
+        })
+        report = asyncio.run(run(tavily.url, args))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        pathlib.Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
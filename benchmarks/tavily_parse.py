@@ -0,0 +1,155 @@
+"""Memory and latency of parsing Tavily responses: buffered versus streamed.
+
+Runs concurrent searches against the fake Tavily API, serving large
+responses (many results with raw content, and a long answer), two ways:
+
+- buffered: the previous implementation, which asks for the answer, reads
+  the whole body with response.json() and builds a SearchResult model per
+  result
+- streamed: TavilySearchClient, which parses the results as the body
+  streams in, keeps only title, url and content, and validates once
+
+For each it reports peak memory allocated while the searches run (traced
+with tracemalloc, in a separate pass since tracing slows everything down),
+mean latency per search and throughput.
+
+    python benchmarks/tavily_parse.py
+    python benchmarks/tavily_parse.py --concurrency 64 --results 20 --raw-content-bytes 100000
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import pathlib
+import sys
+import time
+import tracemalloc
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+BENCHMARKS_DIR = pathlib.Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARKS_DIR.parent / "src"))
+sys.path.insert(0, str(BENCHMARKS_DIR))
+
+from fake_tavily import FakeTavilyConfig, FakeTavilyServer  # noqa: E402
+
+from mcpserver.tavily import HttpClientConfig, SearchResponse, SearchResult, TavilySearchClient  # noqa: E402
+
+
+def buffered_search(client: TavilySearchClient) -> Callable[[str, int], Awaitable[SearchResponse]]:
+    """The previous implementation of a search: the whole body, then a model per result"""
+
+    async def search(query: str, max_results: int) -> SearchResponse:
+        payload = {
+            "query": query,
+            "search_depth": "advanced",
+            "include_answer": True,
+            "include_images": False,
+            "max_results": max_results,
+        }
+        response = await client._http.post("/search", json=payload)
+        response.raise_for_status()
+        data = response.json()
+        results = []
+        for result in data.get("results", []):
+            results.append(SearchResult(
+                title=result.get("title", ""),
+                url=result.get("url", ""),
+                content=result.get("content", ""),
+            ))
+        return SearchResponse(results=results)
+
+    return search
+
+async def run_searches(search, args: argparse.Namespace) -> List[float]:
+    latencies: List[float] = []
+    remaining = args.searches
+
+    async def worker(index: int) -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            response = await search(f"query {index} {remaining}", args.results)
+            latencies.append(time.perf_counter() - started)
+            assert len(response.results) == args.results
+
+    await asyncio.gather(*(worker(index) for index in range(args.concurrency)))
+    return latencies
+
+async def measure(mode: str, base_url: str, args: argparse.Namespace) -> Dict[str, Any]:
+    config = HttpClientConfig(
+        base_url=base_url,
+        max_connections=args.concurrency,
+        max_keepalive_connections=args.concurrency,
+    )
+    async with TavilySearchClient("benchmark", config=config) as client:
+        search = buffered_search(client) if mode == "buffered" else client.search
+        # Warm up the connection pool
+        warmup = argparse.Namespace(**{**vars(args), "searches": args.concurrency})
+        await run_searches(search, warmup)
+
+        started = time.perf_counter()
+        latencies = await run_searches(search, args)
+        elapsed = time.perf_counter() - started
+
+        gc.collect()
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        sample = argparse.Namespace(**{**vars(args), "searches": args.concurrency * 2})
+        await run_searches(search, sample)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        "peak_memory_kb": round((peak - baseline) / 1024, 1),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+        "searches_per_second": round(args.searches / elapsed, 1),
+    }
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--searches", type=int, default=400, help="Searches per mode for the timing pass"
+    )
+    parser.add_argument("--concurrency", type=int, default=32, help="Searches in flight")
+    parser.add_argument("--results", type=int, default=10, help="max_results of each search")
+    parser.add_argument(
+        "--content-bytes", type=int, default=2000, help="Size of each result's content"
+    )
+    parser.add_argument(
+        "--raw-content-bytes", type=int, default=20000, help="Size of each result's raw content"
+    )
+    parser.add_argument("--answer-bytes", type=int, default=4000, help="Size of the answer")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    logging.disable(logging.WARNING)
+    os.environ["METRICS_ENABLED"] = "false"
+    tavily_config = FakeTavilyConfig(
+        latency=0,
+        results=args.results,
+        content_bytes=args.content_bytes,
+        raw_content_bytes=args.raw_content_bytes,
+        answer_bytes=args.answer_bytes,
+    )
+    with FakeTavilyServer(tavily_config) as tavily:
+        report = {
+            mode: asyncio.run(measure(mode, tavily.url, args))
+            for mode in ("buffered", "streamed")
+        }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        pathlib.Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""Fault-injection benchmark of the Tavily client's rate limiting, retries and circuit breaker.
+
+Runs concurrent searches with the Tavily server's client against
+benchmarks/fake_tavily.py while the fake API fails a fraction of requests,
+once with the default resilience settings and once with them disabled
+(no retries, no circuit breaker), and reports for each:
+
+- success rate and p50/p95 latency of the searches
+- upstream requests, retries, 429s and fast-failed requests
+- the concurrency limit the client settled on
+
+The outage scenario fails every request after the cache has been warmed,
+to show stale results being served while the circuit is open.
+
+    python benchmarks/upstream_faults.py
+    python benchmarks/upstream_faults.py --searches 500 --concurrency 50 --scenarios rate_limited
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import pathlib
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+BENCHMARKS_DIR = pathlib.Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARKS_DIR.parent / "src"))
+
+from fake_tavily import FakeTavilyConfig, FakeTavilyServer  # noqa: E402
+
+from mcpserver.cache import CacheConfig, ResponseCache  # noqa: E402
+from mcpserver.resilience import ResilienceConfig  # noqa: E402
+from mcpserver.tavily import HttpClientConfig, TavilySearchClient  # noqa: E402
+
+# Fault settings of the fake API per scenario
+SCENARIOS: Dict[str, Dict[str, Any]] = {
+    "healthy": {},
+    "rate_limited": {"error_rate": 0.3, "error_status": 429, "retry_after": 0.2},
+    "flaky": {"error_rate": 0.2, "error_status": 503},
+    "outage": {"error_rate": 1.0, "error_status": 503},
+}
+
+# Resilience settings compared in each scenario
+CLIENTS = {
+    "guarded": ResilienceConfig(retry_base_delay=0.05, retry_max_delay=2.0, breaker_reset=5.0),
+    "unguarded": ResilienceConfig(retries=0, breaker_threshold=0, max_concurrency=1000),
+}
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+
+async def run_scenario(
+    url: str,
+    fake: FakeTavilyConfig,
+    faults: Dict[str, Any],
+    resilience: ResilienceConfig,
+    args: argparse.Namespace,
+) -> Dict[str, Any]:
+    cache = ResponseCache(CacheConfig(ttl=0.001 if faults.get("error_rate") == 1.0 else 0))
+    client = TavilySearchClient(
+        "benchmark",
+        config=HttpClientConfig(base_url=url, max_connections=1000, max_keepalive_connections=100),
+        cache=cache,
+        resilience=resilience,
+    )
+    queries = [f"query {index % args.distinct_queries}" for index in range(args.searches)]
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies: List[float] = []
+    outcomes = {"ok": 0, "stale": 0, "failed": 0}
+
+    async def one(query: str) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await client.search(query, 5)
+                outcomes["stale" if response.stale else "ok"] += 1
+            except Exception:
+                outcomes["failed"] += 1
+            latencies.append(time.perf_counter() - started)
+
+    async with client:
+        if faults.get("error_rate") == 1.0:
+            # Warm the cache while healthy; entries expire at once but stay available as stale
+            fake.error_rate = 0.0
+            await asyncio.gather(
+                *(client.search(f"query {index}", 5) for index in range(args.distinct_queries))
+            )
+            await asyncio.sleep(0.01)
+
+        for key, value in faults.items():
+            setattr(fake, key, value)
+        started = time.perf_counter()
+        await asyncio.gather(*(one(query) for query in queries))
+        elapsed = time.perf_counter() - started
+        guard = client.guard.snapshot()
+
+    return {
+        **outcomes,
+        "success_rate": round((outcomes["ok"] + outcomes["stale"]) / len(queries), 3),
+        "p50_ms": percentile(latencies, 0.5),
+        "p95_ms": percentile(latencies, 0.95),
+        "elapsed_s": round(elapsed, 2),
+        "upstream": guard.model_dump(),
+    }
+
+async def run(url: str, fake: FakeTavilyConfig, args: argparse.Namespace) -> Dict[str, Any]:
+    report: Dict[str, Any] = {}
+    for scenario in args.scenarios:
+        report[scenario] = {}
+        for name, resilience in CLIENTS.items():
+            fake.error_rate, fake.error_status, fake.retry_after = 0.0, 503, None
+            report[scenario][name] = await run_scenario(
+                url, fake, SCENARIOS[scenario], resilience, args
+            )
+    return report
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument(
+        "--searches", type=int, default=200, help="Searches per scenario and client"
+    )
+    parser.add_argument("--concurrency", type=int, default=20, help="Searches in flight at once")
+    parser.add_argument(
+        "--distinct-queries", type=int, default=20, help="Distinct queries among the searches"
+    )
+    parser.add_argument(
+        "--tavily-latency", type=float, default=0.05, help="Fake Tavily API latency in seconds"
+    )
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    # Every retry and stale result logs a warning, which would drown the report
+    logging.disable(logging.WARNING)
+    fake = FakeTavilyConfig(latency=args.tavily_latency)
+    with FakeTavilyServer(fake) as tavily:
+        report = asyncio.run(run(tavily.url, fake, args))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        pathlib.Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
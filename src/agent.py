@@ -1,158 +1,837 @@
+import argparse
 import asyncio
+import atexit
 import os
-import sys
 import pathlib
 import signal
-import atexit
-from typing import Dict, Any, List, Optional
+import sys
+import time
+import weakref
+from contextlib import AsyncExitStack, nullcontext
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
 from langchain_mcp_adapters.client import MultiServerMCPClient
-from langgraph.prebuilt import create_react_agent
-from langchain_core.messages import SystemMessage, HumanMessage
-from langchain_openai import ChatOpenAI
-from dotenv import load_dotenv
+from langchain_mcp_adapters.prompts import load_mcp_prompt
+from langchain_mcp_adapters.resources import load_mcp_resources
+from langchain_mcp_adapters.tools import convert_mcp_tool_to_langchain_tool
 
-load_dotenv()
+from answers import AnswerCache
+from mcpclient import (
+    SPAWNED_PROCESSES,
+    ManagedServer,
+    ReplicaSet,
+    ToolSchemaCache,
+    WarmServerPool,
+    parse_overrides,
+    process_group,
+    remote_connection,
+    signal_process,
+)
+from mcpserver.metrics import (
+    AGENT_QUERY_DURATION,
+    LLM_STEP_DURATION,
+    METRICS,
+    TIME_TO_FIRST_TOKEN,
+    TIME_TO_FIRST_TOOL_RESULT,
+    MetricsRegistry,
+)
+from prefetch import Prefetcher
+from supervisor import ServerSupervisor, SupervisorConfig
 
 # Get the absolute path to the src directory
 SRC_DIR = str(pathlib.Path(__file__).parent.absolute())
 
-# Store active processes for cleanup
-active_processes: List[asyncio.subprocess.Process] = []
+# Where lazily started servers keep their tool schemas between runs (AGENT_TOOL_CACHE)
+DEFAULT_TOOL_CACHE = "~/.cache/langchain-mcp/tool-schemas.json"
+
+# Characters of a tool's output included in streamed tool_end events
+STREAM_PREVIEW_CHARS = 500
+
+# Store active processes for cleanup (every stdio server subprocess, recorded by mcpclient)
+active_processes: List[Any] = SPAWNED_PROCESSES
 # Track if cleanup has already been called
 _cleanup_called = False
 
+def process_exited(pid: int) -> bool:
+    """Whether a child process has exited, reaping it if so"""
+    if not hasattr(os, "WNOHANG"):
+        # Can't tell without the event loop (Windows); it is killed after the grace period
+        return False
+    try:
+        return os.waitpid(pid, os.WNOHANG)[0] != 0
+    except ChildProcessError:
+        # Already reaped
+        return True
+
 # Graceful shutdown function
-def cleanup_processes():
-    """Terminate all active subprocesses gracefully."""
+def cleanup_processes(grace: Optional[float] = None):
+    """Terminate all active subprocesses: SIGTERM, then SIGKILL after grace seconds."""
     global _cleanup_called
-    
+
     # Only run cleanup once
     if _cleanup_called:
         return
-        
+
     _cleanup_called = True
-    print("\nShutting down MCP servers...")
+    if grace is None:
+        grace = SupervisorConfig.from_env().stop_grace
+    print("\nShutting down MCP servers...", file=sys.stderr)
+    # Process groups, so workers of a server are stopped along with it
+    running = {}
     for process in active_processes:
         if process and process.returncode is None:
             try:
                 # Try to terminate gracefully
-                process.terminate()
+                running[process.pid] = process_group(process.pid)
+                signal_process(process.pid, signal.SIGTERM, running[process.pid])
             except Exception as e:
-                print(f"Error terminating process: {e}")
-    print("Shutdown complete.")
+                print(f"Error terminating process: {e}", file=sys.stderr)
 
-# Register cleanup function at exit
-atexit.register(cleanup_processes)
+    deadline = time.monotonic() + grace
+    while running and time.monotonic() < deadline:
+        running = {pid: pgid for pid, pgid in running.items() if not process_exited(pid)}
+        if running:
+            time.sleep(0.05)
+    for pid, pgid in running.items():
+        print(
+            f"MCP server process {pid} still running after {grace:g}s, killing it",
+            file=sys.stderr,
+        )
+        signal_process(pid, getattr(signal, "SIGKILL", signal.SIGTERM), pgid)
+    print("Shutdown complete.", file=sys.stderr)
 
 # Handle keyboard interrupts
 def signal_handler(sig, frame):
     """Handle SIGINT and SIGTERM signals."""
-    print("\nReceived termination signal. Cleaning up...")
+    print("\nReceived termination signal. Cleaning up...", file=sys.stderr)
     cleanup_processes()
     sys.exit(0)
 
-# Register signal handlers
-signal.signal(signal.SIGINT, signal_handler)
-signal.signal(signal.SIGTERM, signal_handler)
+def install_process_handlers():
+    """Register the exit and signal handlers; only done by the entry point, not on import"""
+    atexit.register(cleanup_processes)
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+
+def load_agent_factories() -> Tuple[Callable, Callable]:
+    """Import the chat model and graph builder.
+
+    These are the slowest imports of the agent (about a second, mostly the
+    OpenAI SDK), so they are deferred until an agent is actually built.
+    """
+    from langchain_openai import ChatOpenAI
+    from langgraph.prebuilt import create_react_agent
+    return ChatOpenAI, create_react_agent
+
+SYSTEM_PROMPT = (
+    "You have access to multiple tools that can help answer queries. "
+    "Use them dynamically and efficiently based on the user's request. "
+    "The Tavily tools can search the web or recent news, "
+    "giving you access to up-to-date information. "
+    "For the weather in a location, use the get_weather tool, "
+    "or get_weather_many for several locations. "
+    "For other current information, like news or currency exchange rates, "
+    "always use the Tavily search_web or search_news tools to get the most recent data. "
+    "When a question needs several searches, make a single search_web_batch or "
+    "search_news_batch call with all the queries instead of separate calls."
+)
+
+class LLMStepTimer(AsyncCallbackHandler):
+    """Callback handler timing each chat model call of the agent"""
+
+    def __init__(self, registry: MetricsRegistry):
+        self.registry = registry
+        self._spans: Dict[UUID, Any] = {}
+
+    async def on_chat_model_start(
+        self, serialized, messages, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model") or params.get("model_name") or params.get("_type", "unknown")
+        span = self.registry.span(LLM_STEP_DURATION, model=str(model))
+        span.__enter__()
+        self._spans[run_id] = span
+
+    async def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any) -> None:
+        span = self._spans.pop(run_id, None)
+        if span is not None:
+            span.__exit__(None, None, None)
+
+    async def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        span = self._spans.pop(run_id, None)
+        if span is not None:
+            span.__exit__(type(error), error, None)
 
 class ProcessTrackingClient(MultiServerMCPClient):
-    """Subclass to track subprocess handles."""
-    
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.server_processes = []
-    
-    async def _start_server(self, name, server_config):
-        proc = await super()._start_server(name, server_config)
-        active_processes.append(proc)
-        return proc
-    
-    async def close(self):
-        await super().close()
-        # Don't clear process list here, let the cleanup function handle it
-
-async def run_agent():
+    """Subclass to track and supervise the MCP servers.
+
+    Every server is wrapped in a ManagedServer. Servers start eagerly (and
+    concurrently) by default. With lazy=True, a server whose tool schemas
+    are cached is only started on the first call to one of its tools. With
+    idle_timeout, servers idle that long are stopped and restarted on demand.
+    warm_pool_size keeps that many pre-started subprocesses per server ready
+    to hand out.
+
+    Tool calls the model makes in one turn run concurrently. max_in_flight
+    caps concurrent calls per server and tool_timeouts bounds each call, by
+    tool name, then server name, with "*" as the default (see
+    parse_overrides). A call that times out or is cancelled is also
+    cancelled on the server.
+
+    A connection with a "replicas" list of connections is served by a
+    ReplicaSet, which balances calls over the replicas and health-checks
+    them every health_interval seconds.
+
+    The other servers are watched by a ServerSupervisor, configured by
+    supervisor: it restarts servers that hang or crash and recycles ones
+    that grow too large. Stopping servers get supervisor.stop_grace seconds
+    to exit once their input is closed, then SIGTERM, and SIGKILL after as
+    long again.
+    """
+
+    def __init__(
+        self,
+        connections: Optional[Dict[str, Dict[str, Any]]] = None,
+        *,
+        lazy: bool = False,
+        idle_timeout: Optional[float] = None,
+        warm_pool_size: int = 0,
+        tool_cache_path: Optional[str] = None,
+        max_in_flight: Optional[Dict[str, float]] = None,
+        tool_timeouts: Optional[Dict[str, float]] = None,
+        health_interval: float = 10.0,
+        supervisor: Optional[SupervisorConfig] = None,
+    ):
+        super().__init__(connections)
+        self.lazy = lazy
+        self.idle_timeout = idle_timeout or None
+        self.warm_pool = WarmServerPool(warm_pool_size) if warm_pool_size > 0 else None
+        self.tool_cache = ToolSchemaCache(
+            tool_cache_path or os.environ.get("AGENT_TOOL_CACHE", DEFAULT_TOOL_CACHE),
+            source_dir=os.path.join(SRC_DIR, "mcpserver"),
+        )
+        self.max_in_flight = max_in_flight or {}
+        self.tool_timeouts = tool_timeouts or {}
+        self.health_interval = health_interval
+        self.supervisor_config = supervisor or SupervisorConfig()
+        self.servers: Dict[str, Any] = {}
+        self.supervisor: Optional[ServerSupervisor] = None
+
+    def server_timeouts(self, server_name: str) -> Dict[str, float]:
+        """Tool timeouts of one server: its own timeout, if set, is the default of its tools"""
+        timeouts = dict(self.tool_timeouts)
+        if server_name in timeouts:
+            timeouts["*"] = timeouts[server_name]
+        return timeouts
+
+    async def __aenter__(self) -> "ProcessTrackingClient":
+        try:
+            for name, connection in self.connections.items():
+                limit = self.max_in_flight.get(name, self.max_in_flight.get("*"))
+                if "replicas" in connection:
+                    # The in-flight limit applies to each replica
+                    self.servers[name] = ReplicaSet(
+                        name,
+                        connection["replicas"],
+                        health_interval=self.health_interval,
+                        idle_timeout=self.idle_timeout,
+                        max_in_flight=int(limit) if limit else None,
+                        tool_timeouts=self.server_timeouts(name),
+                    )
+                    continue
+                self.servers[name] = ManagedServer(
+                    name,
+                    connection,
+                    self.idle_timeout,
+                    self.warm_pool,
+                    max_in_flight=int(limit) if limit else None,
+                    tool_timeouts=self.server_timeouts(name),
+                    stop_grace=self.supervisor_config.stop_grace,
+                )
+
+            schemas = {
+                name: self.tool_cache.get(name, connection) if self.lazy else None
+                for name, connection in self.connections.items()
+            }
+
+            # Start the servers whose tools aren't known yet, all at once
+            to_start = [name for name, tools in schemas.items() if tools is None]
+            listed = await asyncio.gather(*(self.servers[name].list_tools() for name in to_start))
+            for name, tools in zip(to_start, listed):
+                schemas[name] = tools
+                if self.lazy:
+                    self.tool_cache.put(name, self.connections[name], tools)
+
+            for name, tools in schemas.items():
+                self.server_name_to_tools[name] = [
+                    convert_mcp_tool_to_langchain_tool(self.servers[name], tool) for tool in tools
+                ]
+
+            if self.warm_pool is not None:
+                for name, connection in self.connections.items():
+                    self.warm_pool.fill(name, connection)
+
+            managed = {
+                name: server
+                for name, server in self.servers.items()
+                if isinstance(server, ManagedServer)
+            }
+            self.supervisor = ServerSupervisor(managed, self.supervisor_config)
+            self.supervisor.start()
+            return self
+        except BaseException:
+            await self.__aexit__(None, None, None)
+            raise
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        if self.supervisor is not None:
+            await self.supervisor.stop()
+        await asyncio.gather(*(server.stop() for server in self.servers.values()))
+        if self.warm_pool is not None:
+            await self.warm_pool.close()
+        await self.exit_stack.aclose()
+
+    async def get_prompt(
+        self, server_name: str, prompt_name: str, arguments: Optional[Dict[str, Any]]
+    ):
+        session = await self.servers[server_name].session()
+        return await load_mcp_prompt(session, prompt_name, arguments)
+
+    async def get_resources(self, server_name: str, uris=None):
+        session = await self.servers[server_name].session()
+        return await load_mcp_resources(session, uris)
+
+# Server modules under src/mcpserver, by logical server name
+SERVER_MODULES = {
+    "weather": "mcpserver.weather",
+    "tavily": "mcpserver.tavily",
+    "math": "mcpserver.math_server",
+}
+
+# Prefixes of the environment variables each server reads its settings from;
+# stdio servers only see these (plus what the config sets), not the whole environment
+SERVER_ENV_PREFIXES = {
+    "weather": "WEATHER_",
+    "tavily": "TAVILY_",
+    "math": "MATH_",
+}
+
+# Settings read by every server (instrumentation and the shared runtime)
+SHARED_ENV_PREFIXES = ("METRICS_", "OTEL_", "MCP_")
+
+def server_env(server_name: str, **env: str) -> Dict[str, str]:
+    """Environment for a stdio server: its own and the shared settings of this process, then env"""
+    prefixes = (SERVER_ENV_PREFIXES[server_name], *SHARED_ENV_PREFIXES)
+    forwarded = {key: value for key, value in os.environ.items() if key.startswith(prefixes)}
+    return {**forwarded, **env}
+
+def client_options_from_env() -> Dict[str, Any]:
+    """ProcessTrackingClient lifecycle and tool call options from AGENT_* environment variables"""
+    return {
+        "lazy": os.environ.get("AGENT_LAZY_SERVERS", "").lower() in ("1", "true", "yes"),
+        "idle_timeout": float(os.environ.get("AGENT_IDLE_TIMEOUT", 0)) or None,
+        "warm_pool_size": int(os.environ.get("AGENT_WARM_POOL_SIZE", 0)),
+        "max_in_flight": parse_overrides(os.environ.get("AGENT_MAX_IN_FLIGHT", "")),
+        "tool_timeouts": parse_overrides(os.environ.get("AGENT_TOOL_TIMEOUT", "60")),
+        "health_interval": float(os.environ.get("AGENT_HEALTH_INTERVAL", 10)),
+        "supervisor": SupervisorConfig.from_env(),
+    }
+
+def in_process_servers_from_env() -> List[str]:
+    """Names of the servers to run in-process, from AGENT_IN_PROCESS_SERVERS (comma separated)"""
+    value = os.environ.get("AGENT_IN_PROCESS_SERVERS", "")
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+def prefetch_from_env() -> bool:
+    """Whether AGENT_PREFETCH (default false) turns on speculative tool calls"""
+    return os.environ.get("AGENT_PREFETCH", "").lower() in ("1", "true", "yes")
+
+def remote_servers_from_env() -> Dict[str, List[str]]:
+    """Replica URLs per server from comma separated AGENT_REMOTE_<NAME>, e.g. AGENT_REMOTE_TAVILY"""
+    remote = {}
+    for name in SERVER_MODULES:
+        value = os.environ.get(f"AGENT_REMOTE_{name.upper()}", "")
+        urls = [url.strip() for url in value.split(",") if url.strip()]
+        if urls:
+            remote[name] = urls
+    return remote
+
+def build_server_config(
+    tavily_api_key: str,
+    in_process: Iterable[str] = (),
+    remote: Optional[Dict[str, List[str]]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Define MCP servers configuration with absolute Python path.
+
+    Servers named in in_process run inside the agent's event loop instead of
+    as stdio subprocesses. That skips an interpreter start and JSON-RPC over
+    pipes, at the cost of sharing the agent's process and environment.
+
+    Servers in remote are reached over HTTP at one or more replica URLs
+    instead; they read their settings (e.g. TAVILY_API_KEY) from their own
+    environment.
+    """
+    in_process = set(in_process)
+    remote = remote or {}
+    unknown = (in_process | remote.keys()) - SERVER_MODULES.keys()
+    if unknown:
+        raise ValueError(f"Unknown MCP server(s): {', '.join(sorted(unknown))}")
+    both = in_process & remote.keys()
+    if both:
+        raise ValueError(f"MCP server(s) both in-process and remote: {', '.join(sorted(both))}")
+
+    config = {
+        "weather": {
+            "command": sys.executable,
+            "args": [
+                "-c",
+                f"import sys; sys.path.insert(0, '{SRC_DIR}'); "
+                "from mcpserver.weather import run_server; run_server()",
+            ],
+            "transport": "stdio",
+            "env": server_env("weather", PYTHONPATH=SRC_DIR),
+        },
+        "tavily": {
+            "command": sys.executable,
+            "args": [
+                "-c",
+                f"import sys; sys.path.insert(0, '{SRC_DIR}'); "
+                "from mcpserver.tavily import run_server; run_server()",
+            ],
+            "transport": "stdio",
+            "env": server_env(
+                "tavily",
+                TAVILY_API_KEY=tavily_api_key,
+                PATH=os.environ.get("PATH", ""),
+                HOME=os.environ.get("HOME", ""),
+                PYTHONPATH=SRC_DIR,
+            ),
+        },
+        "math": {
+            "command": sys.executable,
+            "args": [
+                "-c",
+                f"import sys; sys.path.insert(0, '{SRC_DIR}'); "
+                "from mcpserver.math_server import run_server; run_server()",
+            ],
+            "transport": "stdio",
+            "env": server_env("math", PYTHONPATH=SRC_DIR),
+        },
+    }
+    for name in in_process:
+        config[name] = {"transport": "in_process", "module": SERVER_MODULES[name]}
+    for name, urls in remote.items():
+        config[name] = {"replicas": [remote_connection(url) for url in urls]}
+    return config
+
+class AgentRuntime:
+    """MCP sessions, tools and the compiled agent graph, kept alive across queries.
+
+    Use as an async context manager. ``ask`` can be called concurrently; at
+    most ``max_concurrency`` queries run at once and the rest wait.
+    """
+
+    def __init__(
+        self,
+        tavily_api_key: str,
+        model_name: str = "gpt-4o-mini",
+        max_concurrency: int = 8,
+        in_process: Optional[Iterable[str]] = None,
+        model: Optional[Any] = None,
+        remote: Optional[Dict[str, List[str]]] = None,
+        prefetch: Optional[bool] = None,
+    ):
+        self.tavily_api_key = tavily_api_key
+        # A prebuilt chat model replaces ChatOpenAI(model_name), e.g. for offline benchmarks
+        self.model = model
+        self.in_process = list(in_process_servers_from_env() if in_process is None else in_process)
+        self.remote = remote_servers_from_env() if remote is None else remote
+        self.model_name = model_name
+        self.max_concurrency = max_concurrency
+        self.system_message = SystemMessage(content=SYSTEM_PROMPT)
+        self.callbacks = [LLMStepTimer(METRICS)] if METRICS.enabled else []
+        # Starts the likely first tool call of a query alongside the first model call
+        if prefetch is None:
+            prefetch = prefetch_from_env()
+        self.prefetcher = Prefetcher() if prefetch else None
+        self.client: Optional[ProcessTrackingClient] = None
+        self.tools = []
+        self.agent = None
+        # Final answers of repeated queries, when AGENT_ANSWER_CACHE_TTL is set
+        self.answers: Optional[AnswerCache] = None
+        # Sessions use a second graph, with a checkpointer and bounded memory, built on first use
+        self.memory = None
+        self._session_agent = None
+        self._session_agent_lock = asyncio.Lock()
+        self._session_locks: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
+        self._chat_model = None
+        self._create_agent: Optional[Callable[..., Any]] = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._exit_stack = AsyncExitStack()
+
+    async def __aenter__(self) -> "AgentRuntime":
+        # Import the model and graph modules on a thread while the servers start
+        factories = asyncio.ensure_future(asyncio.to_thread(load_agent_factories))
+        try:
+            self.client = await self._exit_stack.enter_async_context(
+                ProcessTrackingClient(
+                    build_server_config(self.tavily_api_key, self.in_process, self.remote),
+                    **client_options_from_env(),
+                )
+            )
+            ChatOpenAI, create_react_agent = await factories
+
+            # Initialize LLM
+            model = self.model if self.model is not None else ChatOpenAI(model=self.model_name)
+
+            # Load available tools
+            self.tools = self.client.get_tools()
+            if self.prefetcher is not None:
+                self.tools = self.prefetcher.wrap(self.tools)
+            self.agent = create_react_agent(model, self.tools)
+            self._chat_model = model
+            self._create_agent = create_react_agent
+            self.answers = AnswerCache.from_env(SYSTEM_PROMPT, self.tools)
+            if self.answers is not None:
+                self._exit_stack.callback(self.answers.close)
+        except BaseException:
+            factories.cancel()
+            await self._exit_stack.aclose()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self._exit_stack.aclose()
+        self.client = None
+        self.agent = None
+        self.answers = None
+        self.memory = None
+        self._session_agent = None
+
+    async def session_agent(self):
+        """The graph answering session turns, opening the session store on first use"""
+        if self.agent is None:
+            raise RuntimeError("AgentRuntime is not started")
+        async with self._session_agent_lock:
+            if self._session_agent is None:
+                from memory import ConversationMemory, MemoryConfig, open_checkpointer
+
+                config = MemoryConfig.from_env()
+                checkpointer = await self._exit_stack.enter_async_context(
+                    open_checkpointer(config.path)
+                )
+                self.memory = ConversationMemory(config, self._chat_model, checkpointer)
+                # The system prompt is added to every model call rather than stored in each session
+                self._session_agent = self._create_agent(
+                    self._chat_model,
+                    self.tools,
+                    prompt=self.system_message,
+                    checkpointer=checkpointer,
+                    pre_model_hook=self.memory.pre_model_hook,
+                )
+            return self._session_agent
+
+    async def _invocation(
+        self, query: str, session_id: Optional[str]
+    ) -> Tuple[Any, Dict[str, Any], Dict[str, Any]]:
+        """The graph, input and config answering query, alone or as the next turn of a session"""
+        if self.agent is None:
+            raise RuntimeError("AgentRuntime is not started")
+        config: Dict[str, Any] = {"callbacks": self.callbacks}
+        if session_id is None:
+            messages = [self.system_message, HumanMessage(content=query)]
+            return self.agent, {"messages": messages}, config
+        config["configurable"] = {"thread_id": session_id}
+        return await self.session_agent(), {"messages": [HumanMessage(content=query)]}, config
+
+    def _session_lock(self, session_id: Optional[str]):
+        """Serializes the turns of a session, whose checkpoints would otherwise fork"""
+        if session_id is None:
+            return nullcontext()
+        lock = self._session_locks.get(session_id)
+        if lock is None:
+            lock = self._session_locks[session_id] = asyncio.Lock()
+        return lock
+
+    def _speculate(self, query: str):
+        """Prefetches the likely first tool call of query, if prefetch is on"""
+        if self.prefetcher is None:
+            return nullcontext()
+        return self.prefetcher.speculate(query)
+
+    async def end_session(self, session_id: str) -> None:
+        """Forget a session's history"""
+        await self.session_agent()
+        async with self._session_lock(session_id):
+            await self.memory.delete(session_id)
+
+    async def ask(self, query: str, session_id: Optional[str] = None) -> str:
+        """Answer one query and return the final message content.
+
+        With a session_id, the query continues that session's conversation.
+        Otherwise, with the answer cache on, repeated queries are answered
+        from it and concurrent identical ones share one agent run.
+        """
+        if session_id is None and self.answers is not None:
+            return await self.answers.get_or_answer(query, lambda: self._invoke(query, None))
+        messages = await self._invoke(query, session_id)
+        return messages[-1].content
+
+    async def _invoke(self, query: str, session_id: Optional[str]) -> List[Any]:
+        """Run the agent graph on query and return the messages of the run"""
+        agent, agent_input, config = await self._invocation(query, session_id)
+
+        async with self._session_lock(session_id), self._semaphore, self._speculate(query):
+            with METRICS.span(AGENT_QUERY_DURATION):
+                agent_response = await agent.ainvoke(agent_input, config=config)
+            if session_id is not None:
+                await self.memory.prune(session_id)
+        return agent_response["messages"]
+
+    async def stream(
+        self, query: str, session_id: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Answer one query, yielding events as they happen; session_id as for ask().
+
+        Events are dicts with a "type" of:
+        - tool_start: tool, id, input
+        - tool_end: tool, id, elapsed_ms, error, output (truncated to STREAM_PREVIEW_CHARS)
+        - token: content, a piece of the model's answer
+        - answer: content, elapsed_ms, time_to_first_token_ms, time_to_first_tool_result_ms
+          (last event)
+        """
+        agent, agent_input, config = await self._invocation(query, session_id)
+
+        async with self._session_lock(session_id), self._semaphore, self._speculate(query):
+            started = time.perf_counter()
+            first_token: Optional[float] = None
+            first_tool_result: Optional[float] = None
+            running_tools: Dict[str, Tuple[str, float]] = {}
+            answer = ""
+
+            def tool_end(run_id: str, output: Any, error: bool) -> Dict[str, Any]:
+                nonlocal first_tool_result
+                now = time.perf_counter()
+                if first_tool_result is None:
+                    first_tool_result = now - started
+                    METRICS.record(TIME_TO_FIRST_TOOL_RESULT, first_tool_result)
+                name, tool_started = running_tools.pop(run_id)
+                return {
+                    "type": "tool_end",
+                    "tool": name,
+                    "id": run_id,
+                    "elapsed_ms": round((now - tool_started) * 1000, 1),
+                    "output": str(getattr(output, "content", output))[:STREAM_PREVIEW_CHARS],
+                    "error": error,
+                }
+
+            with METRICS.span(AGENT_QUERY_DURATION):
+                async for event in agent.astream_events(agent_input, config=config, version="v2"):
+                    kind = event["event"]
+                    if kind == "on_tool_start":
+                        running_tools[event["run_id"]] = (event["name"], time.perf_counter())
+                        yield {
+                            "type": "tool_start",
+                            "tool": event["name"],
+                            "id": event["run_id"],
+                            "input": event["data"].get("input"),
+                        }
+                    elif kind == "on_tool_end" and event["run_id"] in running_tools:
+                        yield tool_end(event["run_id"], event["data"].get("output"), error=False)
+                    elif kind == "on_chat_model_stream":
+                        if event.get("metadata", {}).get("langgraph_node") == "pre_model_hook":
+                            # The session history being summarized, not the answer
+                            continue
+                        content = event["data"]["chunk"].content
+                        if isinstance(content, str) and content:
+                            if first_token is None:
+                                first_token = time.perf_counter() - started
+                                METRICS.record(TIME_TO_FIRST_TOKEN, first_token)
+                            yield {"type": "token", "content": content}
+                    elif kind == "on_chain_end":
+                        output = event["data"].get("output")
+                        messages = output.get("messages", []) if isinstance(output, dict) else []
+                        if not event["parent_ids"]:
+                            # The graph itself finished; its last message is the answer
+                            answer = messages[-1].content if messages else ""
+                            continue
+                        if event["name"] == "pre_model_hook":
+                            # Session history being compacted, which can include old tool errors
+                            continue
+                        # A tool that raised has no on_tool_end event; the tool node
+                        # reports it as an error ToolMessage instead
+                        for message in messages:
+                            if isinstance(message, ToolMessage) and message.status == "error":
+                                run_id = next(
+                                    (
+                                        run_id
+                                        for run_id, (name, _) in running_tools.items()
+                                        if name == message.name
+                                    ),
+                                    None,
+                                )
+                                if run_id is not None:
+                                    yield tool_end(run_id, message.content, error=True)
+            if session_id is not None:
+                await self.memory.prune(session_id)
+
+        def ms(seconds: Optional[float]) -> Optional[float]:
+            return round(seconds * 1000, 1) if seconds is not None else None
+
+        yield {
+            "type": "answer",
+            "content": answer,
+            "elapsed_ms": ms(time.perf_counter() - started),
+            "time_to_first_token_ms": ms(first_token),
+            "time_to_first_tool_result_ms": ms(first_tool_result),
+        }
+
+async def print_stream(runtime: AgentRuntime, query: str, session_id: Optional[str] = None) -> str:
+    """Print tool activity and answer tokens as they arrive; returns the answer"""
+    answer = ""
+    async for event in runtime.stream(query, session_id):
+        if event["type"] == "tool_start":
+            print(f"\n[{event['tool']}] started with {event['input']}", flush=True)
+        elif event["type"] == "tool_end":
+            status = "failed" if event["error"] else "finished"
+            print(f"[{event['tool']}] {status} in {event['elapsed_ms']} ms", flush=True)
+        elif event["type"] == "token":
+            print(event["content"], end="", flush=True)
+        elif event["type"] == "answer":
+            answer = event["content"]
+            print(
+                f"\n\n({event['elapsed_ms']} ms total, "
+                f"first token after {event['time_to_first_token_ms']} ms, "
+                f"first tool result after {event['time_to_first_tool_result_ms']} ms)"
+            )
+    return answer
+
+async def run_agent(
+    stream: bool = False, session_id: Optional[str] = None, prefetch: Optional[bool] = None
+):
     # Get essential environment variables
     tavily_api_key = os.environ.get("TAVILY_API_KEY", "")
-    
+
     if not tavily_api_key:
         print("Error: TAVILY_API_KEY environment variable is not set.")
         return "Tavily API key is not configured. Please set TAVILY_API_KEY in your .env file."
-    
-    # Define MCP servers configuration with absolute Python path
-    async with ProcessTrackingClient(
-        {
-            "weather": {
-                "command": sys.executable,
-                "args": ["-c", f"import sys; sys.path.insert(0, '{SRC_DIR}'); from mcpserver.weather import run_server; run_server()"],
-                "transport": "stdio",
-                "env": {
-                    "PYTHONPATH": SRC_DIR,
-                }
-            },
-            "tavily": {
-                "command": sys.executable,
-                "args": ["-c", f"import sys; sys.path.insert(0, '{SRC_DIR}'); from mcpserver.tavily import run_server; run_server()"],
-                "transport": "stdio",
-                "env": {
-                    "TAVILY_API_KEY": tavily_api_key,
-                    "PATH": os.environ.get("PATH", ""),
-                    "HOME": os.environ.get("HOME", ""),
-                    "PYTHONPATH": SRC_DIR,
-                }
-            }, 
-            "math": {
-                "command": sys.executable,
-                "args": ["-c", f"import sys; sys.path.insert(0, '{SRC_DIR}'); from mcpserver.math_server import run_server; run_server()"],
-                "transport": "stdio",
-                "env": {
-                    "PYTHONPATH": SRC_DIR,
-                }
-            },       
-        }
-    ) as client:
-        # Initialize LLM
-        model = ChatOpenAI(model="gpt-4o-mini")
-        
-        # Load available tools
-        tools = client.get_tools()
-        agent = create_react_agent(model, tools)
-
-        # Define system message
-        system_message = SystemMessage(content=(
-            "You have access to multiple tools that can help answer queries. "
-            "Use them dynamically and efficiently based on the user's request. "
-            "The Tavily tools can search the web or recent news, giving you access to up-to-date information. "
-            "For questions about current information like weather, news, or currency exchange rates, "
-            "always use the Tavily search_web tool to get the most recent data."
-        ))
-
-        # Get user query
+
+    async with AgentRuntime(tavily_api_key, prefetch=prefetch) as runtime:
+        # Get user query; in a session, keep asking until an empty query or end of input
         try:
-            query = input("Query: ")
-            
-            print("Processing your query. This may take a moment...")
-            
-            # Process the query
-            agent_response = await agent.ainvoke({
-                "messages": [system_message, HumanMessage(content=query)]
-            })
-
-            return agent_response["messages"][-1].content
+            while True:
+                query = input("Query: ")
+                if session_id is not None and not query.strip():
+                    return "Session ended."
+
+                if stream:
+                    response = await print_stream(runtime, query, session_id)
+                else:
+                    print("Processing your query. This may take a moment...")
+
+                    # Process the query
+                    response = await runtime.ask(query, session_id)
+                if session_id is None:
+                    return response
+                if not stream:
+                    print(f"\n{response}\n")
         except (KeyboardInterrupt, EOFError):
             print("\nQuery input interrupted. Shutting down...")
             return "Operation cancelled by user."
+        finally:
+            if runtime.prefetcher is not None and runtime.prefetcher.stats.started:
+                print(runtime.prefetcher.stats.describe(), file=sys.stderr)
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="LangGraph agent with MCP tool servers")
+    parser.add_argument("--serve", action="store_true", help="Run as a long-lived HTTP service")
+    parser.add_argument(
+        "--batch",
+        metavar="INPUT",
+        help='Answer the queries in a JSONL file ("-" for stdin), '
+        'one {"id": ..., "query": ...} per line',
+    )
+    parser.add_argument(
+        "--output",
+        metavar="OUTPUT",
+        help="JSONL file batch results are appended to; IDs already in it are skipped "
+        "(default stdout)",
+    )
+    parser.add_argument(
+        "--no-stream",
+        dest="stream",
+        action="store_false",
+        help="Print only the final answer instead of streaming tool activity and tokens",
+    )
+    parser.add_argument(
+        "--session",
+        metavar="ID",
+        help="Hold a multi-turn conversation, remembered under ID across runs; "
+        "an empty query ends it",
+    )
+    parser.add_argument(
+        "--prefetch",
+        action="store_true",
+        default=None,
+        help="Start the likely first tool call of a query alongside the first model call "
+        "(default AGENT_PREFETCH)",
+    )
+    parser.add_argument(
+        "--host", default=os.environ.get("AGENT_HOST", "127.0.0.1"), help="Service host"
+    )
+    parser.add_argument(
+        "--port", type=int, default=int(os.environ.get("AGENT_PORT", 8000)), help="Service port"
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=int(os.environ.get("AGENT_MAX_CONCURRENCY", 8)),
+        help="Queries the service or a batch runs at once; further queries wait",
+    )
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None):
+    """Run the LangGraph MCP agent as a CLI application or HTTP service."""
+    from dotenv import load_dotenv
 
-def main():
-    """Run the LangGraph MCP agent as a CLI application."""
+    load_dotenv()
+    install_process_handlers()
     try:
+        args = parse_args(argv)
+
         # Make sure the src directory is in the Python path
         if SRC_DIR not in sys.path:
             sys.path.insert(0, SRC_DIR)
-            
+
+        if args.serve or args.batch:
+            tavily_api_key = os.environ.get("TAVILY_API_KEY", "")
+            if not tavily_api_key:
+                print("Error: TAVILY_API_KEY environment variable is not set.", file=sys.stderr)
+                return 1
+            runtime = AgentRuntime(
+                tavily_api_key, max_concurrency=args.max_concurrency, prefetch=args.prefetch
+            )
+
+            if args.batch:
+                from batch import print_summary, run_batch_files
+                summary = asyncio.run(
+                    run_batch_files(runtime, args.batch, args.output, args.max_concurrency)
+                )
+                print_summary(summary)
+                return 0
+
+            from service import serve
+            return serve(runtime, args.host, args.port)
+
         print("Starting agent. Press Ctrl+C to exit.")
-        response = asyncio.run(run_agent())
-        print("\nFinal Response:", response)
+        response = asyncio.run(
+            run_agent(stream=args.stream, session_id=args.session, prefetch=args.prefetch)
+        )
+        if not args.stream and args.session is None:
+            print("\nFinal Response:", response)
         return 0
     except KeyboardInterrupt:
         print("\nAgent stopped by user.")
@@ -165,4 +844,4 @@ def main():
         cleanup_processes()
 
 if __name__ == "__main__":
-    exit(main()) 
\ No newline at end of file
+    exit(main())
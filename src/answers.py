@@ -0,0 +1,123 @@
+"""Cache of final answers for repeated agent queries.
+
+A repeated query (the same question from different users within a short
+window) would otherwise run the whole ReAct loop again: several model
+calls and the tool calls between them. AnswerCache sits in front of the
+agent graph:
+
+- entries are keyed by the normalized query, the system prompt and a
+  fingerprint of the tool set, so a new prompt or changed tools never
+  serve old answers
+- an answer's TTL is the shortest TTL of the tools it used: short for
+  news and weather, long for answers that only did arithmetic. Answers
+  built on tools with a TTL of 0 (e.g. the metrics tools) or on failed
+  tool calls aren't cached
+- entries are evicted least recently used first, in memory or in a
+  SQLite file that survives restarts
+- concurrent identical queries share one agent run
+
+It reuses mcpserver.cache.ResponseCache, as the servers' caches do.
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from langchain_core.messages import BaseMessage, ToolMessage
+
+from mcpclient import parse_overrides
+from mcpserver.cache import CacheConfig, CacheStats, ResponseCache, normalize_query
+
+# Seconds answers that used these tools stay fresh; AGENT_ANSWER_CACHE_TOOL_TTL overrides them
+DEFAULT_TOOL_TTLS: Dict[str, float] = {
+    "search_news": 120,
+    "search_news_batch": 120,
+    "get_weather": 300,
+    "get_weather_many": 300,
+    "search_web": 900,
+    "search_web_batch": 900,
+    "calculate": 86400,
+    "calculate_many": 86400,
+}
+
+# Tools reporting live state of the servers; answers built on them are never cached
+UNCACHED_TOOL_SUFFIXES = ("_metrics", "_stats")
+
+def tools_fingerprint(tools: Sequence[Any]) -> str:
+    """Hash of the tools' names, descriptions and argument schemas"""
+    described = []
+    for tool in tools:
+        schema = tool.args_schema
+        if not isinstance(schema, dict):
+            schema = schema.model_json_schema()
+        described.append([tool.name, tool.description, schema])
+    described.sort(key=lambda item: item[0])
+    return hashlib.sha256(json.dumps(described, sort_keys=True, default=str).encode()).hexdigest()
+
+class AnswerCache:
+    """Final answers by query, with TTLs by the tools each answer used"""
+
+    def __init__(
+        self,
+        config: CacheConfig,
+        system_prompt: str,
+        tools: Sequence[Any],
+        tool_ttls: Optional[Dict[str, float]] = None,
+    ):
+        # Stale answers are never served: there is no upstream failure for them to paper over
+        self.cache = ResponseCache(config.model_copy(update={"stale_ttl": 0.0}))
+        self.default_ttl = config.ttl
+        self.tool_ttls = {**DEFAULT_TOOL_TTLS, **(tool_ttls or {})}
+        scope = f"{system_prompt}\0{tools_fingerprint(tools)}"
+        self._prefix = hashlib.sha256(scope.encode()).hexdigest()[:16]
+
+    @classmethod
+    def from_env(cls, system_prompt: str, tools: Sequence[Any]) -> Optional["AnswerCache"]:
+        """The cache configured by AGENT_ANSWER_CACHE_* variables, or None if it is off"""
+        config = CacheConfig.from_env("AGENT_ANSWER")
+        if "ttl" not in config.model_fields_set or config.ttl <= 0 or config.max_entries <= 0:
+            return None
+        overrides = parse_overrides(os.environ.get("AGENT_ANSWER_CACHE_TOOL_TTL", ""))
+        # The default is AGENT_ANSWER_CACHE_TTL itself
+        overrides.pop("*", None)
+        return cls(config, system_prompt, tools, overrides)
+
+    def key(self, query: str) -> str:
+        return f"{self._prefix}:{hashlib.sha256(normalize_query(query).encode()).hexdigest()}"
+
+    def ttl(self, entry: Dict[str, Any]) -> float:
+        """Seconds an answer stays fresh: the shortest TTL of the tools it used, if any"""
+        if entry["failed_tools"]:
+            return 0.0
+        if any(tool.endswith(UNCACHED_TOOL_SUFFIXES) for tool in entry["tools"]):
+            return 0.0
+        ttls = (self.tool_ttls.get(tool, self.default_ttl) for tool in entry["tools"])
+        return min(ttls, default=self.default_ttl)
+
+    async def get_or_answer(
+        self, query: str, run: Callable[[], Awaitable[List[BaseMessage]]]
+    ) -> Any:
+        """The cached answer to query, or the last message content of run(), which is then cached.
+
+        run returns the messages of one agent run; concurrent calls for
+        the same query share it.
+        """
+
+        async def answer() -> Dict[str, Any]:
+            messages = await run()
+            tool_messages = [message for message in messages if isinstance(message, ToolMessage)]
+            return {
+                "answer": messages[-1].content,
+                "tools": sorted({message.name for message in tool_messages if message.name}),
+                "failed_tools": sum(1 for message in tool_messages if message.status == "error"),
+            }
+
+        entry = await self.cache.get_or_fetch(self.key(query), answer, ttl=self.ttl)
+        return entry["answer"]
+
+    def snapshot(self) -> CacheStats:
+        return self.cache.snapshot()
+
+    def close(self) -> None:
+        self.cache.close()
@@ -0,0 +1,197 @@
+"""Batch mode for the agent.
+
+Answers queries read from a JSONL file (or stdin) with one shared
+agent.AgentRuntime, so the MCP sessions and the agent graph are set up
+once for the whole batch. Each input line is a JSON object with a "query"
+and optionally an "id" (the line number otherwise). Results are appended
+to the output JSONL as they complete, one object per query with its id,
+query, answer or error, and elapsed_ms.
+
+Runs are resumable: IDs already answered in the output file are skipped,
+so an interrupted batch continues where it stopped when run again, and
+queries that failed are retried.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from typing import IO, Any, Dict, List, Optional, Set
+
+logger = logging.getLogger("agent_batch")
+
+def read_done_ids(path: str) -> Set[str]:
+    """IDs of the queries already answered in an output file; failed ones aren't done"""
+    done = set()
+    try:
+        with open(path, encoding="utf-8") as output:
+            for line in output:
+                try:
+                    result = json.loads(line)
+                    if "answer" in result and "error" not in result:
+                        done.add(str(result["id"]))
+                except (ValueError, KeyError, TypeError):
+                    # A line cut short by an interrupted run; its query runs again
+                    continue
+    except FileNotFoundError:
+        pass
+    return done
+
+def ends_mid_line(path: str) -> bool:
+    """Whether a file ends with a partial line, as an interrupted run may leave it"""
+    try:
+        with open(path, "rb") as output:
+            if output.seek(0, os.SEEK_END) == 0:
+                return False
+            output.seek(-1, os.SEEK_END)
+            return output.read(1) != b"\n"
+    except FileNotFoundError:
+        return False
+
+def parse_line(line: str, line_number: int) -> Dict[str, Any]:
+    """The id and query of one input line; raises ValueError if it has no query"""
+    item = json.loads(line)
+    query = item.get("query") if isinstance(item, dict) else None
+    if not isinstance(query, str) or not query.strip():
+        raise ValueError("expected an object with a non-empty 'query' string")
+    return {"id": str(item.get("id", line_number)), "query": query}
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1)
+
+def summarize(
+    latencies_ms: List[float], failed: int, skipped: int, invalid: int, elapsed: float
+) -> Dict[str, Any]:
+    completed = len(latencies_ms)
+    return {
+        "completed": completed,
+        "succeeded": completed - failed,
+        "failed": failed,
+        "skipped": skipped,
+        "invalid": invalid,
+        "elapsed_s": round(elapsed, 2),
+        "queries_per_second": round(completed / elapsed, 2) if elapsed > 0 else None,
+        "p50_ms": percentile(latencies_ms, 0.5),
+        "p95_ms": percentile(latencies_ms, 0.95),
+        "p99_ms": percentile(latencies_ms, 0.99),
+        "max_ms": round(max(latencies_ms), 1) if latencies_ms else None,
+    }
+
+async def run_batch(
+    runtime, source: IO[str], sink: IO[str], workers: int, done: Set[str]
+) -> Dict[str, Any]:
+    """Answer every query from source not in done, writing results to sink; returns the summary.
+
+    Input is read incrementally and at most 2 * workers queries wait in the
+    queue, so memory use doesn't grow with the size of the batch.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+    latencies_ms: List[float] = []
+    counts = {"failed": 0, "skipped": 0, "invalid": 0}
+
+    async def produce() -> None:
+        line_number = 0
+        while True:
+            # readline on a thread, so a slow stdin doesn't block the event loop
+            line = await asyncio.to_thread(source.readline)
+            if not line:
+                break
+            line_number += 1
+            if not line.strip():
+                continue
+            try:
+                item = parse_line(line, line_number)
+            except ValueError as e:
+                logger.warning(f"Skipping input line {line_number}: {e}")
+                counts["invalid"] += 1
+                continue
+            if item["id"] in done:
+                counts["skipped"] += 1
+                continue
+            done.add(item["id"])
+            await queue.put(item)
+        for _ in range(workers):
+            await queue.put(None)
+
+    async def work() -> None:
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            started = time.perf_counter()
+            result = {"id": item["id"], "query": item["query"]}
+            try:
+                result["answer"] = await runtime.ask(item["query"])
+            except Exception as e:
+                logger.error(f"Query {item['id']} failed: {str(e)}")
+                result["error"] = str(e)
+                counts["failed"] += 1
+            result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            latencies_ms.append(result["elapsed_ms"])
+            # One write per line and a flush, so an interrupted run leaves whole lines behind
+            sink.write(json.dumps(result, ensure_ascii=False) + "\n")
+            sink.flush()
+
+    started = time.perf_counter()
+    await asyncio.gather(produce(), *(work() for _ in range(workers)))
+    return summarize(latencies_ms, elapsed=time.perf_counter() - started, **counts)
+
+async def run_batch_files(
+    runtime, input_path: str, output_path: Optional[str], workers: int
+) -> Dict[str, Any]:
+    """run_batch() from a file or stdin ("-") to a file, resuming it, or stdout (None or "-")"""
+    to_stdout = output_path in (None, "-")
+    done = set() if to_stdout else read_done_ids(output_path)
+    if done:
+        print(f"Resuming: {len(done)} queries already in {output_path}", file=sys.stderr)
+
+    source = sys.stdin if input_path == "-" else open(input_path, encoding="utf-8")
+    # Checked in binary mode: text mode positions are opaque cookies, not byte offsets
+    mid_line = not to_stdout and ends_mid_line(output_path)
+    sink = sys.stdout if to_stdout else open(output_path, "a", encoding="utf-8")
+    if mid_line:
+        # Start on a fresh line if an interrupted run left half a line at the end
+        sink.write("\n")
+    try:
+        async with runtime:
+            summary = await run_batch(runtime, source, sink, workers, done)
+            if runtime.prefetcher is not None:
+                summary["prefetch"] = runtime.prefetcher.stats.model_dump()
+            if runtime.answers is not None:
+                summary["answer_cache"] = runtime.answers.snapshot().model_dump()
+            return summary
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+
+def print_summary(summary: Dict[str, Any]) -> None:
+    print(
+        f"\n{summary['completed']} queries in {summary['elapsed_s']}s "
+        f"({summary['queries_per_second']} queries/s): {summary['succeeded']} succeeded, "
+        f"{summary['failed']} failed, {summary['skipped']} skipped as already done, "
+        f"{summary['invalid']} invalid lines",
+        file=sys.stderr,
+    )
+    if summary["completed"]:
+        print(
+            f"Latency p50 {summary['p50_ms']} ms, p95 {summary['p95_ms']} ms, "
+            f"p99 {summary['p99_ms']} ms, max {summary['max_ms']} ms",
+            file=sys.stderr,
+        )
+    if summary.get("prefetch", {}).get("started"):
+        from prefetch import PrefetchStats
+        print(PrefetchStats(**summary["prefetch"]).describe(), file=sys.stderr)
+    if "answer_cache" in summary:
+        answers = summary["answer_cache"]
+        print(
+            f"Answer cache: {answers['hits']} hits, {answers['coalesced']} coalesced, "
+            f"{answers['misses']} agent runs, {answers['size']} answers cached",
+            file=sys.stderr,
+        )
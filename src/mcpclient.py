@@ -0,0 +1,784 @@
+"""Managed MCP server connections for the agent.
+
+Each server connection is owned by a dedicated runner task, so it can be
+started on first use from any task and stopped later from another (anyio
+cancel scopes must be entered and exited in the same task). On top of
+that this module provides lazy startup from cached tool schemas, idle
+shutdown, a pool of pre-started server connections, per-server
+concurrency limits and per-tool timeouts for tool calls, load
+balancing over replicas of a remote server, and restarting or recycling
+a server in place (see supervisor.py).
+"""
+
+import asyncio
+import contextvars
+import hashlib
+import importlib
+import json
+import logging
+import os
+import pathlib
+import random
+import signal
+import time
+from contextlib import AsyncExitStack, nullcontext
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import anyio
+from langchain_mcp_adapters.client import MultiServerMCPClient
+from mcp import ClientSession
+from mcp.shared.exceptions import McpError
+from mcp.shared.memory import create_client_server_memory_streams
+from mcp.shared.message import SessionMessage
+from mcp.types import (
+    CONNECTION_CLOSED,
+    CallToolResult,
+    CancelledNotification,
+    CancelledNotificationParams,
+    ClientNotification,
+    JSONRPCRequest,
+    TextContent,
+)
+from mcp.types import Tool as MCPTool
+
+from mcpserver import fastpath
+from mcpserver.metrics import CLIENT_CALL_DURATION, METRICS
+
+logger = logging.getLogger("mcp_client")
+
+# Every subprocess spawned for a stdio server, so they can be stopped at exit
+SPAWNED_PROCESSES: List[Any] = []
+
+# Subprocesses spawned by stdio connections opened in the current task (see ServerHandle._run)
+_spawned: contextvars.ContextVar[Optional[List[Any]]] = contextvars.ContextVar(
+    "mcp_spawned", default=None
+)
+
+# Ids of the requests sent by the current task, recorded by RequestRecorder
+_sent_requests: contextvars.ContextVar[Optional[List[Any]]] = contextvars.ContextVar(
+    "mcp_sent_requests", default=None
+)
+
+class RequestRecorder:
+    """Write stream of a client session that records the id of each request it sends.
+
+    ClientSession numbers its requests itself and doesn't tell the caller
+    which id a call got, which is needed to cancel it. Requests are written
+    from the task that makes them, so the ids are recorded per task, into
+    the list set in _sent_requests.
+    """
+
+    def __init__(self, stream: Any):
+        self._stream = stream
+
+    async def send(self, message: SessionMessage) -> None:
+        sent = _sent_requests.get()
+        if sent is not None and isinstance(message.message.root, JSONRPCRequest):
+            sent.append(message.message.root.id)
+        await self._stream.send(message)
+
+    async def __aenter__(self) -> "RequestRecorder":
+        await self._stream.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> Optional[bool]:
+        return await self._stream.__aexit__(*exc_info)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._stream, name)
+
+def track_spawned_processes() -> None:
+    """Record the subprocess each stdio connection spawns; idempotent.
+
+    The mcp stdio client doesn't expose its process, so the function it
+    spawns processes with is wrapped.
+    """
+    from mcp.client import stdio
+
+    create = getattr(stdio, "_create_platform_compatible_process", None)
+    if create is None or getattr(create, "tracked", False):
+        return
+
+    async def tracked(*args: Any, **kwargs: Any) -> Any:
+        process = await create(*args, **kwargs)
+        SPAWNED_PROCESSES[:] = [
+            spawned for spawned in SPAWNED_PROCESSES if spawned.returncode is None
+        ]
+        SPAWNED_PROCESSES.append(process)
+        spawned = _spawned.get()
+        if spawned is not None:
+            spawned.append(process)
+        return process
+
+    tracked.tracked = True
+    stdio._create_platform_compatible_process = tracked
+
+def process_group(pid: int) -> Optional[int]:
+    """The process group pid leads, or None if it is in ours (or gone)"""
+    getpgid = getattr(os, "getpgid", None)
+    if getpgid is None:
+        return None
+    try:
+        pgid = getpgid(pid)
+    except OSError:
+        return None
+    # stdio servers are started in a session of their own; never signal the agent's group
+    return pgid if pgid != os.getpgrp() else None
+
+def signal_process(pid: int, sig: int, pgid: Optional[int] = None) -> None:
+    """Send sig to a server process and the rest of its group (e.g. the math server's workers)"""
+    try:
+        if pgid is not None:
+            os.killpg(pgid, sig)
+        else:
+            os.kill(pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+async def terminate_process(process: Any, grace: float) -> None:
+    """SIGTERM a server process, and SIGKILL it if it hasn't exited grace seconds later"""
+    if process.returncode is not None:
+        return
+    pgid = process_group(process.pid)
+    signal_process(process.pid, signal.SIGTERM, pgid)
+    try:
+        await asyncio.wait_for(process.wait(), grace)
+        return
+    except asyncio.TimeoutError:
+        logger.warning(
+            f"Server process {process.pid} still running {grace:g}s after SIGTERM, killing it"
+        )
+    signal_process(process.pid, getattr(signal, "SIGKILL", signal.SIGTERM), pgid)
+    try:
+        await asyncio.wait_for(process.wait(), grace)
+    except asyncio.TimeoutError:
+        logger.error(f"Server process {process.pid} survived SIGKILL")
+
+def parse_overrides(value: str) -> Dict[str, float]:
+    """Parse settings like "30,search_web=10" into {"*": 30.0, "search_web": 10.0}.
+
+    A bare number is the default for every name ("*"); name=number
+    entries override it for one server or tool.
+    """
+    overrides: Dict[str, float] = {}
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, number = item.rpartition("=")
+        overrides[name.strip() or "*"] = float(number)
+    return overrides
+
+async def open_session(
+    stack: AsyncExitStack, server_name: str, connection: Dict[str, Any]
+) -> ClientSession:
+    """Connect to one server and return its initialized session; stack owns the connection"""
+    # Sessions validate structured tool results against the tool's output schema
+    fastpath.install()
+    connection = dict(connection)
+    transport = connection.pop("transport", "stdio")
+
+    if transport in ("streamable_http", "sse"):
+        # Opened directly rather than through MultiServerMCPClient, whose
+        # half-entered transport leaks if connecting fails (e.g. a replica is down)
+        if transport == "sse":
+            from mcp.client.sse import sse_client
+            read, write = await stack.enter_async_context(sse_client(connection["url"]))
+        else:
+            from mcp.client.streamable_http import streamablehttp_client
+            read, write, _ = await stack.enter_async_context(
+                streamablehttp_client(connection["url"])
+            )
+        return await _start_session(stack, read, write, connection)
+
+    if transport == "stdio":
+        # Opened directly too, so the session's requests can be recorded
+        track_spawned_processes()
+        from mcp.client.stdio import StdioServerParameters, stdio_client
+        env = dict(connection.get("env") or {})
+        # Commands like uvx or npx need PATH, as MultiServerMCPClient ensures
+        env.setdefault("PATH", os.environ.get("PATH", ""))
+        params = StdioServerParameters(
+            command=connection["command"],
+            args=connection["args"],
+            env=env,
+            cwd=connection.get("cwd"),
+        )
+        read, write = await stack.enter_async_context(stdio_client(params))
+        return await _start_session(stack, read, write, connection)
+
+    if transport != "in_process":
+        client = await stack.enter_async_context(
+            MultiServerMCPClient({server_name: {"transport": transport, **connection}})
+        )
+        return client.sessions[server_name]
+
+    # Run a FastMCP server in this event loop and connect to it over in-memory
+    # streams. The module must provide create_server() returning the FastMCP
+    # instance; the server reads its settings from this process's environment.
+    server = importlib.import_module(connection["module"]).create_server()._mcp_server
+
+    task_group = await stack.enter_async_context(anyio.create_task_group())
+    # Entered after the task group so the streams close first on exit,
+    # which ends the server loop and lets its lifespan clean up normally
+    client_streams, server_streams = await stack.enter_async_context(
+        create_client_server_memory_streams()
+    )
+    task_group.start_soon(
+        server.run,
+        server_streams[0],
+        server_streams[1],
+        server.create_initialization_options(),
+    )
+
+    read, write = client_streams
+    return await _start_session(stack, read, write, connection)
+
+async def _start_session(
+    stack: AsyncExitStack, read: Any, write: Any, connection: Dict[str, Any]
+) -> ClientSession:
+    """Open and initialize a session over read and write, recording the ids of its requests"""
+    session = await stack.enter_async_context(
+        ClientSession(read, RequestRecorder(write), **(connection.get("session_kwargs") or {}))
+    )
+    await session.initialize()
+    return session
+
+class ServerHandle:
+    """One running connection to a server, owned by its own runner task"""
+
+    def __init__(self, server_name: str, connection: Dict[str, Any]):
+        self.server_name = server_name
+        self.connection = connection
+        self.session: Optional[ClientSession] = None
+        # The subprocess of a stdio server, once started
+        self.process: Optional[Any] = None
+        # Calls in flight on this connection
+        self.calls = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def alive(self) -> bool:
+        return self._task is not None and not self._task.done() and self.session is not None
+
+    @property
+    def exited(self) -> bool:
+        """Whether the server process has exited (e.g. crashed) while the connection is open"""
+        return self.process is not None and self.process.returncode is not None
+
+    async def start(self) -> ClientSession:
+        """Start the runner task and wait until the session is initialized"""
+        self._task = asyncio.create_task(self._run(), name=f"mcp-server-{self.server_name}")
+        ready = asyncio.create_task(self._ready.wait())
+        try:
+            await asyncio.wait({self._task, ready}, return_when=asyncio.FIRST_COMPLETED)
+        except BaseException:
+            # Cancelled while starting: don't leave the runner behind
+            await self.stop()
+            raise
+        finally:
+            ready.cancel()
+        if not self._ready.is_set():
+            # The runner finished before the session was ready, so it failed
+            self._task.result()
+            raise RuntimeError(f"MCP server {self.server_name} exited during startup")
+        return self.session
+
+    async def _run(self) -> None:
+        started = time.perf_counter()
+        spawned: List[Any] = []
+        _spawned.set(spawned)
+        async with AsyncExitStack() as stack:
+            self.session = await open_session(stack, self.server_name, self.connection)
+            self.process = spawned[0] if spawned else None
+            elapsed = time.perf_counter() - started
+            logger.info(f"Started MCP server {self.server_name} in {elapsed:.2f}s")
+            self._ready.set()
+            await self._stop.wait()
+        self.session = None
+
+    def begin_call(self) -> None:
+        self.calls += 1
+        self._idle.clear()
+
+    def end_call(self) -> None:
+        self.calls -= 1
+        if self.calls == 0:
+            self._idle.set()
+
+    async def wait_idle(self) -> None:
+        """Wait until no calls are in flight on this connection"""
+        await self._idle.wait()
+
+    async def stop(self, grace: Optional[float] = None, hung: bool = False) -> None:
+        """Close the session and wait for the server to shut down.
+
+        Closing the session ends the server's input, on which it finishes
+        its calls and exits. With grace, a server process still running
+        grace seconds later is sent SIGTERM, and SIGKILL if it is still
+        running grace seconds after that. A hung server (hung=True) is
+        signalled at once: it never reads the end of its input.
+        """
+        process = self.process
+        if hung and grace is not None and process is not None:
+            await terminate_process(process, grace)
+        self._stop.set()
+        if not hung and grace is not None and process is not None and process.returncode is None:
+            try:
+                await asyncio.wait_for(process.wait(), grace)
+            except asyncio.TimeoutError:
+                logger.warning(
+                    f"MCP server {self.server_name} still running {grace:g}s "
+                    f"after its input closed"
+                )
+                await terminate_process(process, grace)
+        if self._task is not None:
+            try:
+                await self._task
+            except Exception as e:
+                logger.warning(f"Error stopping MCP server {self.server_name}: {e}")
+        self.session = None
+
+class WarmServerPool:
+    """Pre-started, idle server connections that can be handed out immediately.
+
+    Only subprocess (stdio) servers are pooled; in-process servers start
+    fast enough on their own.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._idle: Dict[str, List[ServerHandle]] = {}
+        self._refills: Dict[str, asyncio.Task] = {}
+
+    def fill(self, server_name: str, connection: Dict[str, Any]) -> None:
+        """Top the pool up to size for server_name in the background"""
+        if self.size <= 0 or connection.get("transport", "stdio") != "stdio":
+            return
+        refill = self._refills.get(server_name)
+        if refill is None or refill.done():
+            self._refills[server_name] = asyncio.create_task(self._refill(server_name, connection))
+
+    async def _refill(self, server_name: str, connection: Dict[str, Any]) -> None:
+        idle = self._idle.setdefault(server_name, [])
+        while len(idle) < self.size:
+            handle = ServerHandle(server_name, connection)
+            try:
+                await handle.start()
+            except Exception as e:
+                logger.warning(f"Could not pre-start MCP server {server_name}: {e}")
+                return
+            idle.append(handle)
+
+    def take(self, server_name: str, connection: Dict[str, Any]) -> Optional[ServerHandle]:
+        """Hand out a pre-started connection, if one is ready, and refill behind it"""
+        idle = self._idle.get(server_name, [])
+        while idle:
+            handle = idle.pop(0)
+            if handle.alive and not handle.exited:
+                self.fill(server_name, connection)
+                return handle
+        self.fill(server_name, connection)
+        return None
+
+    async def close(self) -> None:
+        for refill in self._refills.values():
+            refill.cancel()
+        await asyncio.gather(*self._refills.values(), return_exceptions=True)
+        handles = [handle for idle in self._idle.values() for handle in idle]
+        await asyncio.gather(*(handle.stop() for handle in handles))
+        self._idle.clear()
+
+class ManagedServer:
+    """One logical MCP server, started on first use and stopped after idling.
+
+    Implements the call_tool/list_tools subset of ClientSession, so LangChain
+    tools can be bound to it before the server process exists. stop_grace
+    bounds how long a stopping server process may take before it is killed.
+    """
+
+    def __init__(
+        self,
+        server_name: str,
+        connection: Dict[str, Any],
+        idle_timeout: Optional[float] = None,
+        warm_pool: Optional[WarmServerPool] = None,
+        max_in_flight: Optional[int] = None,
+        tool_timeouts: Optional[Dict[str, float]] = None,
+        stop_grace: Optional[float] = None,
+    ):
+        self.server_name = server_name
+        self.connection = connection
+        self.idle_timeout = idle_timeout
+        self.warm_pool = warm_pool
+        self.stop_grace = stop_grace
+        # Calls beyond max_in_flight wait here, so one slow server can't take
+        # every worker while calls to the other servers queue behind it
+        self._limit = asyncio.Semaphore(max_in_flight) if max_in_flight else None
+        # Seconds per tool name, with "*" as the default; waiting for a slot counts
+        self.tool_timeouts = tool_timeouts or {}
+        self._cancellations: Set[asyncio.Task] = set()
+        self._handle: Optional[ServerHandle] = None
+        self._lock = asyncio.Lock()
+        self._in_flight = 0
+        self._last_used = time.monotonic()
+        self._idle_task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._handle is not None and self._handle.alive and not self._handle.exited
+
+    @property
+    def handle(self) -> Optional[ServerHandle]:
+        """The current connection, if the server is started"""
+        return self._handle
+
+    async def session(self) -> ClientSession:
+        """Return a live session, starting the server if needed"""
+        return (await self._live_handle()).session
+
+    async def _live_handle(self) -> ServerHandle:
+        if self.running:
+            return self._handle
+        async with self._lock:
+            if not self.running:
+                if self._handle is not None:
+                    # The server process exited (e.g. crashed): replace it
+                    stale, self._handle = self._handle, None
+                    await stale.stop(self.stop_grace)
+                self._use(await self._start_handle())
+            return self._handle
+
+    async def _start_handle(self) -> ServerHandle:
+        handle = self.warm_pool.take(self.server_name, self.connection) if self.warm_pool else None
+        if handle is None:
+            handle = ServerHandle(self.server_name, self.connection)
+            await handle.start()
+        return handle
+
+    def _use(self, handle: ServerHandle) -> None:
+        self._handle = handle
+        self._last_used = time.monotonic()
+        if self.idle_timeout and (self._idle_task is None or self._idle_task.done()):
+            self._idle_task = asyncio.create_task(self._stop_when_idle())
+
+    async def restart(self, backoff: Callable[[int], float], attempts: int = 5) -> None:
+        """Replace the server with a fresh one, e.g. when it hangs or crashed.
+
+        The old server is stopped first, signalled at once since it is
+        presumed hung, cutting off its calls in flight; calls made meanwhile
+        wait for the new one. Start attempt number attempt (from 0) waits
+        backoff(attempt) seconds first. If all attempts fail, the error of
+        the last one is raised and the server is left stopped, to be started
+        again by the next call.
+        """
+        attempts = max(attempts, 1)
+        async with self._lock:
+            handle, self._handle = self._handle, None
+            if handle is not None:
+                await handle.stop(self.stop_grace, hung=True)
+            for attempt in range(attempts):
+                delay = backoff(attempt)
+                if delay > 0:
+                    logger.info(f"Restarting MCP server {self.server_name} in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+                try:
+                    self._use(await self._start_handle())
+                    return
+                except Exception as e:
+                    logger.warning(f"Could not restart MCP server {self.server_name}: {e}")
+                    if attempt == attempts - 1:
+                        raise
+
+    async def recycle(self, drain: float) -> bool:
+        """Replace a running server with a fresh one without failing calls.
+
+        Used when it leaks memory, for instance. The new server takes calls
+        as soon as it is ready; the old one is stopped once its calls in
+        flight finish, or after drain seconds. Returns False if the server
+        wasn't running.
+        """
+        if not self.running:
+            return False
+        new = await self._start_handle()
+        async with self._lock:
+            old = self._handle
+            if old is None:
+                # Stopped while the new one started
+                await new.stop(self.stop_grace)
+                return False
+            self._use(new)
+        try:
+            await asyncio.wait_for(old.wait_idle(), drain)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Stopping recycled MCP server {self.server_name} "
+                f"with {old.calls} calls in flight"
+            )
+        await old.stop(self.stop_grace)
+        return True
+
+    def timeout(self, tool: str) -> Optional[float]:
+        """Seconds a call to tool may take, or None for no limit"""
+        return self.tool_timeouts.get(tool, self.tool_timeouts.get("*")) or None
+
+    async def call_tool(
+        self, name: str, arguments: Optional[Dict[str, Any]] = None, **kwargs
+    ) -> CallToolResult:
+        """Call a tool within its timeout; timeouts are returned as error results the model sees"""
+        timeout = self.timeout(name)
+        try:
+            return await asyncio.wait_for(self._call_tool(name, arguments, **kwargs), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Tool {name} on {self.server_name} timed out after {timeout:g}s")
+            return CallToolResult(
+                content=[
+                    TextContent(type="text", text=f"Tool {name} timed out after {timeout:g}s")
+                ],
+                isError=True,
+            )
+
+    async def _call_tool(
+        self, name: str, arguments: Optional[Dict[str, Any]], **kwargs
+    ) -> CallToolResult:
+        async with self._limit or nullcontext():
+            handle = await self._live_handle()
+            session = handle.session
+            self._in_flight += 1
+            handle.begin_call()
+            sent: List[Any] = []
+            recording = _sent_requests.set(sent)
+            try:
+                with METRICS.span(CLIENT_CALL_DURATION, server=self.server_name, tool=name):
+                    return await session.call_tool(name, arguments, **kwargs)
+            except asyncio.CancelledError:
+                # The client session only stops waiting; tell the server to stop
+                # working on the request in flight, the last one this call sent
+                if sent:
+                    self._notify_cancelled(session, sent[-1])
+                raise
+            finally:
+                _sent_requests.reset(recording)
+                self._in_flight -= 1
+                handle.end_call()
+                self._last_used = time.monotonic()
+
+    def _notify_cancelled(self, session: ClientSession, request_id: Any) -> None:
+        notification = ClientNotification(CancelledNotification(
+            params=CancelledNotificationParams(
+                requestId=request_id, reason="Cancelled by the client"
+            ),
+        ))
+
+        async def send() -> None:
+            try:
+                await session.send_notification(notification)
+            except Exception as e:
+                logger.debug(f"Could not send cancellation to {self.server_name}: {e}")
+
+        # Sent from a separate task, since the calling task is being cancelled
+        task = asyncio.create_task(send())
+        self._cancellations.add(task)
+        task.add_done_callback(self._cancellations.discard)
+
+    async def list_tools(self) -> List[MCPTool]:
+        session = await self.session()
+        return (await session.list_tools()).tools
+
+    async def _stop_when_idle(self) -> None:
+        while self.running:
+            idle_for = time.monotonic() - self._last_used
+            if self._in_flight == 0 and idle_for >= self.idle_timeout:
+                async with self._lock:
+                    idle_for = time.monotonic() - self._last_used
+                    if self._in_flight == 0 and idle_for >= self.idle_timeout:
+                        logger.info(
+                            f"Stopping MCP server {self.server_name} after {idle_for:.0f}s idle"
+                        )
+                        handle, self._handle = self._handle, None
+                        await handle.stop(self.stop_grace)
+                        return
+            await asyncio.sleep(max(self.idle_timeout - idle_for, 0.1))
+
+    async def stop(self) -> None:
+        if self._idle_task is not None:
+            self._idle_task.cancel()
+        async with self._lock:
+            if self._handle is not None:
+                handle, self._handle = self._handle, None
+                await handle.stop(self.stop_grace)
+
+def remote_connection(url: str) -> Dict[str, Any]:
+    """Connection config for a server at url: SSE if the path ends in /sse, else streamable HTTP"""
+    transport = "sse" if url.rstrip("/").endswith("/sse") else "streamable_http"
+    return {"transport": transport, "url": url}
+
+class ReplicaSet:
+    """One logical server backed by several replicas, e.g. HTTP servers on different hosts.
+
+    Implements the same interface as ManagedServer. Each tool call goes to
+    the healthy replica with the fewest outstanding calls (ties broken at
+    random). Replicas are pinged every health_interval seconds; one that
+    fails a ping or a call is taken out of rotation and reconnected until
+    it answers again. A call that fails with a connection error, or whose
+    connection closes before the answer (e.g. the replica died), is retried
+    once on each other replica. When no replica is healthy, all are tried.
+    """
+
+    def __init__(
+        self,
+        server_name: str,
+        replicas: List[Dict[str, Any]],
+        health_interval: float = 10.0,
+        health_timeout: float = 5.0,
+        **server_options: Any,
+    ):
+        if not replicas:
+            raise ValueError(f"Server {server_name} has no replicas")
+        self.server_name = server_name
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.replicas = [
+            ManagedServer(f"{server_name}[{index}]", connection, **server_options)
+            for index, connection in enumerate(replicas)
+        ]
+        self.outstanding = [0] * len(replicas)
+        self.healthy = [True] * len(replicas)
+        self._health_task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return any(replica.running for replica in self.replicas)
+
+    def _pick(self, tried: Set[int]) -> int:
+        candidates = [index for index in range(len(self.replicas)) if index not in tried]
+        healthy = [index for index in candidates if self.healthy[index]]
+        candidates = healthy or candidates
+        least = min(self.outstanding[index] for index in candidates)
+        return random.choice([index for index in candidates if self.outstanding[index] == least])
+
+    async def _mark_unhealthy(self, index: int, error: BaseException) -> None:
+        if self.healthy[index]:
+            logger.warning(f"Replica {self.replicas[index].server_name} is unhealthy: {error!r}")
+        self.healthy[index] = False
+        # Drop the broken connection; the next health check or call reconnects
+        await self.replicas[index].stop()
+
+    def _start_health_checks(self) -> None:
+        if self.health_interval > 0 and (self._health_task is None or self._health_task.done()):
+            self._health_task = asyncio.create_task(self._check_health())
+
+    async def _check_health(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await asyncio.gather(*(self._check(index) for index in range(len(self.replicas))))
+
+    async def _check(self, index: int) -> None:
+        replica = self.replicas[index]
+        try:
+            session = await asyncio.wait_for(replica.session(), self.health_timeout)
+            await asyncio.wait_for(session.send_ping(), self.health_timeout)
+        except Exception as e:
+            await self._mark_unhealthy(index, e)
+            return
+        if not self.healthy[index]:
+            logger.info(f"Replica {replica.server_name} is healthy again")
+        self.healthy[index] = True
+
+    async def session(self) -> ClientSession:
+        """Return the session of a healthy replica, connecting if needed"""
+        self._start_health_checks()
+        tried: Set[int] = set()
+        while True:
+            index = self._pick(tried)
+            tried.add(index)
+            try:
+                return await self.replicas[index].session()
+            except Exception as e:
+                await self._mark_unhealthy(index, e)
+                if len(tried) == len(self.replicas):
+                    raise
+
+    async def call_tool(
+        self, name: str, arguments: Optional[Dict[str, Any]] = None, **kwargs
+    ) -> CallToolResult:
+        self._start_health_checks()
+        tried: Set[int] = set()
+        while True:
+            index = self._pick(tried)
+            tried.add(index)
+            self.outstanding[index] += 1
+            try:
+                return await self.replicas[index].call_tool(name, arguments, **kwargs)
+            except McpError as e:
+                if e.error.code != CONNECTION_CLOSED:
+                    # The replica answered with a protocol error; another one would too
+                    raise
+                # The connection dropped mid-call (e.g. the replica died): fail over
+                await self._fail_over(index, e, name, tried)
+            except Exception as e:
+                await self._fail_over(index, e, name, tried)
+            finally:
+                self.outstanding[index] -= 1
+
+    async def _fail_over(self, index: int, error: Exception, name: str, tried: Set[int]) -> None:
+        """Take a replica whose call failed out of rotation; re-raise error if none is left"""
+        await self._mark_unhealthy(index, error)
+        if len(tried) == len(self.replicas):
+            raise error
+        logger.warning(f"Retrying {name} on another replica of {self.server_name}")
+
+    async def list_tools(self) -> List[MCPTool]:
+        session = await self.session()
+        return (await session.list_tools()).tools
+
+    async def stop(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+        await asyncio.gather(*(replica.stop() for replica in self.replicas))
+
+class ToolSchemaCache:
+    """Tool schemas per server persisted as JSON, so tools can be listed without starting servers.
+
+    Entries are keyed by a fingerprint of the server's connection config
+    (without its environment, which may hold secrets) and the modification
+    times of the server sources, so editing a server invalidates its entry.
+    """
+
+    def __init__(self, path: str, source_dir: Optional[str] = None):
+        self.path = pathlib.Path(path).expanduser()
+        self.source_dir = pathlib.Path(source_dir) if source_dir else None
+        try:
+            self._entries = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            self._entries = {}
+
+    def fingerprint(self, connection: Dict[str, Any]) -> str:
+        config = {key: value for key, value in connection.items() if key != "env"}
+        digest = hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode())
+        if self.source_dir is not None:
+            for source in sorted(self.source_dir.rglob("*.py")):
+                digest.update(f"{source}:{source.stat().st_mtime_ns}".encode())
+        return digest.hexdigest()
+
+    def get(self, server_name: str, connection: Dict[str, Any]) -> Optional[List[MCPTool]]:
+        entry = self._entries.get(server_name)
+        if not entry or entry.get("fingerprint") != self.fingerprint(connection):
+            return None
+        return [MCPTool.model_validate(tool) for tool in entry["tools"]]
+
+    def put(self, server_name: str, connection: Dict[str, Any], tools: List[MCPTool]) -> None:
+        self._entries[server_name] = {
+            "fingerprint": self.fingerprint(connection),
+            "tools": [tool.model_dump(mode="json", exclude_none=True) for tool in tools],
+        }
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text(json.dumps(self._entries, indent=2))
+        except OSError as e:
+            logger.warning(f"Could not write tool schema cache {self.path}: {e}")
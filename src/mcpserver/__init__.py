@@ -1,20 +1,30 @@
 """MCP servers for the LangGraph MCP Integration."""
 
-import sys
+import importlib
 import pathlib
+import sys
 
 # Make sure src is in the path
 SRC_DIR = str(pathlib.Path(__file__).parent.parent.absolute())
 if SRC_DIR not in sys.path:
     sys.path.insert(0, SRC_DIR)
-    
-# Now we can import the modules
-from mcpserver.tavily import run_server as run_tavily_server
-from mcpserver.math_server import run_server as run_math_server
-from mcpserver.weather import run_server as run_weather_server
+
+# Server modules are imported on first access, so a process running one
+# server doesn't pay for importing the others
+_SERVER_MODULES = {
+    "run_tavily_server": "mcpserver.tavily",
+    "run_math_server": "mcpserver.math_server",
+    "run_weather_server": "mcpserver.weather",
+}
+
+def __getattr__(name):
+    module = _SERVER_MODULES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return importlib.import_module(module).run_server
 
 __all__ = [
     "run_tavily_server",
-    "run_math_server", 
+    "run_math_server",
     "run_weather_server"
 ]
@@ -0,0 +1,246 @@
+"""Response caching for MCP servers.
+
+Provides TTL + LRU caches with an in-memory or SQLite backend, and
+single-flight coalescing so concurrent identical requests share one
+upstream call.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Union
+
+from pydantic import BaseModel
+
+logger = logging.getLogger("mcp_cache")
+
+class CacheConfig(BaseModel):
+    """Settings for a response cache"""
+    ttl: float = 300.0
+    max_entries: int = 1024
+    path: Optional[str] = None
+    # Seconds expired entries are kept as a fallback for when the upstream fails
+    stale_ttl: float = 3600.0
+
+    @classmethod
+    def from_env(cls, prefix: str) -> "CacheConfig":
+        """Build the config from <prefix>_CACHE_* variables, keeping defaults for unset ones"""
+        env = {
+            "ttl": os.environ.get(f"{prefix}_CACHE_TTL"),
+            "max_entries": os.environ.get(f"{prefix}_CACHE_MAX_ENTRIES"),
+            "path": os.environ.get(f"{prefix}_CACHE_PATH"),
+            "stale_ttl": os.environ.get(f"{prefix}_CACHE_STALE_TTL"),
+        }
+        return cls(**{key: value for key, value in env.items() if value})
+
+def normalize_query(query: str) -> str:
+    """Normalize a query for cache keys so trivially different phrasings share an entry"""
+    return " ".join(query.casefold().split()).rstrip("?!. ")
+
+class CacheStats(BaseModel):
+    """Counters for tuning the cache TTL and size"""
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    stale_hits: int = 0
+    size: int = 0
+
+class MemoryBackend:
+    """In-process TTL + LRU store"""
+
+    def __init__(self, max_entries: int, stats: CacheStats, stale_ttl: float = 0.0):
+        self.max_entries = max_entries
+        self.stats = stats
+        self.stale_ttl = stale_ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: str, stale: bool = False) -> Tuple[bool, Any]:
+        """Look up a fresh entry, or with stale=True also one expired less than stale_ttl ago"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        now = time.monotonic()
+        if expires_at <= now:
+            if expires_at + self.stale_ttl <= now:
+                del self._entries[key]
+                self.stats.expirations += 1
+                return False, None
+            if not stale:
+                return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def close(self) -> None:
+        self._entries.clear()
+
+class SQLiteBackend:
+    """On-disk TTL + LRU store that survives restarts.
+
+    Values must be JSON serializable. Queries are small single-row
+    lookups on the primary key, so they run inline on the event loop.
+    """
+
+    def __init__(self, path: str, max_entries: int, stats: CacheStats, stale_ttl: float = 0.0):
+        self.max_entries = max_entries
+        self.stats = stats
+        self.stale_ttl = stale_ttl
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+        # Wall clock here, since entries outlive the process
+        self._conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time() - stale_ttl,))
+
+    def get(self, key: str, stale: bool = False) -> Tuple[bool, Any]:
+        """Look up a fresh entry, or with stale=True also one expired less than stale_ttl ago"""
+        row = self._conn.execute(
+            "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return False, None
+        value, expires_at = row
+        now = time.time()
+        if expires_at <= now:
+            if expires_at + self.stale_ttl <= now:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self.stats.expirations += 1
+                return False, None
+            if not stale:
+                return False, None
+        self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return True, json.loads(value)
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        now = time.time()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) "
+            "VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value), now + ttl, now),
+        )
+        overflow = len(self) - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN "
+                "(SELECT key FROM cache ORDER BY accessed_at LIMIT ?)",
+                (overflow,),
+            )
+            self.stats.evictions += overflow
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def close(self) -> None:
+        self._conn.close()
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one in-flight task"""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._inflight
+
+    async def do(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fetch())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield so one cancelled caller doesn't cancel the call for everyone else
+        return await asyncio.shield(task)
+
+class ResponseCache:
+    """TTL + LRU response cache with single-flight coalescing"""
+
+    def __init__(self, config: CacheConfig):
+        self.config = config
+        self.stats = CacheStats()
+        self._flight = SingleFlight()
+        if config.path:
+            self._backend = SQLiteBackend(
+                config.path, config.max_entries, self.stats, config.stale_ttl
+            )
+            logger.info(f"Using SQLite response cache at {config.path}")
+        else:
+            self._backend = MemoryBackend(config.max_entries, self.stats, config.stale_ttl)
+
+    @property
+    def enabled(self) -> bool:
+        return self.config.ttl > 0 and self.config.max_entries > 0
+
+    async def get_or_fetch(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        ttl: Optional[Union[float, Callable[[Any], float]]] = None,
+    ) -> Any:
+        """Return the cached value for key, or fetch it once and cache it.
+
+        ttl overrides the configured TTL; a callable gets the fetched value,
+        for TTLs that depend on it. Values with a TTL of 0 aren't cached.
+        """
+        if not self.enabled:
+            return await fetch()
+
+        found, value = self._backend.get(key)
+        if found:
+            self.stats.hits += 1
+            return value
+
+        if key in self._flight:
+            self.stats.coalesced += 1
+            return await self._flight.do(key, fetch)
+
+        self.stats.misses += 1
+
+        async def fetch_and_store() -> Any:
+            result = await fetch()
+            seconds = ttl(result) if callable(ttl) else ttl
+            if seconds is None:
+                seconds = self.config.ttl
+            if seconds > 0:
+                self._backend.set(key, result, seconds)
+            return result
+
+        return await self._flight.do(key, fetch_and_store)
+
+    def get_stale(self, key: str) -> Tuple[bool, Any]:
+        """A cached value even if it expired less than stale_ttl ago, for when fetching fails"""
+        if not self.enabled:
+            return False, None
+        found, value = self._backend.get(key, stale=True)
+        if found:
+            self.stats.stale_hits += 1
+        return found, value
+
+    def snapshot(self) -> CacheStats:
+        """Return a copy of the counters with the current size"""
+        stats = self.stats.model_copy()
+        stats.size = len(self._backend)
+        return stats
+
+    def close(self) -> None:
+        self._backend.close()
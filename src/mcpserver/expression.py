@@ -0,0 +1,383 @@
+"""Safe arithmetic expression engine for the Math MCP server.
+
+Expressions are parsed with :mod:`ast`, checked against an allowlist of
+node types, rewritten so every power goes through a bounded helper (and
+round() is bounded too, as a large negative ndigits is a hidden power), and
+compiled once to a code object. Compiled expressions are kept in an LRU
+cache and can be evaluated either on Python scalars or, when NumPy is
+installed, vectorized over arrays of variable bindings.
+"""
+
+import ast
+import asyncio
+import functools
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+# NumPy (an optional extra) is imported on the first vectorized evaluation,
+# since it roughly doubles the import time of the math server
+np: Any = None
+
+@functools.lru_cache(maxsize=1)
+def _load_numpy() -> bool:
+    """Import NumPy into the module namespace; False if it isn't installed"""
+    global np
+    try:
+        import numpy
+    except ImportError:  # pragma: no cover - numpy is an optional extra
+        return False
+    np = numpy
+    return True
+
+# Limits that keep a single evaluation cheap
+MAX_EXPRESSION_LENGTH = 1000
+MAX_NODES = 500
+MAX_EXPONENT = 10_000
+MAX_RESULT_BITS = 4096
+# round(x, ndigits) computes 10 ** abs(ndigits)
+MAX_ROUND_DIGITS = 1000
+
+_ALLOWED_BINOPS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow)
+_ALLOWED_UNARYOPS = (ast.UAdd, ast.USub)
+
+CONSTANTS: Dict[str, float] = {"pi": math.pi, "e": math.e, "tau": math.tau}
+
+# Results of a batch of evaluations (None where one failed) and the errors by result index
+Results = Tuple[List[Optional[float]], Dict[int, str]]
+
+class ExpressionError(ValueError):
+    """Raised for expressions that are invalid or exceed the evaluation limits"""
+
+def _checked_round(number: Any, ndigits: Any = None) -> Any:
+    """round() with a bounded number of digits"""
+    if ndigits is None:
+        return round(number)
+    if isinstance(ndigits, float) and ndigits.is_integer():
+        ndigits = int(ndigits)
+    if not isinstance(ndigits, int):
+        raise ExpressionError("round() digits must be an integer")
+    if abs(ndigits) > MAX_ROUND_DIGITS:
+        raise ExpressionError(f"round() digits {ndigits} exceed the limit of {MAX_ROUND_DIGITS}")
+    return round(number, ndigits)
+
+SCALAR_FUNCTIONS: Dict[str, Callable] = {
+    "abs": abs,
+    "round": _checked_round,
+    "min": min,
+    "max": max,
+    "sqrt": math.sqrt,
+    "exp": math.exp,
+    "log": math.log,
+    "log2": math.log2,
+    "log10": math.log10,
+    "sin": math.sin,
+    "cos": math.cos,
+    "tan": math.tan,
+    "asin": math.asin,
+    "acos": math.acos,
+    "atan": math.atan,
+    "sinh": math.sinh,
+    "cosh": math.cosh,
+    "tanh": math.tanh,
+    "floor": math.floor,
+    "ceil": math.ceil,
+}
+
+RESERVED_NAMES: FrozenSet[str] = frozenset(SCALAR_FUNCTIONS) | frozenset(CONSTANTS)
+
+def _checked_pow(base: Any, exponent: Any) -> Any:
+    """Power with bounded exponent and result size"""
+    if abs(exponent) > MAX_EXPONENT:
+        raise ExpressionError(f"Exponent {exponent} exceeds the limit of {MAX_EXPONENT}")
+    if exponent > 0 and abs(base) > 1 and exponent * math.log2(abs(base)) > MAX_RESULT_BITS:
+        raise ExpressionError("Result is too large")
+    result = base ** exponent
+    if isinstance(result, complex):
+        raise ExpressionError("Result is not a real number")
+    return result
+
+class _PowRewriter(ast.NodeTransformer):
+    """Route every ``a ** b`` through the bounded power helper"""
+
+    def visit_BinOp(self, node: ast.BinOp) -> ast.AST:
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Pow):
+            return ast.copy_location(
+                ast.Call(
+                    func=ast.Name(id="_pow", ctx=ast.Load()),
+                    args=[node.left, node.right],
+                    keywords=[],
+                ),
+                node,
+            )
+        return node
+
+class CompiledExpression:
+    """A validated expression compiled to a code object"""
+
+    __slots__ = ("source", "code", "variables", "node_count")
+
+    def __init__(self, source: str, code: Any, variables: FrozenSet[str], node_count: int):
+        self.source = source
+        self.code = code
+        self.variables = variables
+        self.node_count = node_count
+
+    def evaluate(self, bindings: Optional[Dict[str, float]] = None) -> float:
+        """Evaluate on Python scalars"""
+        namespace = _namespace(self, bindings or {}, SCALAR_FUNCTIONS, _checked_pow)
+        try:
+            result = eval(self.code, {"__builtins__": {}}, namespace)
+            value = float(result)
+        except ExpressionError:
+            raise
+        except OverflowError:
+            raise ExpressionError("Result is too large")
+        except (ArithmeticError, ValueError, TypeError) as e:
+            raise ExpressionError(str(e))
+        if not math.isfinite(value):
+            raise ExpressionError("Result is not a finite number")
+        return value
+
+    def evaluate_vector(self, bindings: Dict[str, List[float]]) -> Results:
+        """Evaluate over equally sized arrays of variable bindings"""
+        size = _binding_size(bindings)
+        if not _load_numpy():
+            # Without NumPy, fall back to one scalar evaluation per binding
+            results: List[Optional[float]] = []
+            errors: Dict[int, str] = {}
+            for index in range(size):
+                try:
+                    binding = {name: values[index] for name, values in bindings.items()}
+                    results.append(self.evaluate(binding))
+                except ExpressionError as e:
+                    results.append(None)
+                    errors[index] = str(e)
+            return results, errors
+
+        arrays = {name: np.asarray(values, dtype=np.float64) for name, values in bindings.items()}
+        namespace = _namespace(self, arrays, _vector_functions(), _vector_pow)
+        try:
+            with np.errstate(all="ignore"):
+                result = np.broadcast_to(
+                    np.asarray(eval(self.code, {"__builtins__": {}}, namespace), dtype=np.float64),
+                    (size,),
+                )
+        except ExpressionError:
+            raise
+        except (ArithmeticError, ValueError, TypeError) as e:
+            raise ExpressionError(str(e))
+
+        finite = np.isfinite(result)
+        errors = {int(index): "Result is not a finite number" for index in np.flatnonzero(~finite)}
+        values = [
+            float(value) if ok else None for value, ok in zip(result.tolist(), finite.tolist())
+        ]
+        return values, errors
+
+def _namespace(
+    compiled: CompiledExpression,
+    bindings: Dict[str, Any],
+    functions: Dict[str, Callable],
+    pow_function: Callable,
+) -> Dict[str, Any]:
+    missing = compiled.variables - bindings.keys()
+    if missing:
+        raise ExpressionError(f"Unknown variable(s): {', '.join(sorted(missing))}")
+    for name in bindings:
+        if name in RESERVED_NAMES or name.startswith("_") or not name.isidentifier():
+            raise ExpressionError(f"Invalid variable name: {name}")
+    namespace: Dict[str, Any] = dict(CONSTANTS)
+    namespace.update(functions)
+    namespace.update(bindings)
+    namespace["_pow"] = pow_function
+    return namespace
+
+def _binding_size(bindings: Dict[str, List[float]]) -> int:
+    sizes = {len(values) for values in bindings.values()}
+    if len(sizes) != 1:
+        raise ExpressionError("All variable arrays must be non-empty and have the same length")
+    return sizes.pop()
+
+def _vector_pow(base: Any, exponent: Any) -> Any:
+    """Vectorized power with the same exponent bound as the scalar path"""
+    if np.max(np.abs(exponent)) > MAX_EXPONENT:
+        raise ExpressionError(f"Exponent exceeds the limit of {MAX_EXPONENT}")
+    return np.power(np.asarray(base, dtype=np.float64), exponent)
+
+@functools.lru_cache(maxsize=1)
+def _vector_functions() -> Dict[str, Callable]:
+    return {
+        "abs": np.abs,
+        "round": np.round,
+        "min": lambda *args: functools.reduce(np.minimum, args),
+        "max": lambda *args: functools.reduce(np.maximum, args),
+        "sqrt": np.sqrt,
+        "exp": np.exp,
+        "log": np.log,
+        "log2": np.log2,
+        "log10": np.log10,
+        "sin": np.sin,
+        "cos": np.cos,
+        "tan": np.tan,
+        "asin": np.arcsin,
+        "acos": np.arccos,
+        "atan": np.arctan,
+        "sinh": np.sinh,
+        "cosh": np.cosh,
+        "tanh": np.tanh,
+        "floor": np.floor,
+        "ceil": np.ceil,
+    }
+
+def _validate(tree: ast.Expression) -> Tuple[FrozenSet[str], int]:
+    """Check every node against the allowlist and collect free variable names"""
+    variables = set()
+    node_count = 0
+    for node in ast.walk(tree):
+        node_count += 1
+        if node_count > MAX_NODES:
+            raise ExpressionError(f"Expression has more than {MAX_NODES} nodes")
+        if isinstance(node, (ast.Expression, ast.Load)):
+            continue
+        if isinstance(node, ast.BinOp):
+            if not isinstance(node.op, _ALLOWED_BINOPS):
+                raise ExpressionError(f"Operator {type(node.op).__name__} is not allowed")
+        elif isinstance(node, ast.UnaryOp):
+            if not isinstance(node.op, _ALLOWED_UNARYOPS):
+                raise ExpressionError(f"Operator {type(node.op).__name__} is not allowed")
+        elif isinstance(node, ast.Constant):
+            if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+                raise ExpressionError(f"Constant {node.value!r} is not allowed")
+        elif isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in SCALAR_FUNCTIONS:
+                raise ExpressionError("Only built-in math functions can be called")
+            if node.keywords:
+                raise ExpressionError("Keyword arguments are not allowed")
+        elif isinstance(node, ast.Name):
+            if node.id.startswith("_"):
+                raise ExpressionError(f"Name {node.id} is not allowed")
+            if node.id not in RESERVED_NAMES:
+                variables.add(node.id)
+        elif isinstance(node, (ast.operator, ast.unaryop)):
+            continue
+        else:
+            raise ExpressionError(f"{type(node).__name__} is not allowed in expressions")
+    return frozenset(variables), node_count
+
+@functools.lru_cache(maxsize=int(os.environ.get("MATH_EXPRESSION_CACHE_SIZE", 1024)))
+def compile_expression(expression: str) -> CompiledExpression:
+    """Parse, validate and compile an expression (cached)"""
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise ExpressionError(f"Expression is longer than {MAX_EXPRESSION_LENGTH} characters")
+
+    # Treat ^ as exponentiation, as users expect from calculators
+    source = expression.replace("^", "**")
+    try:
+        tree = ast.parse(source.strip(), mode="eval")
+    except (SyntaxError, RecursionError, MemoryError) as e:
+        raise ExpressionError(f"Invalid expression: {e}")
+
+    variables, node_count = _validate(tree)
+    tree = ast.fix_missing_locations(_PowRewriter().visit(tree))
+    try:
+        code = compile(tree, "<expression>", "eval")
+    except RecursionError:
+        raise ExpressionError("Expression is nested too deeply")
+    return CompiledExpression(source, code, variables, node_count)
+
+# Process pool entry points (module level so they can be pickled)
+
+def evaluate_expression(expression: str, bindings: Optional[Dict[str, float]] = None) -> float:
+    """Compile (cached) and evaluate one expression on scalars"""
+    return compile_expression(expression).evaluate(bindings)
+
+def evaluate_many(expressions: List[str]) -> Results:
+    """Evaluate a list of independent expressions, collecting per-item errors"""
+    results: List[Optional[float]] = []
+    errors: Dict[int, str] = {}
+    for index, expression in enumerate(expressions):
+        try:
+            results.append(evaluate_expression(expression))
+        except ExpressionError as e:
+            results.append(None)
+            errors[index] = str(e)
+    return results, errors
+
+def evaluate_vector(expression: str, bindings: Dict[str, List[float]]) -> Results:
+    """Compile (cached) and evaluate one expression over arrays of bindings"""
+    return compile_expression(expression).evaluate_vector(bindings)
+
+class EvaluationPool:
+    """Worker processes for evaluations, each run with a timeout.
+
+    A worker that exceeds the timeout cannot be interrupted, so it is
+    killed. Each worker is a single-process executor of its own, so only
+    the evaluation that timed out is lost: the other workers carry on, and
+    the killed one is replaced on its next use. Evaluations wait for a free
+    worker, and the timeout starts once they have one.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, timeout: float = 5.0):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self._executors: List[Optional[ProcessPoolExecutor]] = [None] * self.max_workers
+        # Indices of the workers not running an evaluation, created in the server's event loop
+        self._free: Optional[asyncio.Queue] = None
+
+    def _free_workers(self) -> asyncio.Queue:
+        if self._free is None:
+            self._free = asyncio.Queue()
+            for index in range(self.max_workers):
+                self._free.put_nowait(index)
+        return self._free
+
+    def _get_executor(self, index: int) -> ProcessPoolExecutor:
+        if self._executors[index] is None:
+            # spawn rather than fork: the parent runs an event loop and background threads
+            self._executors[index] = ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executors[index]
+
+    async def warm(self) -> None:
+        """Start a worker ahead of the first call so it doesn't pay the spawn cost"""
+        await self.run(evaluate_expression, "0")
+
+    async def run(self, function: Callable, *args: Any) -> Any:
+        """Run function(*args) in a free worker, raising ExpressionError on timeout"""
+        free = self._free_workers()
+        index = await free.get()
+        try:
+            executor = self._get_executor(index)
+            future = asyncio.get_running_loop().run_in_executor(executor, function, *args)
+            try:
+                return await asyncio.wait_for(future, timeout=self.timeout)
+            except asyncio.TimeoutError:
+                self._kill(index)
+                raise ExpressionError(f"Evaluation timed out after {self.timeout} seconds")
+            except BrokenProcessPool:
+                self._kill(index)
+                raise ExpressionError("Evaluation worker exited unexpectedly")
+        finally:
+            free.put_nowait(index)
+
+    def _kill(self, index: int) -> None:
+        executor, self._executors[index] = self._executors[index], None
+        if executor is None:
+            return
+        # ProcessPoolExecutor has no public API to stop a running task
+        for process in list(getattr(executor, "_processes", {}).values()):
+            process.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def close(self) -> None:
+        for index, executor in enumerate(self._executors):
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+                self._executors[index] = None
@@ -0,0 +1,89 @@
+"""Cheaper versions of the per-call work the mcp library does for every tool call.
+
+- validate(): jsonschema.validate, which the low-level server runs on the
+  arguments and structured output of every call and the client session on
+  every structured result, checks the schema itself against its metaschema
+  each time; that check costs ~1.6 ms, 50x the actual validation. Here it
+  runs once per schema object.
+- parse_message() / dump_message(): JSON-RPC frames, decoded and encoded
+  with orjson when it is installed (pip install -e ".[fast]"), which is
+  about twice as fast as pydantic's JSON mode for the message union.
+
+install() swaps validate() in for jsonschema.validate. Errors and their
+messages are unchanged, so it is safe to call from servers and clients.
+MCP_FAST_PATH=false turns all of this off, including the event-loop stdio
+transport of mcpserver.runtime, e.g. to measure the difference.
+"""
+
+import logging
+import os
+from typing import Any, Dict, Tuple, Union
+
+import jsonschema
+from jsonschema.exceptions import best_match
+from jsonschema.validators import validator_for
+from mcp import types
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger("mcp_fastpath")
+
+# Upper bound on remembered schemas; tools have fixed schemas, so this is never reached in practice
+MAX_CHECKED_SCHEMAS = 1024
+
+# Schemas that passed check_schema, by id and validator class; the schema is
+# kept so its id can't be reused by another object while it is remembered
+_checked: Dict[Tuple[int, type], Any] = {}
+
+_original_validate = jsonschema.validate
+
+def validate(instance: Any, schema: Any, cls: Any = None, *args: Any, **kwargs: Any) -> None:
+    """jsonschema.validate, checking each schema object against its metaschema only once"""
+    if cls is None:
+        cls = validator_for(schema)
+    key = (id(schema), cls)
+    if _checked.get(key) is not schema:
+        cls.check_schema(schema)
+        if len(_checked) >= MAX_CHECKED_SCHEMAS:
+            _checked.clear()
+        _checked[key] = schema
+    error = best_match(cls(schema, *args, **kwargs).iter_errors(instance))
+    if error is not None:
+        raise error
+
+def parse_message(line: Union[str, bytes]) -> types.JSONRPCMessage:
+    """Decode one JSON-RPC frame"""
+    if orjson is not None:
+        try:
+            return types.JSONRPCMessage.model_validate(orjson.loads(line))
+        except orjson.JSONDecodeError:
+            # Let pydantic raise its usual error (and accept what only it parses, e.g. huge ints)
+            pass
+    return types.JSONRPCMessage.model_validate_json(line)
+
+def dump_message(message: types.JSONRPCMessage) -> bytes:
+    """Encode one JSON-RPC frame, without a trailing newline"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(message.model_dump(mode="json", by_alias=True, exclude_none=True))
+        except TypeError:
+            # Integers beyond 64 bits
+            pass
+    return message.model_dump_json(by_alias=True, exclude_none=True).encode()
+
+def enabled() -> bool:
+    """Whether MCP_FAST_PATH (default true) enables the fast paths"""
+    return os.environ.get("MCP_FAST_PATH", "true").lower() in ("1", "true", "yes")
+
+def install() -> None:
+    """Use validate() wherever the mcp library calls jsonschema.validate if enabled(); idempotent"""
+    if enabled() and jsonschema.validate is not validate:
+        jsonschema.validate = validate
+        logger.debug(f"Schema checks cached, orjson frames {'on' if orjson is not None else 'off'}")
+
+def uninstall() -> None:
+    """Restore the original jsonschema.validate (e.g. to measure the difference)"""
+    jsonschema.validate = _original_validate
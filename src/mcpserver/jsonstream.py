@@ -0,0 +1,211 @@
+"""Incremental extraction of the items of one array in a streamed JSON object.
+
+Upstream APIs answer with an object like {"answer": ..., "results": [...]}
+of which only the array items matter. ArrayItems is fed the body chunk by
+chunk and returns each item of the array under one key as soon as it is
+complete. Other members are skipped, and consumed input is dropped. So
+memory holds one item (or skipped member) at a time, not the whole body,
+and the caller can stop reading once it has the items it needs.
+
+A value split across chunks is scanned for its end as its chunks arrive,
+each character once, with regular expressions jumping from one bracket,
+quote or backslash to the next. Once complete it is joined and decoded
+once, with the stdlib json decoder (json.JSONDecoder.raw_decode), so
+parsing stays linear in the size of the body.
+"""
+
+import codecs
+import json
+import re
+from typing import Any, List, Optional, Tuple
+
+_WHITESPACE = " \t\n\r"
+
+# What ends a number or literal ("2" may be the start of "2.5")
+_SCALAR_END = re.compile(r"[ \t\n\r,\]}]")
+# Characters that matter when scanning an object or array, outside its strings
+_STRUCTURE = re.compile(r'[\[\]{}"]')
+# Characters that matter inside a string
+_STRING_SPECIAL = re.compile(r'["\\]')
+
+class ResponseTooLarge(ValueError):
+    """The body exceeded the size cap before the wanted items were read"""
+
+class ArrayItems:
+    """Parser returning the items of body[key], for bodies that are a JSON object.
+
+    feed() takes the next chunk of bytes and returns the items it
+    completed; finish() checks that the body was complete. max_bytes caps
+    the bytes fed; more raises ResponseTooLarge.
+    """
+
+    def __init__(self, key: str, max_bytes: Optional[int] = None):
+        self.key = key
+        self.max_bytes = max_bytes
+        self.bytes_read = 0
+        # The array was read to its end; the rest of the body doesn't matter
+        self.done = False
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._state = "start"
+        self._member: Optional[str] = None
+        # Text of a value continued in later chunks, and where its scan stands
+        self._partial: Optional[List[str]] = None
+        self._scalar = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: bytes, final: bool = False) -> List[Any]:
+        self.bytes_read += len(chunk)
+        if self.max_bytes is not None and self.bytes_read > self.max_bytes:
+            raise ResponseTooLarge(f"Response body exceeds {self.max_bytes} bytes")
+        text = self._text.decode(chunk, final=final)
+        items: List[Any] = []
+        if self._partial is not None:
+            end = self._scan(text, 0)
+            if end is None and not final:
+                self._partial.append(text)
+                return items
+            end = len(text) if end is None else end
+            self._partial.append(text[:end])
+            value = self._decode_value("".join(self._partial), 0)[0]
+            self._partial = None
+            self._buffer, self._pos = text[end:], 0
+            self._accept(value, items)
+        else:
+            # Only what is left of the previous chunk (less than one token) is copied
+            self._buffer = self._buffer[self._pos:] + text
+            self._pos = 0
+        items.extend(self._parse(final))
+        return items
+
+    def finish(self) -> List[Any]:
+        """Items completed by the end of the body; raises ValueError if the body is incomplete"""
+        items = self.feed(b"", final=True)
+        if not self.done and self._state != "end":
+            raise ValueError(f"Response body ended before the {self.key!r} array was complete")
+        return items
+
+    def _skip_whitespace(self) -> Optional[str]:
+        buffer, pos = self._buffer, self._pos
+        while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+            pos += 1
+        self._pos = pos
+        return buffer[pos] if pos < len(buffer) else None
+
+    def _scan(self, text: str, pos: int) -> Optional[int]:
+        """Where the scanned value ends in text (exclusive), from pos, or None if it goes on"""
+        if self._scalar:
+            match = _SCALAR_END.search(text, pos)
+            return match.start() if match else None
+        while pos < len(text):
+            if self._escaped:
+                # The character after a backslash that ended the previous chunk
+                self._escaped = False
+                pos += 1
+            elif self._in_string:
+                match = _STRING_SPECIAL.search(text, pos)
+                if match is None:
+                    return None
+                pos = match.end()
+                if match.group() == "\\":
+                    self._escaped = True
+                else:
+                    self._in_string = False
+                    if self._depth == 0:
+                        return pos
+            else:
+                match = _STRUCTURE.search(text, pos)
+                if match is None:
+                    return None
+                pos = match.end()
+                char = match.group()
+                if char == '"':
+                    self._in_string = True
+                elif char in "[{":
+                    self._depth += 1
+                else:
+                    self._depth -= 1
+                    if self._depth == 0:
+                        return pos
+        return None
+
+    def _decode_value(self, text: str, pos: int) -> Tuple[Any, int]:
+        """The complete value at pos in text, and where it ends"""
+        try:
+            return self._decoder.raw_decode(text, pos)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Malformed JSON value in response body: {e}") from e
+
+    def _decode(self, final: bool) -> Optional[Tuple[Any]]:
+        """(value,) for the value at the current position, or None until it is complete.
+
+        A value that goes on past the buffer is moved out of it, to be
+        scanned as the next chunks arrive (see feed).
+        """
+        buffer, start = self._buffer, self._pos
+        char = buffer[start]
+        self._scalar = char not in '"[{'
+        self._depth = 1 if char in "[{" else 0
+        self._in_string = char == '"'
+        self._escaped = False
+        end = self._scan(buffer, start if self._scalar else start + 1)
+        if end is None and not final:
+            self._partial = [buffer[start:]]
+            self._buffer, self._pos = "", 0
+            return None
+        value, self._pos = self._decode_value(buffer, start)
+        return (value,)
+
+    def _accept(self, value: Any, items: List[Any]) -> None:
+        """Take a decoded value: a member name, a skipped member value, or an item"""
+        if self._state == "member":
+            self._member = value
+            self._state = "colon"
+        elif self._state == "value":
+            self._state = "member"
+        else:
+            items.append(value)
+
+    def _parse(self, final: bool) -> List[Any]:
+        items: List[Any] = []
+        while not self.done:
+            char = self._skip_whitespace()
+            if char is None:
+                break
+            state = self._state
+
+            if state == "start":
+                if char != "{":
+                    raise ValueError("Response body is not a JSON object")
+                self._pos += 1
+                self._state = "member"
+            elif state == "member" and char == "}":
+                self._pos += 1
+                self._state = "end"
+            elif state == "colon":
+                if char != ":":
+                    raise ValueError("Malformed JSON object in response body")
+                self._pos += 1
+                self._state = "value"
+            elif state == "value" and self._member == self.key and char == "[":
+                self._pos += 1
+                self._state = "items"
+            elif state == "items" and char == "]":
+                self._pos += 1
+                self.done = True
+            elif state in ("member", "items") and char == ",":
+                self._pos += 1
+            elif state in ("member", "value", "items"):
+                # A member name, another member's value (dropped) or an item
+                decoded = self._decode(final)
+                if decoded is None:
+                    break
+                self._accept(decoded[0], items)
+            else:
+                # Trailing data after the object
+                break
+        return items
@@ -1,95 +1,136 @@
 import asyncio
 import logging
-import sys
-import signal
-from typing import Dict, Any, Optional, List
+import os
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, List, AsyncIterator
 
 from mcp.server.fastmcp import FastMCP
 from pydantic import BaseModel, Field
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[logging.StreamHandler()],
+from mcpserver.metrics import METRICS, MetricsSnapshot
+from mcpserver.runtime import configure_logging, parse_server_args, run_transport
+from mcpserver.expression import (
+    EvaluationPool,
+    ExpressionError,
+    compile_expression,
+    evaluate_expression,
+    evaluate_many,
+    evaluate_vector,
 )
-logger = logging.getLogger("math_mcp")
-
-# Flag to track shutdown state
-shutdown_requested = False
 
-def signal_handler(sig, frame):
-    """Handle termination signals"""
-    global shutdown_requested
-    logger.info("Received termination signal, initiating shutdown...")
-    shutdown_requested = True
+logger = logging.getLogger("math_mcp")
 
-# Set up signal handlers
-signal.signal(signal.SIGINT, signal_handler)
-signal.signal(signal.SIGTERM, signal_handler)
+# Port of the HTTP transports
+DEFAULT_PORT = 8103
 
 # Input/output models
 class CalculateResponse(BaseModel):
     result: float
     expression: str
 
-def run_server():
-    """Run the Math MCP server"""
+class CalculateManyResponse(BaseModel):
+    results: List[Optional[float]]
+    errors: Dict[int, str] = Field(
+        default_factory=dict, description="Error messages by result index"
+    )
+
+def create_server() -> FastMCP:
+    """Create the Math MCP server with its tools"""
+    pool = EvaluationPool(
+        max_workers=int(os.environ.get("MATH_POOL_WORKERS", 2)),
+        timeout=float(os.environ.get("MATH_TIMEOUT", 5.0)),
+    )
+
+    @asynccontextmanager
+    async def lifespan(server: FastMCP) -> AsyncIterator[EvaluationPool]:
+        """Warm the evaluation pool in the background and stop it on shutdown"""
+        warm_task = asyncio.create_task(pool.warm())
+        try:
+            yield pool
+        finally:
+            warm_task.cancel()
+            pool.close()
+
+    # Create FastMCP server with name
+    mcp = FastMCP("Math Operations", lifespan=lifespan)
+
+    # Define the calculate tool
+    @mcp.tool()
+    @METRICS.instrument_tool("math")
+    async def calculate(expression: str) -> CalculateResponse:
+        """Calculate the result of a mathematical expression"""
+        try:
+            logger.info(f"Calculating expression: {expression}")
+
+            # Parsing is cached, so repeated expressions skip straight to evaluation.
+            # Evaluation runs in the pool, so an expression that is slow despite the
+            # limits is stopped by the timeout rather than blocking the server
+            compiled = compile_expression(expression)
+            result = await pool.run(evaluate_expression, expression)
+
+            logger.info(f"Calculation result: {result}")
+            return CalculateResponse(result=result, expression=compiled.source)
+        except Exception as e:
+            logger.error(f"Error calculating expression: {str(e)}")
+            raise ValueError(f"Error calculating expression: {str(e)}")
+
+    # Define the calculate_many tool
+    @mcp.tool()
+    @METRICS.instrument_tool("math")
+    async def calculate_many(
+        expressions: Optional[List[str]] = None,
+        expression: Optional[str] = None,
+        variables: Optional[Dict[str, List[float]]] = None,
+    ) -> CalculateManyResponse:
+        """Calculate many results in one call: either a list of independent expressions,
+        or one expression (e.g. "x^2 + y") evaluated for each position of the variable arrays"""
+        try:
+            if (expressions is None) == (expression is None):
+                raise ExpressionError("Provide either expressions or expression, not both")
+
+            # Evaluation runs in the pool with its timeout, as for calculate
+            if expressions is not None:
+                logger.info(f"Calculating {len(expressions)} expressions")
+                results, errors = await pool.run(evaluate_many, expressions)
+            else:
+                bindings = variables or {}
+                # Rejects invalid expressions before they reach a worker
+                compile_expression(expression)
+                size = max((len(values) for values in bindings.values()), default=1)
+                logger.info(f"Calculating {expression} over {size} bindings")
+                if not bindings:
+                    results, errors = [await pool.run(evaluate_expression, expression)], {}
+                else:
+                    results, errors = await pool.run(evaluate_vector, expression, bindings)
+
+            return CalculateManyResponse(results=results, errors=errors)
+        except Exception as e:
+            logger.error(f"Error calculating expressions: {str(e)}")
+            raise ValueError(f"Error calculating expressions: {str(e)}")
+
+    # Define the math_metrics tool
+    @mcp.tool()
+    async def math_metrics() -> MetricsSnapshot:
+        """Get latency histograms (count, errors, p50/p95/p99) of this server's tools and upstream
+        calls"""
+        return METRICS.snapshot()
+
+    return mcp
+
+def run_server(transport: str = "stdio", host: str = "127.0.0.1", port: int = DEFAULT_PORT):
+    """Run the Math MCP server over stdio, or over streamable HTTP or SSE on host:port"""
+    # Process-wide setup happens here rather than at import, so importing
+    # the module (e.g. to run the server in-process) has no side effects
+    configure_logging()
+
     try:
         logger.info("Starting Math MCP server")
-        
-        # Create FastMCP server with name
-        mcp = FastMCP("Math Operations")
-        
-        # Define the calculate tool
-        @mcp.tool()
-        async def calculate(expression: str) -> CalculateResponse:
-            """Calculate the result of a mathematical expression"""
-            global shutdown_requested
-            
-            if shutdown_requested:
-                logger.info("Shutdown requested, canceling calculation")
-                raise ValueError("Server is shutting down")
-                
-            try:
-                logger.info(f"Calculating expression: {expression}")
-                
-                # Security check to prevent code execution
-                allowed_chars = set("0123456789+-*/().^ ")
-                if not all(c in allowed_chars for c in expression):
-                    raise ValueError("Expression contains invalid characters")
-                
-                # Replace ^ with ** for exponentiation
-                expression = expression.replace("^", "**")
-                
-                # Safety evaluation using Python's eval
-                # Note: This is generally not recommended in production without more safeguards
-                result = eval(expression, {"__builtins__": {}}, {})
-                
-                logger.info(f"Calculation result: {result}")
-                return CalculateResponse(result=float(result), expression=expression)
-            except Exception as e:
-                logger.error(f"Error calculating expression: {str(e)}")
-                raise ValueError(f"Error calculating expression: {str(e)}")
-        
-        # Setup shutdown check task
-        async def check_shutdown():
-            """Periodically check if shutdown was requested"""
-            while not shutdown_requested:
-                await asyncio.sleep(0.5)
-            logger.info("Shutdown check detected termination request")
-            
-        # Start the server with a shutdown task
-        if "stdio" in sys.argv:
-            # For testing with stdio directly
-            asyncio.run(asyncio.gather(
-                mcp.run_stdio_async(),
-                check_shutdown()
-            ))
-        else:
-            # Normal operation
-            mcp.run(transport="stdio")
-            
+
+        mcp = create_server()
+
+        # Serve until stdin closes (stdio) or a termination signal arrives
+        run_transport(mcp, transport=transport, host=host, port=port)
+
     except KeyboardInterrupt:
         logger.info("Math MCP server stopped by keyboard interrupt")
     except Exception as e:
@@ -98,4 +139,5 @@ def run_server():
         logger.info("Math MCP server shutdown complete")
 
 if __name__ == "__main__":
-    run_server() 
\ No newline at end of file
+    args = parse_server_args(DEFAULT_PORT)
+    run_server(args.transport, args.host, args.port)
@@ -0,0 +1,289 @@
+"""Latency instrumentation for the agent and the MCP servers.
+
+Timing spans are aggregated into in-memory histograms, one per metric name
+and label set. They can be read as a JSON-friendly snapshot (served by each
+server's metrics tool) or in the Prometheus text format (served by the
+agent service at /metrics), and optionally forwarded to OpenTelemetry as
+trace spans.
+
+Instrumentation is controlled by METRICS_ENABLED. When disabled, span()
+returns a shared no-op context manager and instrument() returns the
+function unchanged, so the cost is one attribute check per span.
+"""
+
+import functools
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+logger = logging.getLogger("mcp_metrics")
+
+# Histogram bucket upper bounds in seconds (the Prometheus client defaults, plus 1ms)
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+# Metric names
+TOOL_DURATION = "mcp_tool_duration_seconds"
+UPSTREAM_DURATION = "upstream_request_duration_seconds"
+CLIENT_CALL_DURATION = "mcp_client_call_duration_seconds"
+LLM_STEP_DURATION = "llm_step_duration_seconds"
+AGENT_QUERY_DURATION = "agent_query_duration_seconds"
+TIME_TO_FIRST_TOKEN = "agent_time_to_first_token_seconds"
+TIME_TO_FIRST_TOOL_RESULT = "agent_time_to_first_tool_result_seconds"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+class HistogramSnapshot(BaseModel):
+    name: str
+    labels: Dict[str, str]
+    count: int
+    errors: int
+    sum_ms: float
+    p50_ms: Optional[float] = None
+    p95_ms: Optional[float] = None
+    p99_ms: Optional[float] = None
+
+class MetricsSnapshot(BaseModel):
+    enabled: bool
+    histograms: List[HistogramSnapshot]
+
+class Histogram:
+    """Per-bucket counts of observed durations in seconds"""
+
+    __slots__ = ("counts", "count", "errors", "sum", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.errors = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float, error: bool = False) -> None:
+        index = 0
+        while index < len(BUCKETS) and seconds > BUCKETS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+        if error:
+            self.errors += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a quantile in seconds by interpolating within its bucket"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = BUCKETS[index - 1] if index > 0 else 0.0
+                # The overflow bucket has no upper bound, so the largest observation stands in
+                upper = BUCKETS[index] if index < len(BUCKETS) else self.max
+                # Never report more than was actually observed (matters for small counts)
+                return min(lower + (upper - lower) * (rank - seen) / bucket_count, self.max)
+            seen += bucket_count
+        return self.max
+
+class Span:
+    """Times a block and records it in the registry on exit"""
+
+    __slots__ = ("registry", "name", "labels", "started", "started_ns")
+
+    def __init__(self, registry: "MetricsRegistry", name: str, labels: Labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self) -> "Span":
+        self.started_ns = time.time_ns()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.registry.observe(
+            self.name,
+            self.labels,
+            time.perf_counter() - self.started,
+            error=exc_type is not None,
+            started_ns=self.started_ns,
+        )
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        return None
+
+_NOOP_SPAN = _NoopSpan()
+
+class OpenTelemetryExporter:
+    """Forwards finished spans to the OpenTelemetry tracer provider.
+
+    Only the OpenTelemetry API is used here; the SDK and exporter are
+    configured as usual (e.g. with opentelemetry-instrument or OTEL_*
+    environment variables).
+    """
+
+    def __init__(self):
+        from opentelemetry import trace
+
+        self._trace = trace
+        self._tracer = trace.get_tracer("langchain-mcp")
+
+    def export(
+        self, name: str, labels: Labels, started_ns: int, seconds: float, error: bool
+    ) -> None:
+        span = self._tracer.start_span(name, start_time=started_ns, attributes=dict(labels))
+        if error:
+            span.set_status(self._trace.Status(self._trace.StatusCode.ERROR))
+        span.end(end_time=started_ns + int(seconds * 1e9))
+
+class MetricsRegistry:
+    """Histograms keyed by metric name and labels"""
+
+    def __init__(self, enabled: bool = True, otel: bool = False):
+        self.enabled = enabled
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._exporter: Optional[OpenTelemetryExporter] = None
+        if enabled and otel:
+            try:
+                self._exporter = OpenTelemetryExporter()
+            except ImportError:
+                logger.warning("METRICS_OTEL is set but opentelemetry-api is not installed")
+
+    @classmethod
+    def from_env(cls) -> "MetricsRegistry":
+        """Build the registry from METRICS_ENABLED (default on) and METRICS_OTEL (default off)"""
+        return cls(
+            enabled=os.environ.get("METRICS_ENABLED", "true").lower() in ("1", "true", "yes"),
+            otel=os.environ.get("METRICS_OTEL", "").lower() in ("1", "true", "yes"),
+        )
+
+    def span(self, name: str, **labels: str):
+        """Context manager timing its block into histogram name{labels}"""
+        if not self.enabled:
+            return _NOOP_SPAN
+        return Span(self, name, tuple(sorted(labels.items())))
+
+    def instrument(self, name: str, **labels: str) -> Callable[[Callable], Callable]:
+        """Decorator timing each call of an async function.
+
+        Uses functools.wraps, so FastMCP still sees the original signature
+        when the decorator is applied below @mcp.tool().
+        """
+
+        def decorator(fn: Callable) -> Callable:
+            if not self.enabled:
+                return fn
+
+            key = tuple(sorted(labels.items()))
+
+            @functools.wraps(fn)
+            async def wrapper(*args: Any, **kwargs: Any) -> Any:
+                with Span(self, name, key):
+                    return await fn(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def instrument_tool(self, server: str) -> Callable[[Callable], Callable]:
+        """instrument() for an MCP tool body, labelled with the server and the function name"""
+
+        def decorator(fn: Callable) -> Callable:
+            return self.instrument(TOOL_DURATION, server=server, tool=fn.__name__)(fn)
+
+        return decorator
+
+    def record(self, name: str, seconds: float, **labels: str) -> None:
+        """Record a duration measured elsewhere, e.g. a time-to-first-token"""
+        if self.enabled:
+            self.observe(name, tuple(sorted(labels.items())), seconds)
+
+    def observe(
+        self,
+        name: str,
+        labels: Labels,
+        seconds: float,
+        error: bool = False,
+        started_ns: Optional[int] = None,
+    ) -> None:
+        histogram = self._histograms.get((name, labels))
+        if histogram is None:
+            histogram = self._histograms[(name, labels)] = Histogram()
+        histogram.observe(seconds, error)
+
+        if self._exporter is not None:
+            try:
+                self._exporter.export(
+                    name, labels, started_ns or time.time_ns() - int(seconds * 1e9), seconds, error
+                )
+            except Exception as e:
+                logger.warning(f"Could not export span {name}: {e}")
+
+    def snapshot(self) -> MetricsSnapshot:
+        histograms = []
+        for (name, labels), histogram in sorted(self._histograms.items()):
+            quantiles = {
+                field: round(value * 1000, 2) if value is not None else None
+                for field, value in (
+                    ("p50_ms", histogram.quantile(0.5)),
+                    ("p95_ms", histogram.quantile(0.95)),
+                    ("p99_ms", histogram.quantile(0.99)),
+                )
+            }
+            histograms.append(HistogramSnapshot(
+                name=name,
+                labels=dict(labels),
+                count=histogram.count,
+                errors=histogram.errors,
+                sum_ms=round(histogram.sum * 1000, 2),
+                **quantiles,
+            ))
+        return MetricsSnapshot(enabled=self.enabled, histograms=histograms)
+
+    def render_prometheus(self) -> str:
+        """All histograms in the Prometheus text exposition format"""
+        lines: List[str] = []
+        by_name: Dict[str, List[Tuple[Labels, Histogram]]] = {}
+        for (name, labels), histogram in sorted(self._histograms.items()):
+            by_name.setdefault(name, []).append((labels, histogram))
+
+        for name, series in by_name.items():
+            lines.append(f"# TYPE {name} histogram")
+            for labels, histogram in series:
+                cumulative = 0
+                for bound, bucket_count in zip((*BUCKETS, float("inf")), histogram.counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{name}_bucket{_format_labels(labels, le=le)} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+            errors_name = f"{name.removesuffix('_duration_seconds')}_errors_total"
+            lines.append(f"# TYPE {errors_name} counter")
+            for labels, histogram in series:
+                lines.append(f"{errors_name}{_format_labels(labels)} {histogram.errors}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        self._histograms.clear()
+
+def _format_labels(labels: Labels, **extra: str) -> str:
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+# Process-wide registry shared by the servers and, for in-process servers, the agent
+METRICS = MetricsRegistry.from_env()
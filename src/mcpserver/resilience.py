@@ -0,0 +1,310 @@
+"""Protection for upstream HTTP APIs that enforce quotas or go down.
+
+UpstreamGuard wraps each upstream request with:
+
+- a token-bucket rate limiter shared by all requests of a server
+- adaptive concurrency (AIMD): the number of requests in flight grows by
+  about one per round of successful requests, and halves on 429 or 5xx
+- retries with jittered exponential backoff that wait at least as long as
+  the upstream's Retry-After header asks
+- a circuit breaker that fails fast after repeated 5xx or connection
+  failures, then lets a single probe request through once the reset
+  timeout has passed
+
+Callers can catch the failures marked by is_upstream_failure() to serve
+stale cached results instead.
+"""
+
+import asyncio
+import email.utils
+import logging
+import os
+import random
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import httpx
+from pydantic import BaseModel
+
+T = TypeVar("T")
+
+logger = logging.getLogger("mcp_resilience")
+
+# Seconds after a concurrency decrease during which further overload signals
+# are ignored, so one burst of errors (all sent at the old limit) halves it once
+DECREASE_INTERVAL = 1.0
+
+class ResilienceConfig(BaseModel):
+    """Settings for an UpstreamGuard"""
+    rate_limit: float = 0.0
+    rate_burst: int = 0
+    max_concurrency: int = 20
+    retries: int = 3
+    retry_base_delay: float = 0.5
+    retry_max_delay: float = 10.0
+    breaker_threshold: int = 5
+    breaker_reset: float = 30.0
+
+    @classmethod
+    def from_env(cls, prefix: str) -> "ResilienceConfig":
+        """Build the config from <prefix>_* variables, keeping defaults for unset ones"""
+        env = {
+            "rate_limit": os.environ.get(f"{prefix}_RATE_LIMIT"),
+            "rate_burst": os.environ.get(f"{prefix}_RATE_BURST"),
+            "max_concurrency": os.environ.get(f"{prefix}_MAX_CONCURRENCY"),
+            "retries": os.environ.get(f"{prefix}_RETRIES"),
+            "retry_base_delay": os.environ.get(f"{prefix}_RETRY_BASE_DELAY"),
+            "retry_max_delay": os.environ.get(f"{prefix}_RETRY_MAX_DELAY"),
+            "breaker_threshold": os.environ.get(f"{prefix}_BREAKER_THRESHOLD"),
+            "breaker_reset": os.environ.get(f"{prefix}_BREAKER_RESET"),
+        }
+        return cls(**{key: value for key, value in env.items() if value})
+
+class ResilienceStats(BaseModel):
+    """Counters and current state of an UpstreamGuard"""
+    circuit: str = "closed"
+    concurrency_limit: int = 0
+    in_flight: int = 0
+    requests: int = 0
+    retries: int = 0
+    rate_limited: int = 0
+    failures: int = 0
+    rejected: int = 0
+    stale_served: int = 0
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream that is failing"""
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """Whether an error means the upstream is unhealthy, rather than the request being bad"""
+    if isinstance(error, (CircuitOpenError, httpx.TransportError)):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return False
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header, given as seconds or an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0.0)
+
+def backoff_delay(
+    attempt: int,
+    base_delay: float,
+    max_delay: float,
+    retry_after: Optional[float] = None,
+) -> Optional[float]:
+    """Delay before retry number attempt (from 0).
+
+    None if Retry-After asks for more than max_delay. Uses full jitter, so
+    clients that failed together don't retry together.
+    """
+    if retry_after is not None:
+        if retry_after > max_delay:
+            return None
+        return retry_after + random.uniform(0, base_delay)
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+class TokenBucket:
+    """Allows rate requests per second on average, in bursts of up to burst"""
+
+    def __init__(self, rate: float, burst: int = 0):
+        self.rate = rate
+        self.capacity = float(burst or max(1, int(rate)))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._resume_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def hold(self, seconds: float) -> None:
+        """Stop handing out tokens for a while, e.g. when the upstream sent Retry-After"""
+        self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+    async def acquire(self) -> None:
+        if self.rate <= 0 and self._resume_at <= time.monotonic():
+            return
+        # The lock makes waiters take tokens in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if self._resume_at > now:
+                    await asyncio.sleep(self._resume_at - now)
+                    continue
+                if self.rate <= 0:
+                    return
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+class AdaptiveConcurrency:
+    """Concurrency limit adjusted by additive increase, multiplicative decrease"""
+
+    def __init__(self, max_limit: int, min_limit: int = 1, decrease_factor: float = 0.5):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.decrease_factor = decrease_factor
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self._last_decrease = float("-inf")
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self) -> "AdaptiveConcurrency":
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self) -> None:
+        self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+
+    def on_overload(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < DECREASE_INTERVAL:
+            return
+        self._last_decrease = now
+        previous = int(self.limit)
+        self.limit = max(float(self.min_limit), self.limit * self.decrease_factor)
+        if int(self.limit) != previous:
+            logger.warning(
+                f"Upstream overloaded, concurrency limit {previous} -> {int(self.limit)}"
+            )
+
+class CircuitBreaker:
+    """Opens after threshold consecutive failures and half-opens after reset_timeout"""
+
+    def __init__(self, threshold: int, reset_timeout: float):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_started: Optional[float] = None
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a request may go out now"""
+        if self.state == "closed" or self.threshold <= 0:
+            return
+        now = time.monotonic()
+        if self.state == "open":
+            remaining = self._opened_at + self.reset_timeout - now
+            if remaining > 0:
+                raise CircuitOpenError(
+                    f"Upstream unavailable after {self.failures} consecutive failures, "
+                    f"retry in {remaining:.0f}s"
+                )
+            self.state = "half_open"
+            self._probe_started = None
+        # Half-open: one probe at a time; a probe that never reported back (e.g. was
+        # cancelled) expires
+        if self._probe_started is not None and now - self._probe_started < self.reset_timeout:
+            raise CircuitOpenError("Upstream unavailable, a probe request is in flight")
+        self._probe_started = now
+
+    def record_success(self) -> None:
+        if self.state != "closed":
+            logger.info("Upstream recovered, closing circuit")
+        self.state = "closed"
+        self.failures = 0
+        self._probe_started = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        tripped = self.state == "closed" and 0 < self.threshold <= self.failures
+        if self.state == "half_open" or tripped:
+            logger.warning(f"Opening circuit after {self.failures} consecutive upstream failures")
+            self.state = "open"
+            self._opened_at = time.monotonic()
+            self._probe_started = None
+
+class UpstreamGuard:
+    """Rate limiting, adaptive concurrency, retries and circuit breaking for one upstream"""
+
+    def __init__(self, config: ResilienceConfig, name: str = "upstream"):
+        self.config = config
+        self.name = name
+        self.stats = ResilienceStats()
+        self.bucket = TokenBucket(config.rate_limit, config.rate_burst)
+        self.concurrency = AdaptiveConcurrency(max(config.max_concurrency, 1))
+        self.breaker = CircuitBreaker(config.breaker_threshold, config.breaker_reset)
+
+    async def request(self, send: Callable[[], Awaitable[T]]) -> T:
+        """Run send(), retrying while the upstream is overloaded.
+
+        send should raise for error statuses.
+        """
+        attempt = 0
+        while True:
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError:
+                self.stats.rejected += 1
+                raise
+            await self.bucket.acquire()
+            retry_after = None
+            async with self.concurrency:
+                self.stats.requests += 1
+                try:
+                    response = await send()
+                except httpx.HTTPStatusError as e:
+                    if not is_upstream_failure(e):
+                        # The upstream answered; the request itself was bad
+                        self.breaker.record_success()
+                        raise
+                    error: Exception = e
+                    throttled = e.response.status_code == 429
+                    if throttled:
+                        self.stats.rate_limited += 1
+                    retry_after = parse_retry_after(e.response.headers.get("retry-after"))
+                    if retry_after:
+                        self.bucket.hold(retry_after)
+                    self.concurrency.on_overload()
+                except httpx.TransportError as e:
+                    error = e
+                    throttled = False
+                else:
+                    self.concurrency.on_success()
+                    self.breaker.record_success()
+                    return response
+
+            self.stats.failures += 1
+            # Throttling means the upstream is up but wants fewer requests, which
+            # backoff and the concurrency limit handle; only outages open the circuit
+            if not throttled:
+                self.breaker.record_failure()
+            delay = None
+            if attempt < self.config.retries and self.breaker.state == "closed":
+                delay = backoff_delay(
+                    attempt, self.config.retry_base_delay, self.config.retry_max_delay, retry_after
+                )
+            if delay is None:
+                raise error
+            attempt += 1
+            self.stats.retries += 1
+            logger.warning(f"{self.name} request failed ({error}), retry {attempt} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    def snapshot(self) -> ResilienceStats:
+        """Return a copy of the counters with the current state"""
+        stats = self.stats.model_copy()
+        stats.circuit = self.breaker.state
+        stats.concurrency_limit = int(self.concurrency.limit)
+        stats.in_flight = self.concurrency.in_flight
+        return stats
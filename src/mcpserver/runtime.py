@@ -0,0 +1,412 @@
+"""Process-level runtime shared by the MCP server entry points.
+
+Server modules build a FastMCP instance and hand it to run_transport(),
+which serves it over stdio or HTTP on asyncio's or uvloop's event loop
+(MCP_EVENT_LOOP). On SIGINT/SIGTERM new tool calls are refused and the
+ones in flight get up to MCP_DRAIN_TIMEOUT seconds to finish before the
+server stops and runs its lifespan cleanup.
+"""
+
+import argparse
+import asyncio
+import importlib.metadata
+import logging
+import os
+import signal
+import sys
+from contextlib import asynccontextmanager, nullcontext
+from typing import Any, AsyncIterator, Awaitable, Callable, Coroutine, List, Optional
+
+import anyio
+from mcp import types
+from mcp.server.fastmcp import FastMCP
+from mcp.server.stdio import stdio_server
+from mcp.shared.message import SessionMessage
+
+from mcpserver import fastpath
+
+logger = logging.getLogger("mcp_runtime")
+
+def configure_logging(level: int = logging.INFO) -> None:
+    """Configure root logging for a server process (stderr, since stdout carries the protocol)"""
+    logging.basicConfig(
+        level=level,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        handlers=[logging.StreamHandler()],
+    )
+
+# Longest protocol message (one line) accepted on stdin
+MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+
+TRANSPORTS = ("stdio", "streamable-http", "sse")
+
+# Default seconds in-flight tool calls get to finish after a termination signal
+DRAIN_TIMEOUT = 10.0
+
+# Seconds HTTP servers then wait for open connections (e.g. SSE streams) to close
+HTTP_SHUTDOWN_GRACE = 2.0
+
+EVENT_LOOPS = ("auto", "uvloop", "asyncio")
+
+# Interfaces on which FastMCP's DNS rebinding protection (localhost Host headers only) stays on
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+class PipeLines:
+    """Async iterator over the lines of a pipe, read by the event loop.
+
+    Stands in for the stdin file the mcp stdio transport reads by default,
+    which is read on a worker thread that can't be cancelled, so a server
+    could only stop after its client closed stdin.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader):
+        self._reader = reader
+
+    def __aiter__(self) -> "PipeLines":
+        return self
+
+    async def __anext__(self) -> str:
+        line = await self._reader.readline()
+        if not line:
+            raise StopAsyncIteration
+        return line.decode("utf-8", errors="replace")
+
+    def close(self) -> None:
+        """End the iteration after the lines already read"""
+        self._reader.feed_eof()
+
+async def open_stdin() -> Optional[PipeLines]:
+    """Stdin as PipeLines, or None when it isn't a pipe (e.g. a regular file)"""
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=MAX_MESSAGE_BYTES)
+    stdin = os.fdopen(os.dup(sys.stdin.fileno()), "rb", buffering=0)
+    try:
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), stdin)
+    except (OSError, ValueError):
+        stdin.close()
+        return None
+    return PipeLines(reader)
+
+async def open_stdout() -> Optional[asyncio.StreamWriter]:
+    """Stdout as a StreamWriter, or None when it isn't a pipe.
+
+    Writes then go out from the event loop; the mcp stdio transport hands
+    each write and flush of every frame to a worker thread instead.
+    """
+    loop = asyncio.get_running_loop()
+    stdout = os.fdopen(os.dup(sys.stdout.fileno()), "wb", buffering=0)
+    try:
+        transport, protocol = await loop.connect_write_pipe(
+            asyncio.streams.FlowControlMixin, stdout
+        )
+    except (OSError, ValueError):
+        stdout.close()
+        return None
+    return asyncio.StreamWriter(transport, protocol, None, loop)
+
+@asynccontextmanager
+async def pipe_streams(stdin: PipeLines, stdout: asyncio.StreamWriter) -> AsyncIterator[tuple]:
+    """The read and write streams of mcp.server.stdio.stdio_server, over pipes read and
+    written by the event loop and with frames coded by mcpserver.fastpath"""
+    read_stream_writer, read_stream = anyio.create_memory_object_stream(0)
+    write_stream, write_stream_reader = anyio.create_memory_object_stream(0)
+
+    async def read_frames() -> None:
+        async with read_stream_writer:
+            async for line in stdin:
+                try:
+                    message = fastpath.parse_message(line)
+                except Exception as exc:
+                    await read_stream_writer.send(exc)
+                    continue
+                await read_stream_writer.send(SessionMessage(message))
+
+    async def write_frames() -> None:
+        async with write_stream_reader:
+            async for session_message in write_stream_reader:
+                stdout.write(fastpath.dump_message(session_message.message) + b"\n")
+                await stdout.drain()
+
+    try:
+        async with anyio.create_task_group() as task_group:
+            task_group.start_soon(read_frames)
+            task_group.start_soon(write_frames)
+            yield read_stream, write_stream
+    finally:
+        stdout.close()
+
+async def serve_stdio(mcp: FastMCP, stdin: Optional[PipeLines] = None) -> None:
+    """FastMCP.run_stdio_async, reading and writing the pipes with the event loop when possible"""
+    server = mcp._mcp_server
+    stdout = await open_stdout() if stdin is not None and fastpath.enabled() else None
+    transport = pipe_streams(stdin, stdout) if stdout is not None else stdio_server(stdin=stdin)
+    async with transport as (read_stream, write_stream):
+        await server.run(read_stream, write_stream, server.create_initialization_options())
+
+def _check_server_hooks(server: Any) -> None:
+    """Raise if the low-level server lacks the private hooks CallTracker wraps.
+
+    They aren't part of the mcp library's API (its 2.x releases replaced
+    them), so a release without them fails here, at startup, rather than
+    serving without draining.
+    """
+    handlers = getattr(server, "request_handlers", None)
+    if (
+        not callable(getattr(server, "_handle_request", None))
+        or not isinstance(handlers, dict)
+        or types.CallToolRequest not in handlers
+    ):
+        try:
+            version = importlib.metadata.version("mcp")
+        except importlib.metadata.PackageNotFoundError:
+            version = "unknown"
+        raise RuntimeError(
+            f"mcp {version} doesn't provide Server._handle_request and request_handlers, "
+            "which the shutdown drain hooks into; install mcp>=1.10,<2"
+        )
+
+class CallTracker:
+    """Counts the tool calls a server is running and refuses new ones once closed.
+
+    Hooks into the low-level server, so the tools themselves don't need to
+    check for shutdown. A call counts as running until its response has
+    been handed to the transport, so a server stopped once no calls are
+    running doesn't lose any answers.
+    """
+
+    def __init__(self, mcp: FastMCP):
+        self.in_flight = 0
+        self.closed = False
+        self._idle = asyncio.Event()
+        self._idle.set()
+        server = mcp._mcp_server
+        _check_server_hooks(server)
+        handle_request = server._handle_request
+        call_tool = server.request_handlers[types.CallToolRequest]
+
+        async def counted(message, request, *args, **kwargs) -> None:
+            if not isinstance(request, types.CallToolRequest):
+                return await handle_request(message, request, *args, **kwargs)
+            self.in_flight += 1
+            self._idle.clear()
+            try:
+                return await handle_request(message, request, *args, **kwargs)
+            finally:
+                self.in_flight -= 1
+                if self.in_flight == 0:
+                    self._idle.set()
+
+        async def refusing(request: types.CallToolRequest) -> types.ServerResult:
+            if self.closed:
+                return types.ServerResult(types.CallToolResult(
+                    content=[types.TextContent(type="text", text="Server is shutting down")],
+                    isError=True,
+                ))
+            return await call_tool(request)
+
+        server._handle_request = counted
+        server.request_handlers[types.CallToolRequest] = refusing
+
+    def close(self) -> None:
+        self.closed = True
+
+    async def wait_idle(self) -> None:
+        await self._idle.wait()
+
+def drain_timeout() -> float:
+    """Seconds in-flight tool calls get to finish after a termination signal (MCP_DRAIN_TIMEOUT)"""
+    return float(os.environ.get("MCP_DRAIN_TIMEOUT", DRAIN_TIMEOUT))
+
+def event_loop_factory() -> Optional[Callable[[], asyncio.AbstractEventLoop]]:
+    """uvloop's loop factory if selected by MCP_EVENT_LOOP and available, else None for asyncio's"""
+    choice = os.environ.get("MCP_EVENT_LOOP", "auto")
+    if choice not in EVENT_LOOPS:
+        raise ValueError(
+            f"Unknown MCP_EVENT_LOOP {choice!r}, expected one of {', '.join(EVENT_LOOPS)}"
+        )
+    if choice == "asyncio" or (choice == "auto" and sys.platform == "win32"):
+        return None
+    try:
+        import uvloop
+    except ImportError:
+        if choice == "uvloop":
+            raise
+        return None
+    return uvloop.new_event_loop
+
+def run_async(main: Coroutine) -> Any:
+    """asyncio.run(main) on the event loop selected by MCP_EVENT_LOOP"""
+    loop_factory = event_loop_factory()
+    if loop_factory is None:
+        return asyncio.run(main)
+    if sys.version_info >= (3, 11):
+        with asyncio.Runner(loop_factory=loop_factory) as runner:
+            return runner.run(main)
+    import uvloop
+
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return asyncio.run(main)
+
+def run_stdio(mcp: FastMCP) -> None:
+    """Serve mcp over stdio until stdin closes or SIGINT/SIGTERM arrives.
+
+    On a signal, new tool calls are refused; the server stops once the
+    calls in flight have been answered, or when the drain timeout passes,
+    and then runs its lifespan cleanup.
+    """
+    calls = CallTracker(mcp)
+
+    async def main() -> None:
+        stdin = await open_stdin()
+
+        async def shutdown(server: asyncio.Task) -> None:
+            await _drain(server, calls, drain_timeout())
+            if stdin is not None and not calls.in_flight:
+                # Ends the server's read loop, so it returns and its transport writes out the
+                # last answers
+                stdin.close()
+                await asyncio.wait({server}, timeout=1.0)
+
+        await _serve_until_signalled(serve_stdio(mcp, stdin), calls, shutdown)
+
+    run_async(main())
+
+def run_http(
+    mcp: FastMCP,
+    transport: str = "streamable-http",
+    host: str = "127.0.0.1",
+    port: int = 8000,
+) -> None:
+    """Serve mcp over streamable HTTP (at /mcp) or SSE (at /sse) until SIGINT/SIGTERM arrives.
+
+    On a signal, new tool calls are refused; once the calls in flight have
+    been answered, or the drain timeout has passed, the HTTP server stops,
+    giving open streams HTTP_SHUTDOWN_GRACE seconds to close.
+    """
+    import uvicorn
+
+    class Server(uvicorn.Server):
+        # Signals are handled by _serve_until_signalled, as for stdio
+        def capture_signals(self):
+            return nullcontext()
+
+    mcp.settings.host = host
+    mcp.settings.port = port
+    if host not in LOOPBACK_HOSTS:
+        # Binding beyond loopback is meant for remote agents, whose Host headers aren't localhost
+        mcp.settings.transport_security = None
+    app = mcp.streamable_http_app() if transport == "streamable-http" else mcp.sse_app()
+    server = Server(uvicorn.Config(
+        app,
+        host=host,
+        port=port,
+        log_level="warning",
+        timeout_graceful_shutdown=HTTP_SHUTDOWN_GRACE,
+    ))
+    calls = CallTracker(mcp)
+
+    async def shutdown(serving: asyncio.Task) -> None:
+        await _drain(serving, calls, drain_timeout())
+        server.should_exit = True
+        await asyncio.wait({serving}, timeout=HTTP_SHUTDOWN_GRACE + 1)
+
+    logger.info(f"Serving {transport} on http://{host}:{port}")
+    run_async(_serve_until_signalled(_with_shared_lifespan(mcp, server.serve()), calls, shutdown))
+
+def run_transport(
+    mcp: FastMCP,
+    transport: str = "stdio",
+    host: str = "127.0.0.1",
+    port: int = 8000,
+) -> None:
+    """run_stdio() or run_http(), by transport, with mcpserver.fastpath's fast paths installed"""
+    fastpath.install()
+    if transport == "stdio":
+        run_stdio(mcp)
+    elif transport in TRANSPORTS:
+        run_http(mcp, transport, host, port)
+    else:
+        raise ValueError(
+            f"Unknown transport {transport!r}, expected one of {', '.join(TRANSPORTS)}"
+        )
+
+async def _with_shared_lifespan(mcp: FastMCP, serve: Coroutine) -> None:
+    """Run serve with the server's lifespan entered once for all sessions.
+
+    The low-level server enters its lifespan for every session it runs.
+    Over stdio there is one session per process, but over HTTP there is one
+    per client, and each one closing would tear down the shared HTTP
+    client, cache or worker pool under the others.
+    """
+    server = mcp._mcp_server
+    async with server.lifespan(server) as context:
+        server.lifespan = lambda _: nullcontext(context)
+        await serve
+
+def parse_server_args(default_port: int, argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Command line options of a server module: --transport, --host and --port"""
+    parser = argparse.ArgumentParser(description="Run an MCP server")
+    parser.add_argument("--transport", choices=TRANSPORTS, default="stdio")
+    parser.add_argument(
+        "--host", default="127.0.0.1", help="Interface to listen on (HTTP transports)"
+    )
+    parser.add_argument(
+        "--port", type=int, default=default_port, help="Port to listen on (HTTP transports)"
+    )
+    return parser.parse_args(argv)
+
+async def _drain(server: asyncio.Task, calls: CallTracker, timeout: float) -> None:
+    """Wait until no tool calls are in flight, the server has stopped, or timeout has passed"""
+    idle = asyncio.create_task(calls.wait_idle())
+    try:
+        await asyncio.wait({server, idle}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        idle.cancel()
+
+async def _serve_until_signalled(
+    serve: Coroutine,
+    calls: CallTracker,
+    shutdown: Callable[[asyncio.Task], Awaitable[None]],
+) -> None:
+    """Run serve until it returns or SIGINT/SIGTERM arrives.
+
+    On a signal, calls is closed to new tool calls and shutdown(server task)
+    is awaited to let the server stop by itself; if it hasn't by then, it
+    is cancelled, as it is at once on a second signal. Nothing polls: every
+    wait is on a task or an event.
+    """
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+
+    def handle_signal() -> None:
+        if stop.is_set():
+            logger.warning("Received second termination signal, stopping without draining")
+            server.cancel()
+            return
+        logger.info("Received termination signal, refusing new tool calls and draining")
+        calls.close()
+        stop.set()
+
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, handle_signal)
+
+    server = asyncio.create_task(serve)
+    stopped = asyncio.create_task(stop.wait())
+    try:
+        await asyncio.wait({server, stopped}, return_when=asyncio.FIRST_COMPLETED)
+        if stop.is_set() and not server.done():
+            await shutdown(server)
+    finally:
+        stopped.cancel()
+        if not server.done():
+            if calls.in_flight:
+                logger.warning(
+                    f"Drain timeout passed, cancelling {calls.in_flight} tool calls in flight"
+                )
+            server.cancel()
+        await asyncio.gather(server, return_exceptions=True)
+    if stop.is_set():
+        logger.info("Server stopped by signal")
+    else:
+        # Stdin closed: re-raise anything the server failed with
+        server.result()
@@ -0,0 +1,137 @@
+"""Shrink search results to fit a token budget before they reach the model.
+
+Two steps, both extractive so nothing is paraphrased:
+
+- near-duplicate removal: results whose content shares most of its word
+  shingles with a higher-ranked result are dropped
+- sentence selection: the sentences most relevant to the query are kept,
+  across all results, until the budget is spent, and each result keeps
+  its selected sentences in their original order
+
+Token counts are estimated as characters / CHARS_PER_TOKEN, which is
+close enough for English text with the OpenAI tokenizers and needs no
+tokenizer dependency.
+"""
+
+import math
+import re
+from collections import Counter
+from typing import FrozenSet, List, Sequence, Set
+
+CHARS_PER_TOKEN = 4
+
+# Word shingle size and the Jaccard similarity above which two contents are near-duplicates
+SHINGLE_SIZE = 5
+DUPLICATE_THRESHOLD = 0.7
+
+# Marks sentences left out between kept ones, or the clipped end of a long sentence
+ELISION = "…"
+
+# Longer "sentences" (e.g. text without punctuation) are clipped to this many characters
+MAX_SENTENCE_CHARS = 400
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how in is it its of on or that the this to was "
+    "were what when where which who why will with about does did do".split()
+)
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(])")
+_WORD = re.compile(r"[a-z0-9]+")
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def words(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> FrozenSet[int]:
+    """Hashes of the overlapping size-word sequences of text"""
+    tokens = words(text)
+    if len(tokens) < size:
+        return frozenset({hash(tuple(tokens))}) if tokens else frozenset()
+    return frozenset(hash(tuple(tokens[i:i + size])) for i in range(len(tokens) - size + 1))
+
+def near_duplicates(contents: Sequence[str], threshold: float = DUPLICATE_THRESHOLD) -> Set[int]:
+    """Indices of contents that nearly duplicate an earlier (higher-ranked) one.
+
+    Compares exact Jaccard similarity of the shingle sets; with at most a
+    few dozen results per call this is cheaper than MinHash signatures.
+    """
+    kept: List[FrozenSet[int]] = []
+    duplicates = set()
+    for index, content in enumerate(contents):
+        current = shingles(content)
+        if current and any(
+            len(current & other) / len(current | other) >= threshold for other in kept
+        ):
+            duplicates.add(index)
+            continue
+        kept.append(current)
+    return duplicates
+
+def split_sentences(text: str) -> List[str]:
+    return [
+        _clip(sentence.strip()) for sentence in _SENTENCE_BOUNDARY.split(text) if sentence.strip()
+    ]
+
+def truncate(text: str, budget_chars: int) -> str:
+    """text cut at a word boundary to fit budget_chars, ending with an elision mark"""
+    if len(text) <= budget_chars:
+        return text
+    if budget_chars <= len(ELISION):
+        return ""
+    cut = text[:budget_chars - len(ELISION)]
+    return (cut.rsplit(" ", 1)[0] if " " in cut else cut) + ELISION
+
+def _clip(sentence: str) -> str:
+    if len(sentence) <= MAX_SENTENCE_CHARS:
+        return sentence
+    return sentence[:MAX_SENTENCE_CHARS].rsplit(" ", 1)[0] + ELISION
+
+def select_sentences(query: str, contents: Sequence[str], budget_chars: int) -> List[str]:
+    """Trim each content to its most query-relevant sentences, within budget_chars in total.
+
+    Sentences are scored by the IDF-weighted query terms they contain,
+    normalized for length, with a small bonus for higher-ranked results and
+    for the first sentence of each result (which often summarizes it).
+    Returns the trimmed content per input, "" where nothing was kept.
+    """
+    query_terms = {term for term in words(query) if term not in STOPWORDS}
+    sentences = [split_sentences(content) for content in contents]
+
+    document_frequency: Counter = Counter()
+    total = 0
+    for result_sentences in sentences:
+        for sentence in result_sentences:
+            document_frequency.update(set(words(sentence)) & query_terms)
+            total += 1
+
+    candidates = []
+    for rank, result_sentences in enumerate(sentences):
+        for position, sentence in enumerate(result_sentences):
+            terms = set(words(sentence)) & query_terms
+            relevance = sum(math.log(1 + total / document_frequency[term]) for term in terms)
+            score = relevance / math.sqrt(max(len(sentence), 20) / 100)
+            score += 0.5 / (1 + rank) + (0.5 if position == 0 else 0.0)
+            candidates.append((score, rank, position, sentence))
+
+    chosen: List[Set[int]] = [set() for _ in contents]
+    remaining = budget_chars
+    for _, rank, position, sentence in sorted(candidates, key=lambda candidate: -candidate[0]):
+        # Sentence plus its separator and, at worst, an elision mark
+        cost = len(sentence) + len(ELISION) + 2
+        if cost <= remaining:
+            chosen[rank].add(position)
+            remaining -= cost
+
+    trimmed = []
+    for result_sentences, positions in zip(sentences, chosen):
+        parts = []
+        previous = -1
+        for position in sorted(positions):
+            if parts and position != previous + 1:
+                parts.append(ELISION)
+            parts.append(result_sentences[position])
+            previous = position
+        trimmed.append(" ".join(parts))
+    return trimmed
@@ -1,40 +1,29 @@
 import asyncio
+import math
 import os
-import signal
 import logging
-import sys
-from typing import Dict, Any, Union, List, Optional, AsyncIterator
-from dotenv import load_dotenv
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional, AsyncIterator, Tuple, TypedDict
 from mcp.server.fastmcp import FastMCP
 from pydantic import BaseModel, Field
 import httpx
 
-# Configure minimal logging first so we can log import errors
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler()
-    ]
+from mcpserver.metrics import METRICS, UPSTREAM_DURATION, MetricsSnapshot
+from mcpserver.runtime import configure_logging, parse_server_args, run_transport
+from mcpserver.cache import CacheConfig, CacheStats, ResponseCache, normalize_query
+from mcpserver.jsonstream import ArrayItems, ResponseTooLarge
+from mcpserver.resilience import (
+    ResilienceConfig,
+    ResilienceStats,
+    UpstreamGuard,
+    is_upstream_failure,
 )
+from mcpserver.shaping import CHARS_PER_TOKEN, near_duplicates, select_sentences, truncate
 
 logger = logging.getLogger("tavily_mcp")
 
-# Load environment variables
-load_dotenv()
-
-# Flag to track shutdown state
-shutdown_requested = False
-
-def signal_handler(sig, frame):
-    """Handle termination signals"""
-    global shutdown_requested
-    logger.info("Received termination signal, initiating shutdown...")
-    shutdown_requested = True
-
-# Set up signal handlers
-signal.signal(signal.SIGINT, signal_handler)
-signal.signal(signal.SIGTERM, signal_handler)
+# Port of the HTTP transports
+DEFAULT_PORT = 8102
 
 # Input/output models
 class SearchWebInput(BaseModel):
@@ -50,138 +39,521 @@ class SearchResult(BaseModel):
     url: str
     content: str
 
+class SearchHit(TypedDict):
+    """A result as parsed from the upstream body, before it becomes a SearchResult"""
+    title: str
+    url: str
+    content: str
+
+class ShapingReport(BaseModel):
+    """What fitting results into the token budget removed"""
+    max_tokens: int
+    original_bytes: int
+    returned_bytes: int
+    bytes_saved: int
+    near_duplicates_removed: int = 0
+    results_dropped: int = Field(0, description="Results with no sentence left within the budget")
+
 class SearchResponse(BaseModel):
     results: List[SearchResult]
+    shaping: Optional[ShapingReport] = None
+    stale: bool = Field(
+        False, description="Served from an expired cache entry because Tavily is failing"
+    )
+
+class QuerySearchResult(BaseModel):
+    query: str
+    results: List[SearchResult]
+    error: Optional[str] = None
+
+class BatchSearchResponse(BaseModel):
+    searches: List[QuerySearchResult]
+    duplicates_removed: int = 0
+    shaping: Optional[ShapingReport] = None
+
+# Upper bound on queries per batch tool call
+MAX_BATCH_QUERIES = 20
+
+class HttpClientConfig(BaseModel):
+    """Settings for the shared Tavily HTTP client and its connection pool"""
+    base_url: str = "https://api.tavily.com"
+    timeout: float = 30.0
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 30.0
+    http2: bool = False
+    # Larger response bodies are cut off; advanced searches with many results reach a few hundred KB
+    max_response_bytes: int = 4 * 1024 * 1024
+
+    @classmethod
+    def from_env(cls) -> "HttpClientConfig":
+        """Build the config from TAVILY_* environment variables, keeping defaults for unset ones"""
+        env = {
+            "base_url": os.environ.get("TAVILY_BASE_URL"),
+            "timeout": os.environ.get("TAVILY_TIMEOUT"),
+            "max_connections": os.environ.get("TAVILY_MAX_CONNECTIONS"),
+            "max_keepalive_connections": os.environ.get("TAVILY_MAX_KEEPALIVE_CONNECTIONS"),
+            "keepalive_expiry": os.environ.get("TAVILY_KEEPALIVE_EXPIRY"),
+            "http2": os.environ.get("TAVILY_HTTP2"),
+            "max_response_bytes": os.environ.get("TAVILY_MAX_RESPONSE_BYTES"),
+        }
+        return cls(**{key: value for key, value in env.items() if value is not None})
+
+def create_http_client(api_key: str, config: HttpClientConfig) -> httpx.AsyncClient:
+    """Create a pooled, keep-alive HTTP client for the Tavily API"""
+    http2 = config.http2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("HTTP/2 requested but the 'h2' package is not installed, using HTTP/1.1")
+            http2 = False
+
+    return httpx.AsyncClient(
+        base_url=config.base_url,
+        headers={
+            "content-type": "application/json",
+            "Authorization": f"Bearer {api_key}"
+        },
+        timeout=config.timeout,
+        limits=httpx.Limits(
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_keepalive_connections,
+            keepalive_expiry=config.keepalive_expiry,
+        ),
+        http2=http2,
+    )
+
+# Bytes of a response still read after the results, so its connection can be reused
+TAIL_BYTES = 64 * 1024
+
+def _text(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    return "" if value is None else str(value)
 
-def run_server():
-    """Run the Tavily MCP server"""
+def search_hit(item: Any) -> Optional[SearchHit]:
+    """The fields kept of one upstream result, or None if it isn't an object"""
+    if not isinstance(item, dict):
+        return None
+    return {
+        "title": _text(item.get("title")),
+        "url": _text(item.get("url")),
+        "content": _text(item.get("content")),
+    }
+
+async def read_hits(response: httpx.Response, max_results: int, max_bytes: int) -> List[SearchHit]:
+    """Parse the results of a streamed /search response, incrementally.
+
+    Each result is decoded on its own and reduced to its title, url and
+    content, so a result's other fields (score, raw content) are only held
+    while it is decoded; other members of the body, like the answer, are
+    skipped. Reading stops once max_results results are parsed. A body
+    over max_bytes is cut off: the results parsed by then are returned, or
+    ResponseTooLarge raised if there are none.
+    """
+    parser = ArrayItems("results", max_bytes)
+    hits: List[SearchHit] = []
+
+    def take(items: List[Any]) -> None:
+        for item in items:
+            hit = search_hit(item)
+            if hit is not None and len(hits) < max_results:
+                hits.append(hit)
+
+    chunks = response.aiter_bytes()
     try:
-        logger.info("Starting Tavily MCP server")
-        
-        # Check for API key
-        api_key = os.environ.get("TAVILY_API_KEY")
-        if not api_key:
-            logger.error("TAVILY_API_KEY environment variable is not set")
-            raise ValueError("TAVILY_API_KEY environment variable is not set")
-            
-        # Create FastMCP server with name
-        mcp = FastMCP("Tavily Search Tools")
-        
-        # Define the search_web tool
-        @mcp.tool()
-        async def search_web(query: str, max_results: int = 10) -> SearchResponse:
-            """Search the web for information using Tavily API"""
-            global shutdown_requested
-            
-            if shutdown_requested:
-                logger.info("Shutdown requested, canceling web search")
-                raise ValueError("Server is shutting down")
-                
-            try:
-                logger.info(f"Searching web for: {query}")
-                
-                # Use httpx directly to call Tavily API
-                url = "https://api.tavily.com/search"
-                headers = {
-                    "content-type": "application/json",
-                    "Authorization": f"Bearer {api_key}"
-                }
-                
-                payload = {
-                    "query": query,
-                    "search_depth": "advanced",
-                    "include_answer": True,
-                    "include_images": False,
-                    "max_results": max_results
-                }
-                
-                async with httpx.AsyncClient(timeout=30.0) as client:
-                    response = await client.post(url, json=payload, headers=headers)
-                    response.raise_for_status()
-                    data = response.json()
-                
-                results = []
-                for result in data.get("results", []):
-                    results.append(
-                        SearchResult(
-                            title=result.get("title", ""),
-                            url=result.get("url", ""),
-                            content=result.get("content", ""),
-                        )
-                    )
-                
-                return SearchResponse(results=results)
-            except Exception as e:
-                logger.error(f"Error in web search: {str(e)}")
-                raise ValueError(f"Error in web search: {str(e)}")
-        
-        # Define the search_news tool
-        @mcp.tool()
-        async def search_news(query: str, max_results: int = 10) -> SearchResponse:
-            """Search recent news articles for the latest information"""
-            global shutdown_requested
-            
-            if shutdown_requested:
-                logger.info("Shutdown requested, canceling news search")
-                raise ValueError("Server is shutting down")
-                
-            try:
-                logger.info(f"Searching news for: {query}")
-                
-                # Use httpx directly to call Tavily API
-                url = "https://api.tavily.com/search"
-                headers = {
-                    "content-type": "application/json",
-                    "Authorization": f"Bearer {api_key}"
-                }
-                
-                payload = {
-                    "query": query,
-                    "search_depth": "advanced",
-                    "include_answer": True,
-                    "include_images": False,
-                    "max_results": max_results,
-                    "search_type": "news"
-                }
-                
-                async with httpx.AsyncClient(timeout=30.0) as client:
-                    response = await client.post(url, json=payload, headers=headers)
-                    response.raise_for_status()
-                    data = response.json()
-                
-                results = []
-                for result in data.get("results", []):
-                    results.append(
-                        SearchResult(
-                            title=result.get("title", ""),
-                            url=result.get("url", ""),
-                            content=result.get("content", ""),
-                        )
-                    )
-                
-                return SearchResponse(results=results)
-            except Exception as e:
-                logger.error(f"Error in news search: {str(e)}")
-                raise ValueError(f"Error in news search: {str(e)}")
-        
-        # Setup shutdown check task
-        async def check_shutdown():
-            """Periodically check if shutdown was requested"""
-            while not shutdown_requested:
-                await asyncio.sleep(0.5)
-            logger.info("Shutdown check detected termination request")
-            
-        # Start the server with a shutdown task
-        if "stdio" in sys.argv:
-            # For testing with stdio directly
-            asyncio.run(asyncio.gather(
-                mcp.run_stdio_async(),
-                check_shutdown()
-            ))
+        async for chunk in chunks:
+            take(parser.feed(chunk))
+            if len(hits) >= max_results or parser.done:
+                break
         else:
-            # Normal operation
-            mcp.run(transport="stdio")
-            
+            take(parser.finish())
+            return hits
+    except ResponseTooLarge:
+        if not hits:
+            raise
+        logger.warning(
+            f"Tavily response over {max_bytes} bytes, keeping the first {len(hits)} results"
+        )
+        return hits
+
+    # Stopped before the end of the body: read a short tail, so the connection can be reused
+    drained = 0
+    async for chunk in chunks:
+        drained += len(chunk)
+        if drained > TAIL_BYTES:
+            break
+    return hits
+
+class TavilySearchClient:
+    """Long-lived Tavily API client shared by all tools of one server"""
+
+    def __init__(
+        self,
+        api_key: str,
+        config: Optional[HttpClientConfig] = None,
+        cache: Optional[ResponseCache] = None,
+        batch_concurrency: int = 5,
+        resilience: Optional[ResilienceConfig] = None,
+    ):
+        self.api_key = api_key
+        self.config = config or HttpClientConfig.from_env()
+        self.cache = cache
+        # Rate limit, adaptive concurrency, retries and circuit breaker for all upstream requests
+        self.guard = UpstreamGuard(resilience or ResilienceConfig.from_env("TAVILY"), name="Tavily")
+        # Shared by all batch calls so concurrent batches can't flood the upstream
+        self._batch_semaphore = asyncio.Semaphore(batch_concurrency)
+        self._http: Optional[httpx.AsyncClient] = None
+
+    async def __aenter__(self) -> "TavilySearchClient":
+        self._http = create_http_client(self.api_key, self.config)
+        logger.info(f"Opened Tavily HTTP client (max_connections={self.config.max_connections})")
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Close the pooled connections"""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+            logger.info("Closed Tavily HTTP client")
+        if self.cache is not None:
+            logger.info(f"Tavily cache stats: {self.cache.snapshot()}")
+            self.cache.close()
+
+    async def search(
+        self, query: str, max_results: int = 10, search_type: Optional[str] = None
+    ) -> SearchResponse:
+        """Run a Tavily search, served from the cache when an identical one was made recently"""
+        # Results are validated here, once, whether fetched or cached
+        if self.cache is None:
+            return SearchResponse(results=await self._fetch(query, max_results, search_type))
+
+        key = f"{search_type or 'web'}:{max_results}:{normalize_query(query)}"
+
+        async def fetch() -> Dict[str, Any]:
+            return {"results": await self._fetch(query, max_results, search_type)}
+
+        try:
+            return SearchResponse.model_validate(await self.cache.get_or_fetch(key, fetch))
+        except Exception as e:
+            if not is_upstream_failure(e):
+                raise
+            # While Tavily is failing, an outdated answer beats none
+            found, value = self.cache.get_stale(key)
+            if not found:
+                raise
+            self.guard.stats.stale_served += 1
+            logger.warning(f"Serving stale results for {query!r}: {str(e)}")
+            response = SearchResponse.model_validate(value)
+            response.stale = True
+            return response
+
+    async def search_many(
+        self,
+        queries: List[str],
+        max_results: int = 5,
+        search_type: Optional[str] = None,
+    ) -> BatchSearchResponse:
+        """Run several searches concurrently and drop URLs already returned for an earlier query"""
+        if len(queries) > MAX_BATCH_QUERIES:
+            raise ValueError(f"At most {MAX_BATCH_QUERIES} queries are allowed per batch")
+
+        async def run_one(query: str) -> QuerySearchResult:
+            async with self._batch_semaphore:
+                try:
+                    response = await self.search(query, max_results, search_type)
+                    return QuerySearchResult(query=query, results=response.results)
+                except Exception as e:
+                    # One failing query shouldn't discard the results of the others
+                    logger.error(f"Error searching for {query!r} in batch: {str(e)}")
+                    return QuerySearchResult(query=query, results=[], error=str(e))
+
+        searches = await asyncio.gather(*(run_one(query) for query in queries))
+
+        seen_urls = set()
+        duplicates_removed = 0
+        for search in searches:
+            unique_results = []
+            for result in search.results:
+                url = result.url.split("#", 1)[0].rstrip("/")
+                if url in seen_urls:
+                    duplicates_removed += 1
+                    continue
+                seen_urls.add(url)
+                unique_results.append(result)
+            search.results = unique_results
+
+        return BatchSearchResponse(searches=searches, duplicates_removed=duplicates_removed)
+
+    async def _fetch(
+        self, query: str, max_results: int, search_type: Optional[str]
+    ) -> List[SearchHit]:
+        """Run one upstream Tavily search and parse the results as they stream in"""
+        if self._http is None:
+            raise RuntimeError("Tavily HTTP client is not open")
+
+        payload = {
+            "query": query,
+            "search_depth": "advanced",
+            # Not used, so not sent
+            "include_answer": False,
+            "include_images": False,
+            "max_results": max_results
+        }
+        if search_type:
+            payload["search_type"] = search_type
+
+        async def send() -> List[SearchHit]:
+            with METRICS.span(UPSTREAM_DURATION, service="tavily", operation=search_type or "web"):
+                async with self._http.stream("POST", "/search", json=payload) as response:
+                    if response.is_error:
+                        # Error bodies are small; reading them keeps the connection reusable
+                        await response.aread()
+                        response.raise_for_status()
+                    return await read_hits(response, max_results, self.config.max_response_bytes)
+
+        return await self.guard.request(send)
+
+# Characters a result costs besides its content (field names and JSON punctuation)
+RESULT_OVERHEAD_CHARS = 40
+
+def _overhead_chars(result: SearchResult) -> int:
+    """Characters a result costs besides its content, which shaping never trims"""
+    return len(result.title) + len(result.url) + RESULT_OVERHEAD_CHARS
+
+def _result_bytes(results: List[SearchResult]) -> int:
+    return sum(
+        len(result.title.encode()) + len(result.url.encode()) + len(result.content.encode())
+        for result in results
+    )
+
+def shape_results(
+    query: str, results: List[SearchResult], max_tokens: int
+) -> Tuple[List[SearchResult], ShapingReport]:
+    """Fit results into about max_tokens: drop near-duplicates, then keep the
+    sentences most relevant to the query. The top-ranked result is always
+    kept, cut short if needed. Returns (results, ShapingReport);
+    max_tokens <= 0 returns the results unchanged.
+    """
+    original_bytes = _result_bytes(results)
+    report = ShapingReport(
+        max_tokens=max_tokens,
+        original_bytes=original_bytes,
+        returned_bytes=original_bytes,
+        bytes_saved=0,
+    )
+    if max_tokens <= 0 or not results:
+        return results, report
+
+    duplicates = near_duplicates([result.content for result in results])
+    kept = [result for index, result in enumerate(results) if index not in duplicates]
+
+    budget = max_tokens * CHARS_PER_TOKEN
+    size = sum(_overhead_chars(result) + len(result.content) for result in kept)
+    if size > budget:
+        # Titles and URLs aren't trimmed: drop results from the tail until
+        # they fit, but always keep the top-ranked one
+        fitting = list(kept)
+        overhead = sum(_overhead_chars(result) for result in fitting)
+        while len(fitting) > 1 and overhead > budget:
+            overhead -= _overhead_chars(fitting.pop())
+        remaining = max(budget - overhead, 0)
+        contents = select_sentences(query, [result.content for result in fitting], remaining)
+        if not any(contents):
+            # Not even one sentence fits: keep the start of the top result
+            contents[0] = truncate(fitting[0].content, remaining)
+        shaped = [
+            SearchResult(title=result.title, url=result.url, content=content)
+            for rank, (result, content) in enumerate(zip(fitting, contents))
+            if content or rank == 0
+        ]
+    else:
+        shaped = kept
+
+    report.near_duplicates_removed = len(duplicates)
+    report.results_dropped = len(kept) - len(shaped)
+    report.returned_bytes = _result_bytes(shaped)
+    report.bytes_saved = original_bytes - report.returned_bytes
+    return shaped, report
+
+def shape_response(query: str, response: SearchResponse, max_tokens: int) -> SearchResponse:
+    results, report = shape_results(query, response.results, max_tokens)
+    if report.bytes_saved:
+        logger.info(
+            f"Shaped results for {query!r}: "
+            f"{report.original_bytes} -> {report.returned_bytes} bytes"
+        )
+    return response.model_copy(update={"results": results, "shaping": report})
+
+def shape_batch(batch: BatchSearchResponse, max_tokens: int) -> BatchSearchResponse:
+    """Split max_tokens evenly over the queries that returned results and shape each.
+
+    Each query gets at least enough for its top result's title and URL, so
+    every query that found something keeps a result.
+    """
+    searches = [search for search in batch.searches if search.results]
+    share = max_tokens // len(searches) if searches else max_tokens
+    total = ShapingReport(max_tokens=max_tokens, original_bytes=0, returned_bytes=0, bytes_saved=0)
+    for search in searches:
+        per_query = max_tokens
+        if max_tokens > 0:
+            per_query = max(share, math.ceil(_overhead_chars(search.results[0]) / CHARS_PER_TOKEN))
+        search.results, report = shape_results(search.query, search.results, per_query)
+        total.original_bytes += report.original_bytes
+        total.returned_bytes += report.returned_bytes
+        total.bytes_saved += report.bytes_saved
+        total.near_duplicates_removed += report.near_duplicates_removed
+        total.results_dropped += report.results_dropped
+    if total.bytes_saved:
+        logger.info(
+            f"Shaped results for {len(searches)} queries: "
+            f"{total.original_bytes} -> {total.returned_bytes} bytes"
+        )
+    batch.shaping = total
+    return batch
+
+def create_server() -> FastMCP:
+    """Create the Tavily MCP server with its tools"""
+    # Check for API key
+    api_key = os.environ.get("TAVILY_API_KEY")
+    if not api_key:
+        logger.error("TAVILY_API_KEY environment variable is not set")
+        raise ValueError("TAVILY_API_KEY environment variable is not set")
+
+    # One client for the lifetime of the server, so connections are reused across tool calls
+    tavily = TavilySearchClient(
+        api_key,
+        cache=ResponseCache(CacheConfig.from_env("TAVILY")),
+        batch_concurrency=int(os.environ.get("TAVILY_BATCH_CONCURRENCY", 5)),
+    )
+
+    # Default token budget for the results of one tool call; 0 returns them in full
+    default_max_tokens = int(os.environ.get("TAVILY_MAX_TOKENS", 2000))
+
+    @asynccontextmanager
+    async def lifespan(server: FastMCP) -> AsyncIterator[TavilySearchClient]:
+        """Open the shared HTTP client on startup and close it on shutdown"""
+        async with tavily:
+            yield tavily
+
+    # Create FastMCP server with name
+    mcp = FastMCP("Tavily Search Tools", lifespan=lifespan)
+
+    # Define the search_web tool
+    @mcp.tool()
+    @METRICS.instrument_tool("tavily")
+    async def search_web(
+        query: str, max_results: int = 10, max_tokens: int = default_max_tokens
+    ) -> SearchResponse:
+        """Search the web for information using Tavily API. Results are trimmed to the
+        sentences most relevant to the query to fit about max_tokens (0 for full content)."""
+        try:
+            logger.info(f"Searching web for: {query}")
+            response = await tavily.search(query, max_results)
+            return shape_response(query, response, max_tokens)
+        except Exception as e:
+            logger.error(f"Error in web search: {str(e)}")
+            raise ValueError(f"Error in web search: {str(e)}")
+
+    # Define the search_news tool
+    @mcp.tool()
+    @METRICS.instrument_tool("tavily")
+    async def search_news(
+        query: str, max_results: int = 10, max_tokens: int = default_max_tokens
+    ) -> SearchResponse:
+        """Search recent news articles for the latest information. Results are trimmed to the
+        sentences most relevant to the query to fit about max_tokens (0 for full content)."""
+        try:
+            logger.info(f"Searching news for: {query}")
+            response = await tavily.search(query, max_results, search_type="news")
+            return shape_response(query, response, max_tokens)
+        except Exception as e:
+            logger.error(f"Error in news search: {str(e)}")
+            raise ValueError(f"Error in news search: {str(e)}")
+
+    # Define the search_web_batch tool
+    @mcp.tool()
+    @METRICS.instrument_tool("tavily")
+    async def search_web_batch(
+        queries: List[str],
+        max_results: int = 5,
+        max_tokens: int = default_max_tokens,
+    ) -> BatchSearchResponse:
+        """Search the web for several queries at once. Prefer this over repeated search_web calls
+        when a question has multiple parts. URLs returned for an earlier query are not repeated.
+        max_tokens is shared by all queries."""
+        try:
+            logger.info(f"Searching web for {len(queries)} queries")
+            return shape_batch(await tavily.search_many(queries, max_results), max_tokens)
+        except Exception as e:
+            logger.error(f"Error in batch web search: {str(e)}")
+            raise ValueError(f"Error in batch web search: {str(e)}")
+
+    # Define the search_news_batch tool
+    @mcp.tool()
+    @METRICS.instrument_tool("tavily")
+    async def search_news_batch(
+        queries: List[str],
+        max_results: int = 5,
+        max_tokens: int = default_max_tokens,
+    ) -> BatchSearchResponse:
+        """Search recent news for several queries at once. Prefer this over repeated search_news
+        calls when a question has multiple parts. URLs returned for an earlier query are not
+        repeated. max_tokens is shared by all queries."""
+        try:
+            logger.info(f"Searching news for {len(queries)} queries")
+            batch = await tavily.search_many(queries, max_results, search_type="news")
+            return shape_batch(batch, max_tokens)
+        except Exception as e:
+            logger.error(f"Error in batch news search: {str(e)}")
+            raise ValueError(f"Error in batch news search: {str(e)}")
+
+    # Define the search_cache_stats tool
+    @mcp.tool()
+    @METRICS.instrument_tool("tavily")
+    async def search_cache_stats() -> CacheStats:
+        """Get hit, miss and eviction counters of the search result cache"""
+        return tavily.cache.snapshot()
+
+    # Define the search_upstream_stats tool
+    @mcp.tool()
+    @METRICS.instrument_tool("tavily")
+    async def search_upstream_stats() -> ResilienceStats:
+        """Get the state of the Tavily rate limiter, concurrency limit and circuit breaker, with
+        retry counters"""
+        return tavily.guard.snapshot()
+
+    # Define the search_metrics tool
+    @mcp.tool()
+    async def search_metrics() -> MetricsSnapshot:
+        """Get latency histograms (count, errors, p50/p95/p99) of this server's tools and upstream
+        calls"""
+        return METRICS.snapshot()
+
+    return mcp
+
+def run_server(transport: str = "stdio", host: str = "127.0.0.1", port: int = DEFAULT_PORT):
+    """Run the Tavily MCP server over stdio, or over streamable HTTP or SSE on host:port"""
+    # Process-wide setup happens here rather than at import, so importing
+    # the module (e.g. to run the server in-process) has no side effects
+    configure_logging()
+
+    # Load environment variables
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    try:
+        logger.info("Starting Tavily MCP server")
+
+        mcp = create_server()
+
+        # Serve until stdin closes (stdio) or a termination signal arrives
+        run_transport(mcp, transport=transport, host=host, port=port)
+
     except KeyboardInterrupt:
         logger.info("Tavily MCP server stopped by keyboard interrupt")
     except Exception as e:
@@ -190,4 +562,5 @@ def run_server():
         logger.info("Tavily MCP server shutdown complete")
 
 if __name__ == "__main__":
-    run_server() 
\ No newline at end of file
+    args = parse_server_args(DEFAULT_PORT)
+    run_server(args.transport, args.host, args.port)
@@ -1,32 +1,24 @@
 import asyncio
 import logging
-import sys
-import signal
-from typing import Dict, Any, Optional, List
+import os
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, AsyncIterator
 
 from mcp.server.fastmcp import FastMCP
 from pydantic import BaseModel, Field
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[logging.StreamHandler()],
-)
-logger = logging.getLogger("weather_mcp")
+from mcpserver.metrics import METRICS, UPSTREAM_DURATION, MetricsSnapshot
+from mcpserver.runtime import configure_logging, parse_server_args, run_transport
+from mcpserver.cache import CacheConfig, CacheStats, ResponseCache
 
-# Flag to track shutdown state
-shutdown_requested = False
+logger = logging.getLogger("weather_mcp")
 
-def signal_handler(sig, frame):
-    """Handle termination signals"""
-    global shutdown_requested
-    logger.info("Received termination signal, initiating shutdown...")
-    shutdown_requested = True
+# Port of the HTTP transports
+DEFAULT_PORT = 8101
 
-# Set up signal handlers
-signal.signal(signal.SIGINT, signal_handler)
-signal.signal(signal.SIGTERM, signal_handler)
+# Upper bound on locations per get_weather_many call
+MAX_BATCH_LOCATIONS = 50
 
 # Input/output models
 class WeatherData(BaseModel):
@@ -36,64 +28,240 @@ class WeatherData(BaseModel):
     wind_speed: float
     location: str
 
-def run_server():
-    """Run the Weather MCP server"""
+class WeatherManyResponse(BaseModel):
+    results: List[WeatherData]
+    errors: Dict[str, str] = Field(default_factory=dict, description="Error messages by location")
+
+class WeatherProvider(ABC):
+    """Source of current weather data"""
+
+    @abstractmethod
+    async def fetch(self, location: str, units: str) -> WeatherData:
+        """Fetch current weather for one location"""
+
+    async def aclose(self) -> None:
+        """Release any resources held by the provider"""
+
+class FakeWeatherProvider(WeatherProvider):
+    """Local provider returning fixed data after a configurable delay, for development and tests"""
+
+    def __init__(self, latency: float = 1.0):
+        self.latency = latency
+
+    async def fetch(self, location: str, units: str) -> WeatherData:
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)  # Simulate API call
+
+        temperature = 22.5 if units == "metric" else 72.5
+        return WeatherData(
+            temperature=temperature,
+            description="Partly cloudy with a chance of rain",
+            humidity=65.0,
+            wind_speed=10.0,
+            location=location
+        )
+
+# WMO weather interpretation codes used by Open-Meteo
+WMO_DESCRIPTIONS = {
+    0: "Clear sky",
+    1: "Mainly clear",
+    2: "Partly cloudy",
+    3: "Overcast",
+    45: "Fog",
+    48: "Depositing rime fog",
+    51: "Light drizzle",
+    53: "Moderate drizzle",
+    55: "Dense drizzle",
+    61: "Slight rain",
+    63: "Moderate rain",
+    65: "Heavy rain",
+    71: "Slight snow",
+    73: "Moderate snow",
+    75: "Heavy snow",
+    80: "Slight rain showers",
+    81: "Moderate rain showers",
+    82: "Violent rain showers",
+    95: "Thunderstorm",
+    96: "Thunderstorm with slight hail",
+    99: "Thunderstorm with heavy hail",
+}
+
+class OpenMeteoWeatherProvider(WeatherProvider):
+    """Provider backed by the keyless Open-Meteo geocoding and forecast APIs"""
+
+    geocoding_url = "https://geocoding-api.open-meteo.com/v1/search"
+    forecast_url = "https://api.open-meteo.com/v1/forecast"
+
+    def __init__(self, timeout: float = 10.0):
+        # Imported here so servers using the fake provider don't load it
+        import httpx
+
+        self._http = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+
+    async def fetch(self, location: str, units: str) -> WeatherData:
+        response = await self._http.get(self.geocoding_url, params={"name": location, "count": 1})
+        response.raise_for_status()
+        matches = response.json().get("results") or []
+        if not matches:
+            raise ValueError(f"Unknown location: {location}")
+        place = matches[0]
+
+        params = {
+            "latitude": place["latitude"],
+            "longitude": place["longitude"],
+            "current": "temperature_2m,relative_humidity_2m,wind_speed_10m,weather_code",
+        }
+        if units != "metric":
+            params["temperature_unit"] = "fahrenheit"
+            params["wind_speed_unit"] = "mph"
+        response = await self._http.get(self.forecast_url, params=params)
+        response.raise_for_status()
+        current = response.json()["current"]
+
+        return WeatherData(
+            temperature=current["temperature_2m"],
+            description=WMO_DESCRIPTIONS.get(current.get("weather_code"), "Unknown"),
+            humidity=current["relative_humidity_2m"],
+            wind_speed=current["wind_speed_10m"],
+            location=", ".join(part for part in (place.get("name"), place.get("country")) if part),
+        )
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+def create_provider() -> WeatherProvider:
+    """Create the provider selected by WEATHER_PROVIDER"""
+    name = os.environ.get("WEATHER_PROVIDER", "fake")
+    if name == "fake":
+        return FakeWeatherProvider(latency=float(os.environ.get("WEATHER_FAKE_LATENCY", 1.0)))
+    if name == "open-meteo":
+        return OpenMeteoWeatherProvider()
+    raise ValueError(f"Unknown weather provider: {name}")
+
+class WeatherService:
+    """Provider wrapped in a per-location TTL cache with request coalescing"""
+
+    def __init__(self, provider: WeatherProvider, cache: ResponseCache, concurrency: int = 10):
+        self.provider = provider
+        self.cache = cache
+        # Shared by all batch calls so they can't flood the provider
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def get(self, location: str, units: str = "metric") -> WeatherData:
+        key = f"{units}:{' '.join(location.casefold().split())}"
+
+        async def fetch() -> Dict[str, Any]:
+            async with self._semaphore:
+                operation = type(self.provider).__name__
+                with METRICS.span(UPSTREAM_DURATION, service="weather", operation=operation):
+                    weather_data = await self.provider.fetch(location, units)
+            return weather_data.model_dump()
+
+        return WeatherData.model_validate(await self.cache.get_or_fetch(key, fetch))
+
+    async def get_many(self, locations: List[str], units: str = "metric") -> WeatherManyResponse:
+        """Resolve many locations concurrently, reporting failures per location"""
+        if len(locations) > MAX_BATCH_LOCATIONS:
+            raise ValueError(f"At most {MAX_BATCH_LOCATIONS} locations are allowed per call")
+
+        outcomes = await asyncio.gather(
+            *(self.get(location, units) for location in locations),
+            return_exceptions=True,
+        )
+
+        response = WeatherManyResponse(results=[])
+        for location, outcome in zip(locations, outcomes):
+            if isinstance(outcome, Exception):
+                logger.error(f"Error getting weather for {location}: {str(outcome)}")
+                response.errors[location] = str(outcome)
+            else:
+                response.results.append(outcome)
+        return response
+
+    async def aclose(self) -> None:
+        await self.provider.aclose()
+        logger.info(f"Weather cache stats: {self.cache.snapshot()}")
+        self.cache.close()
+
+def create_server() -> FastMCP:
+    """Create the Weather MCP server with its tools"""
+    service = WeatherService(
+        create_provider(),
+        ResponseCache(CacheConfig.from_env("WEATHER")),
+        concurrency=int(os.environ.get("WEATHER_CONCURRENCY", 10)),
+    )
+
+    @asynccontextmanager
+    async def lifespan(server: FastMCP) -> AsyncIterator[WeatherService]:
+        """Close the provider and cache on shutdown"""
+        try:
+            yield service
+        finally:
+            await service.aclose()
+
+    # Create FastMCP server with name
+    mcp = FastMCP("Weather Information", lifespan=lifespan)
+
+    # Define the get_weather tool
+    @mcp.tool()
+    @METRICS.instrument_tool("weather")
+    async def get_weather(location: str, units: str = "metric") -> WeatherData:
+        """Get current weather for a location"""
+        try:
+            logger.info(f"Getting weather for: {location} in {units}")
+            weather_data = await service.get(location, units)
+            logger.info(f"Weather data retrieved for {location}")
+            return weather_data
+        except Exception as e:
+            logger.error(f"Error getting weather: {str(e)}")
+            raise ValueError(f"Error getting weather: {str(e)}")
+
+    # Define the get_weather_many tool
+    @mcp.tool()
+    @METRICS.instrument_tool("weather")
+    async def get_weather_many(locations: List[str], units: str = "metric") -> WeatherManyResponse:
+        """Get current weather for several locations at once. Prefer this over repeated
+        get_weather calls, e.g. when comparing cities."""
+        try:
+            logger.info(f"Getting weather for {len(locations)} locations in {units}")
+            return await service.get_many(locations, units)
+        except Exception as e:
+            logger.error(f"Error getting weather: {str(e)}")
+            raise ValueError(f"Error getting weather: {str(e)}")
+
+    # Define the weather_cache_stats tool
+    @mcp.tool()
+    @METRICS.instrument_tool("weather")
+    async def weather_cache_stats() -> CacheStats:
+        """Get hit, miss and eviction counters of the weather cache"""
+        return service.cache.snapshot()
+
+    # Define the weather_metrics tool
+    @mcp.tool()
+    async def weather_metrics() -> MetricsSnapshot:
+        """Get latency histograms (count, errors, p50/p95/p99) of this server's tools and upstream
+        calls"""
+        return METRICS.snapshot()
+
+    return mcp
+
+def run_server(transport: str = "stdio", host: str = "127.0.0.1", port: int = DEFAULT_PORT):
+    """Run the Weather MCP server over stdio, or over streamable HTTP or SSE on host:port"""
+    # Process-wide setup happens here rather than at import, so importing
+    # the module (e.g. to run the server in-process) has no side effects
+    configure_logging()
+
     try:
         logger.info("Starting Weather MCP server")
-        
-        # Create FastMCP server with name
-        mcp = FastMCP("Weather Information")
-        
-        # Define the get_weather tool
-        @mcp.tool()
-        async def get_weather(location: str, units: str = "metric") -> WeatherData:
-            """Get current weather for a location"""
-            global shutdown_requested
-            
-            if shutdown_requested:
-                logger.info("Shutdown requested, canceling weather request")
-                raise ValueError("Server is shutting down")
-                
-            try:
-                logger.info(f"Getting weather for: {location} in {units}")
-                
-                # This is a mock implementation - would connect to a real weather API in production
-                await asyncio.sleep(1)  # Simulate API call
-                
-                # Mock data
-                temperature = 22.5 if units == "metric" else 72.5
-                weather_data = WeatherData(
-                    temperature=temperature,
-                    description="Partly cloudy with a chance of rain",
-                    humidity=65.0,
-                    wind_speed=10.0,
-                    location=location
-                )
-                
-                logger.info(f"Weather data retrieved for {location}")
-                return weather_data
-            except Exception as e:
-                logger.error(f"Error getting weather: {str(e)}")
-                raise ValueError(f"Error getting weather: {str(e)}")
-        
-        # Setup shutdown check task
-        async def check_shutdown():
-            """Periodically check if shutdown was requested"""
-            while not shutdown_requested:
-                await asyncio.sleep(0.5)
-            logger.info("Shutdown check detected termination request")
-            
-        # Start the server with a shutdown task
-        if "stdio" in sys.argv:
-            # For testing with stdio directly
-            asyncio.run(asyncio.gather(
-                mcp.run_stdio_async(),
-                check_shutdown()
-            ))
-        else:
-            # Normal operation
-            mcp.run(transport="stdio")
-            
+
+        mcp = create_server()
+
+        # Serve until stdin closes (stdio) or a termination signal arrives
+        run_transport(mcp, transport=transport, host=host, port=port)
+
     except KeyboardInterrupt:
         logger.info("Weather MCP server stopped by keyboard interrupt")
     except Exception as e:
@@ -102,4 +270,5 @@ def run_server():
         logger.info("Weather MCP server shutdown complete")
 
 if __name__ == "__main__":
-    run_server() 
\ No newline at end of file
+    args = parse_server_args(DEFAULT_PORT)
+    run_server(args.transport, args.host, args.port)
@@ -0,0 +1,285 @@
+"""Bounded conversation memory for multi-turn agent sessions.
+
+A session is a LangGraph thread: the session graph is compiled with a
+checkpointer (SQLite, or in memory without langgraph-checkpoint-sqlite)
+and every turn continues from the session's latest checkpoint. Before each
+model call, ConversationMemory.pre_model_hook bounds the history:
+
+- tool outputs more than tool_turns turns old are collapsed to a short
+  reference (tool, size and the URLs cited), since the answers built on
+  them stay in the history
+- if the history is still over max_tokens, the oldest turns are dropped
+  until it is under TRIM_TARGET of the budget, and folded into a running
+  summary by the chat model when summarize is on
+
+The turn being answered is never changed. After a turn only the session's
+latest checkpoint is kept, so the store grows with sessions, not turns.
+"""
+
+import json
+import logging
+import os
+import pathlib
+import re
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    RemoveMessage,
+    SystemMessage,
+    ToolMessage,
+)
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+from pydantic import BaseModel
+
+from mcpserver.shaping import estimate_tokens
+
+logger = logging.getLogger("agent_memory")
+
+# Where session checkpoints are stored (AGENT_MEMORY_PATH); ":memory:" keeps them in the process
+DEFAULT_MEMORY_PATH = "~/.cache/langchain-mcp/sessions.sqlite"
+
+# Once over budget, history is trimmed to this fraction of it, so summaries aren't redone every turn
+TRIM_TARGET = 0.6
+
+# Tool outputs up to this many characters are short enough to keep verbatim
+COLLAPSE_MIN_CHARS = 300
+
+# URLs listed in the reference a collapsed tool output leaves behind
+MAX_REFERENCE_URLS = 3
+
+# Characters of each message shown to the model when summarizing
+SUMMARY_MESSAGE_CHARS = 1000
+
+# Message ID of the running summary, which sits before the first kept turn
+SUMMARY_ID = "conversation-summary"
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a user and an assistant. "
+    "Update the current summary with the new messages. Keep facts, figures, names and "
+    "sources the user may refer back to, and the user's preferences. Drop pleasantries. "
+    "Answer with the updated summary only, in at most 200 words."
+)
+
+_URL = re.compile(r"https?://[^\s\"'<>\\)\]]+")
+
+class MemoryConfig(BaseModel):
+    """Settings of session memory"""
+    path: str = DEFAULT_MEMORY_PATH
+    max_tokens: int = 4000
+    tool_turns: int = 2
+    summarize: bool = True
+
+    @classmethod
+    def from_env(cls) -> "MemoryConfig":
+        """Build the config from AGENT_MEMORY_* variables, keeping defaults for unset ones"""
+        env = {
+            "path": os.environ.get("AGENT_MEMORY_PATH"),
+            "max_tokens": os.environ.get("AGENT_MEMORY_MAX_TOKENS"),
+            "tool_turns": os.environ.get("AGENT_MEMORY_TOOL_TURNS"),
+            "summarize": os.environ.get("AGENT_MEMORY_SUMMARIZE"),
+        }
+        return cls(**{key: value for key, value in env.items() if value})
+
+def content_text(message: BaseMessage) -> str:
+    return message.content if isinstance(message.content, str) else json.dumps(message.content)
+
+def message_tokens(message: BaseMessage) -> int:
+    """Estimated prompt tokens of a message, including its tool calls"""
+    tokens = estimate_tokens(content_text(message))
+    if isinstance(message, AIMessage) and message.tool_calls:
+        tokens += estimate_tokens(json.dumps([call["args"] for call in message.tool_calls]))
+    # Role and framing
+    return tokens + 4
+
+def history_tokens(messages: Sequence[BaseMessage]) -> int:
+    return sum(message_tokens(message) for message in messages)
+
+def split_turns(
+    messages: Sequence[BaseMessage],
+) -> Tuple[List[BaseMessage], List[List[BaseMessage]]]:
+    """The messages before the first user message (e.g. the summary), and the turns,
+    each a user message with the tool calls and answer that followed it"""
+    prefix: List[BaseMessage] = []
+    turns: List[List[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, HumanMessage):
+            turns.append([message])
+        elif turns:
+            turns[-1].append(message)
+        else:
+            prefix.append(message)
+    return prefix, turns
+
+def collapse_tool_output(message: ToolMessage, age: int) -> ToolMessage:
+    """A ToolMessage whose long content is replaced by a short reference to it"""
+    content = content_text(message)
+    if len(content) <= COLLAPSE_MIN_CHARS:
+        return message
+    urls = list(dict.fromkeys(_URL.findall(content)))[:MAX_REFERENCE_URLS]
+    reference = (
+        f"[{message.name or 'tool'} output from {age} turns ago "
+        f"({len(content)} characters) collapsed"
+    )
+    reference += f"; sources: {', '.join(urls)}]" if urls else "]"
+    # Same ID, so the message replaces the original in the graph state
+    return message.model_copy(update={"content": reference})
+
+def collapse_old_tool_outputs(turns: List[List[BaseMessage]], tool_turns: int) -> bool:
+    """Collapse tool outputs of turns more than tool_turns turns old, in place.
+
+    Returns whether any changed.
+    """
+    changed = False
+    for index, turn in enumerate(turns):
+        age = len(turns) - 1 - index
+        if age <= tool_turns:
+            continue
+        for position, message in enumerate(turn):
+            if isinstance(message, ToolMessage):
+                collapsed = collapse_tool_output(message, age)
+                if collapsed is not message:
+                    turn[position] = collapsed
+                    changed = True
+    return changed
+
+def transcript(messages: Sequence[BaseMessage]) -> str:
+    """Messages as plain text for the summarization prompt"""
+    lines = []
+    for message in messages:
+        content = content_text(message)
+        if isinstance(message, HumanMessage):
+            role = "User"
+        elif isinstance(message, ToolMessage):
+            role = f"Tool {message.name}"
+        elif isinstance(message, AIMessage):
+            if message.tool_calls:
+                content = "; ".join(
+                    f"called {call['name']}({json.dumps(call['args'])})"
+                    for call in message.tool_calls
+                )
+            role = "Assistant"
+        else:
+            continue
+        if len(content) > SUMMARY_MESSAGE_CHARS:
+            content = content[:SUMMARY_MESSAGE_CHARS] + "…"
+        lines.append(f"{role}: {content}")
+    return "\n".join(lines)
+
+class ConversationMemory:
+    """Compacts session histories before model calls and prunes old checkpoints"""
+
+    def __init__(self, config: MemoryConfig, model: Any, checkpointer: Any):
+        self.config = config
+        self.model = model
+        self.checkpointer = checkpointer
+
+    async def summarize(
+        self, summary: Optional[str], dropped: Sequence[BaseMessage]
+    ) -> Optional[str]:
+        """The running summary updated with dropped messages, or the old one if the model fails"""
+        request = f"Current summary:\n{summary or '(none)'}\n\nNew messages:\n{transcript(dropped)}"
+        try:
+            response = await self.model.ainvoke(
+                [SystemMessage(content=SUMMARY_PROMPT), HumanMessage(content=request)]
+            )
+        except Exception as e:
+            logger.warning(f"Couldn't summarize {len(dropped)} messages, dropping them: {str(e)}")
+            return summary
+        text = response.content if isinstance(response.content, str) else str(response.content)
+        # The summary counts against the budget: max_tokens characters are about a quarter of it
+        return text.strip()[:self.config.max_tokens] or summary
+
+    async def compact(self, messages: Sequence[BaseMessage]) -> Optional[List[BaseMessage]]:
+        """The bounded history, or None if messages are within bounds already"""
+        prefix, turns = split_turns(messages)
+        changed = collapse_old_tool_outputs(turns, self.config.tool_turns)
+
+        summary_message = next((message for message in prefix if message.id == SUMMARY_ID), None)
+        summary = None
+        if summary_message is not None:
+            summary = summary_message.content[len(SUMMARY_PREFIX):]
+
+        total = history_tokens(prefix) + sum(history_tokens(turn) for turn in turns)
+        dropped: List[BaseMessage] = []
+        if total > self.config.max_tokens:
+            target = int(self.config.max_tokens * TRIM_TARGET)
+            # Never the turn being answered
+            while len(turns) > 1 and total > target:
+                turn = turns.pop(0)
+                total -= history_tokens(turn)
+                dropped.extend(turn)
+
+        if not changed and not dropped:
+            return None
+
+        if dropped:
+            logger.info(f"Trimming {len(dropped)} old messages from the session history")
+            if self.config.summarize:
+                summary = await self.summarize(summary, dropped)
+        rest = [message for message in prefix if message.id != SUMMARY_ID]
+        if summary:
+            rest.append(SystemMessage(content=SUMMARY_PREFIX + summary, id=SUMMARY_ID))
+        return rest + [message for turn in turns for message in turn]
+
+    async def pre_model_hook(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Graph node run before each model call, rewriting the stored history when it changes"""
+        compacted = await self.compact(state["messages"])
+        if compacted is None:
+            return {"messages": []}
+        return {"messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES), *compacted]}
+
+    async def prune(self, session_id: str) -> None:
+        """Delete all but the latest checkpoint of a session.
+
+        Checkpointers only delete whole threads, so the latest checkpoint is
+        stored again, with its pending writes, after the thread is deleted.
+        """
+        config = {"configurable": {"thread_id": session_id, "checkpoint_ns": ""}}
+        # Newest first
+        checkpoints = [checkpoint async for checkpoint in self.checkpointer.alist(config, limit=2)]
+        if len(checkpoints) < 2:
+            return
+        latest = checkpoints[0]
+        await self.checkpointer.adelete_thread(session_id)
+        saved = await self.checkpointer.aput(
+            config, latest.checkpoint, latest.metadata, latest.checkpoint["channel_versions"]
+        )
+        writes: Dict[str, List[Tuple[str, Any]]] = {}
+        for task_id, channel, value in latest.pending_writes or ():
+            writes.setdefault(task_id, []).append((channel, value))
+        for task_id, task_writes in writes.items():
+            await self.checkpointer.aput_writes(saved, task_writes, task_id)
+
+    async def delete(self, session_id: str) -> None:
+        await self.checkpointer.adelete_thread(session_id)
+
+@asynccontextmanager
+async def open_checkpointer(path: str) -> AsyncIterator[Any]:
+    """A checkpointer storing sessions in the SQLite file at path, or in memory for ":memory:".
+
+    Falls back to memory, with a warning, when langgraph-checkpoint-sqlite
+    isn't installed (pip install -e ".[memory]").
+    """
+    from langgraph.checkpoint.memory import InMemorySaver
+
+    if path == ":memory:":
+        yield InMemorySaver()
+        return
+    try:
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    except ImportError:
+        logger.warning(
+            "langgraph-checkpoint-sqlite is not installed, sessions are kept in memory only"
+        )
+        yield InMemorySaver()
+        return
+
+    file = pathlib.Path(path).expanduser()
+    file.parent.mkdir(parents=True, exist_ok=True)
+    async with AsyncSqliteSaver.from_conn_string(str(file)) as saver:
+        yield saver
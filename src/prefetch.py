@@ -0,0 +1,255 @@
+"""Speculative tool calls started alongside the agent's first model call.
+
+Some queries make the first tool call obvious ("weather in Paris", "latest
+news on fusion energy"), yet the agent spends a whole model round trip
+deciding to make it before the tool even starts. With prefetch on,
+classify() matches the query against a few rules, and the likely call is
+started right away, concurrently with the first model call. If the model
+then asks for a matching call, it gets the prefetched result, or waits for
+the call already in flight. Otherwise the prefetch is wasted: it is
+cancelled when the query finishes, and its cost is counted.
+
+A call matches when it is to the same tool with the same arguments, after
+defaults are filled in and text is normalized: locations compare by case
+and the part before the first comma, queries by their words except stop
+words like "latest" or "news".
+"""
+
+import asyncio
+import contextvars
+import logging
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from mcpserver.metrics import METRICS
+
+logger = logging.getLogger("agent_prefetch")
+
+PREFETCH_DURATION = "agent_prefetch_duration_seconds"
+
+# Trailing words that don't belong to the extracted location or query
+_TRAILING = re.compile(
+    r"(?:\s+(?:today|tonight|tomorrow|now|right now|currently|"
+    r"this (?:morning|week|weekend)|please))+\s*$",
+    re.IGNORECASE,
+)
+# Up to the end of the sentence (a "." inside e.g. "3.13" doesn't end it)
+_ARG = r"(?P<arg>.+?)(?=[?!.]+(?:\s|$)|$)"
+
+# (tool, argument, pattern) in order of precedence; the first match is prefetched
+RULES: List[Tuple[str, str, re.Pattern]] = [
+    ("get_weather", "location", re.compile(
+        rf"\b(?:weather|temperature|forecast)\b.*?\b(?:in|for|at)\s+{_ARG}", re.IGNORECASE
+    )),
+    ("get_weather", "location", re.compile(
+        rf"^\s*(?:how (?:hot|cold|warm) is it|is it raining) in\s+{_ARG}", re.IGNORECASE
+    )),
+    ("search_news", "query", re.compile(
+        rf"\b(?:latest|recent|breaking|current|today'?s)\s+(?:news|headlines)\s+"
+        rf"(?:on|about|for|regarding|from|in)\s+{_ARG}",
+        re.IGNORECASE,
+    )),
+    ("search_news", "query", re.compile(
+        rf"\bnews\s+(?:on|about|regarding)\s+{_ARG}", re.IGNORECASE
+    )),
+    ("search_news", "query", re.compile(
+        rf"^\s*what'?s (?:new|happening) (?:with|in)\s+{_ARG}", re.IGNORECASE
+    )),
+    ("search_web", "query", re.compile(
+        rf"^\s*(?:search(?: the web)? for|look up|google|find information (?:on|about))\s+{_ARG}",
+        re.IGNORECASE,
+    )),
+]
+
+# Words ignored when comparing search queries
+STOP_WORDS = frozenset(
+    "a an the of on in for about to and or is are what's whats what latest recent news headlines "
+    "breaking current today today's update updates".split()
+)
+
+_WORD = re.compile(r"[\w'-]+")
+
+class PrefetchStats(BaseModel):
+    """Counters for judging whether prefetching pays off"""
+    started: int = 0
+    hits: int = 0
+    wasted: int = 0
+    # Failed prefetches are retried as regular calls, and count as wasted too
+    failed: int = 0
+    # Time the model's calls didn't have to wait, since the prefetch started earlier
+    saved_seconds: float = 0.0
+    # Time spent on prefetches whose result wasn't used (upstream calls made for nothing)
+    wasted_seconds: float = 0.0
+    hit_rate: float = 0.0
+
+    def describe(self) -> str:
+        return (
+            f"Prefetch: {self.hits} of {self.started} hit ({self.hit_rate:.0%}), "
+            f"saved {self.saved_seconds:.2f}s; {self.wasted} wasted ({self.failed} failed), "
+            f"{self.wasted_seconds:.2f}s of calls"
+        )
+
+def classify(query: str, tools: Optional[Any] = None) -> Optional[Tuple[str, Dict[str, str]]]:
+    """The tool call a query most likely starts with, as (tool, arguments), or None.
+
+    Only tools named in tools are considered, when given.
+    """
+    for tool, argument, pattern in RULES:
+        if tools is not None and tool not in tools:
+            continue
+        match = pattern.search(query)
+        if match is None:
+            continue
+        value = _TRAILING.sub("", match.group("arg").strip(" ,;:\"'")).strip(" ,;:\"'")
+        if value:
+            return tool, {argument: value}
+    return None
+
+def _normalize(key: str, value: Any) -> Any:
+    if not isinstance(value, str):
+        return value
+    if key == "location":
+        return value.split(",")[0].strip().casefold()
+    if key == "query":
+        return frozenset(word for word in _WORD.findall(value.casefold()) if word not in STOP_WORDS)
+    return value.strip().casefold()
+
+def call_key(arguments: Dict[str, Any], defaults: Dict[str, Any]) -> Dict[str, Any]:
+    """Arguments with defaults filled in, normalized for comparison"""
+    return {key: _normalize(key, value) for key, value in {**defaults, **arguments}.items()}
+
+def schema_defaults(tool: Any) -> Dict[str, Any]:
+    schema = tool.args_schema
+    if not isinstance(schema, dict):
+        schema = schema.model_json_schema()
+    return {
+        name: spec["default"]
+        for name, spec in schema.get("properties", {}).items()
+        if "default" in spec
+    }
+
+class Speculation:
+    """One prefetched call, claimed at most once by a matching call of the model"""
+
+    def __init__(
+        self, tool: str, arguments: Dict[str, Any], key: Dict[str, Any], task: asyncio.Task
+    ):
+        self.tool = tool
+        self.arguments = arguments
+        self.key = key
+        self.task = task
+        self.started = time.perf_counter()
+        self.finished = float("inf")
+        self.claimed = False
+        task.add_done_callback(self._done)
+
+    def _done(self, task: asyncio.Task) -> None:
+        self.finished = time.perf_counter()
+        if not task.cancelled():
+            # Retrieve the exception of an unclaimed call, so it isn't logged as never retrieved
+            task.exception()
+
+    def duration(self) -> float:
+        """Seconds the call ran, so far if it's still running"""
+        return min(self.finished, time.perf_counter()) - self.started
+
+class Prefetcher:
+    """Starts speculative calls for queries and serves them to matching tool calls.
+
+    wrap() must be applied to the agent's tools before the graph is built.
+    """
+
+    def __init__(self):
+        self.stats = PrefetchStats()
+        self._tools: Dict[str, Any] = {}
+        self._calls: Dict[str, Callable[..., Any]] = {}
+        self._defaults: Dict[str, Dict[str, Any]] = {}
+        self._current: contextvars.ContextVar[Optional[Speculation]] = contextvars.ContextVar(
+            "prefetch", default=None
+        )
+
+    def wrap(self, tools: List[Any]) -> List[Any]:
+        """The tools, with those that can be prefetched answering from prefetches"""
+        prefetchable = {tool for tool, _, _ in RULES}
+        wrapped = []
+        for tool in tools:
+            if tool.name in prefetchable and tool.coroutine is not None:
+                self._calls[tool.name] = tool.coroutine
+                self._defaults[tool.name] = schema_defaults(tool)
+                serving = self._serving(tool.name, tool.coroutine)
+                tool = tool.model_copy(update={"coroutine": serving})
+                self._tools[tool.name] = tool
+            wrapped.append(tool)
+        return wrapped
+
+    def _serving(self, name: str, call: Callable[..., Any]) -> Callable[..., Any]:
+        async def call_tool(**arguments: Any) -> Any:
+            result = await self.claim(name, arguments)
+            if result is not None:
+                return result
+            return await call(**arguments)
+
+        return call_tool
+
+    async def claim(self, name: str, arguments: Dict[str, Any]) -> Optional[Any]:
+        """The prefetched result of a matching call, or None to make the call"""
+        speculation = self._current.get()
+        if speculation is None or speculation.claimed or speculation.tool != name:
+            return None
+        if call_key(arguments, self._defaults[name]) != speculation.key:
+            return None
+        speculation.claimed = True
+        claimed = time.perf_counter()
+        try:
+            result = await speculation.task
+        except Exception as e:
+            logger.info(f"Prefetched {name} call failed, calling again: {str(e)}")
+            self._record(speculation, "failed")
+            return None
+        self.stats.saved_seconds = round(
+            self.stats.saved_seconds + min(claimed, speculation.finished) - speculation.started, 3
+        )
+        self._record(speculation, "hit")
+        return result
+
+    def _record(self, speculation: Speculation, outcome: str) -> None:
+        seconds = speculation.duration()
+        if outcome == "hit":
+            self.stats.hits += 1
+        else:
+            self.stats.wasted += 1
+            self.stats.wasted_seconds = round(self.stats.wasted_seconds + seconds, 3)
+            if outcome == "failed":
+                self.stats.failed += 1
+        self.stats.hit_rate = round(self.stats.hits / self.stats.started, 3)
+        METRICS.record(PREFETCH_DURATION, seconds, tool=speculation.tool, outcome=outcome)
+
+    @asynccontextmanager
+    async def speculate(self, query: str) -> AsyncIterator[Optional[Speculation]]:
+        """Prefetch the likely first call of query while the block answers it"""
+        guess = classify(query, self._tools)
+        if guess is None:
+            yield None
+            return
+
+        tool, arguments = guess
+        task = asyncio.ensure_future(self._calls[tool](**arguments))
+        speculation = Speculation(tool, arguments, call_key(arguments, self._defaults[tool]), task)
+        self.stats.started += 1
+        logger.info(f"Prefetching {tool}({arguments})")
+        token = self._current.set(speculation)
+        try:
+            yield speculation
+        finally:
+            try:
+                self._current.reset(token)
+            except ValueError:
+                # Closed from another context, e.g. an abandoned stream finalized later
+                pass
+            if not speculation.claimed:
+                task.cancel()
+                self._record(speculation, "wasted")
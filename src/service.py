@@ -0,0 +1,139 @@
+"""HTTP service mode for the agent.
+
+Keeps the MCP server sessions, the tool list and the compiled agent graph
+alive for the lifetime of the process, so each query only pays for the
+LLM and tool calls it makes.
+"""
+
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from mcpserver.metrics import METRICS
+
+logger = logging.getLogger("agent_service")
+
+def create_app(runtime) -> Starlette:
+    """Create the Starlette app serving queries from one shared agent.AgentRuntime.
+
+    The runtime is passed in rather than imported, so running agent.py as a
+    script doesn't import it a second time under its module name.
+    """
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette):
+        """Start the MCP servers once and stop them when the service exits"""
+        async with runtime:
+            logger.info(
+                f"Agent ready with {len(runtime.tools)} tools, "
+                f"max concurrency {runtime.max_concurrency}"
+            )
+            yield
+
+    async def read_query(request: Request):
+        """The query text and session ID of a request, or an error response"""
+        try:
+            body = await request.json()
+        except ValueError:
+            return None, None, JSONResponse({"error": "Request body must be JSON"}, status_code=400)
+
+        text = body.get("query") if isinstance(body, dict) else None
+        if not isinstance(text, str) or not text.strip():
+            error = "Field 'query' must be a non-empty string"
+            return None, None, JSONResponse({"error": error}, status_code=400)
+        session_id = body.get("session_id")
+        if session_id is not None and (not isinstance(session_id, str) or not session_id.strip()):
+            error = "Field 'session_id' must be a non-empty string"
+            return None, None, JSONResponse({"error": error}, status_code=400)
+        return text, session_id, None
+
+    async def query(request: Request) -> JSONResponse:
+        """Answer a query: POST {"query": "...", "session_id": "..."}.
+
+        session_id is optional and continues that conversation.
+        """
+        text, session_id, error = await read_query(request)
+        if error is not None:
+            return error
+
+        started = time.perf_counter()
+        try:
+            response = await runtime.ask(text, session_id)
+        except Exception as e:
+            logger.exception("Error answering query")
+            return JSONResponse({"error": str(e)}, status_code=500)
+
+        return JSONResponse({
+            "response": response,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        })
+
+    async def query_stream(request: Request):
+        """Answer a query as newline-delimited JSON events: POST as for query()
+
+        Emits tool_start, tool_end and token events as they happen and an
+        answer event last (see AgentRuntime.stream), or an error event.
+        """
+        text, session_id, error = await read_query(request)
+        if error is not None:
+            return error
+
+        async def events():
+            try:
+                async for event in runtime.stream(text, session_id):
+                    yield json.dumps(event, default=str) + "\n"
+            except Exception as e:
+                logger.exception("Error streaming query")
+                yield json.dumps({"type": "error", "error": str(e)}) + "\n"
+
+        return StreamingResponse(events(), media_type="application/x-ndjson")
+
+    async def end_session(request: Request) -> JSONResponse:
+        """Forget a session's history: DELETE /sessions/{session_id}"""
+        await runtime.end_session(request.path_params["session_id"])
+        return JSONResponse({"deleted": request.path_params["session_id"]})
+
+    async def health(request: Request) -> JSONResponse:
+        """Report readiness, the loaded tools and the servers' supervision state.
+
+        Includes the prefetch and answer cache counters when they are on.
+        """
+        report = {"status": "ok", "tools": [tool.name for tool in runtime.tools]}
+        if runtime.client is not None and runtime.client.supervisor is not None:
+            servers = runtime.client.supervisor.snapshot()
+            report["servers"] = {name: stats.model_dump() for name, stats in servers.items()}
+        if runtime.prefetcher is not None:
+            report["prefetch"] = runtime.prefetcher.stats.model_dump()
+        if runtime.answers is not None:
+            report["answer_cache"] = runtime.answers.snapshot().model_dump()
+        return JSONResponse(report)
+
+    async def metrics(request: Request) -> PlainTextResponse:
+        """Latency histograms of this process in the Prometheus text format"""
+        return PlainTextResponse(
+            METRICS.render_prometheus(), media_type="text/plain; version=0.0.4"
+        )
+
+    return Starlette(
+        routes=[
+            Route("/query", query, methods=["POST"]),
+            Route("/query/stream", query_stream, methods=["POST"]),
+            Route("/sessions/{session_id}", end_session, methods=["DELETE"]),
+            Route("/health", health, methods=["GET"]),
+            Route("/metrics", metrics, methods=["GET"]),
+        ],
+        lifespan=lifespan,
+    )
+
+def serve(runtime, host: str, port: int) -> int:
+    """Run the agent service until interrupted"""
+    print(f"Starting agent service on http://{host}:{port}. Press Ctrl+C to exit.")
+    uvicorn.run(create_app(runtime), host=host, port=port)
+    return 0
@@ -0,0 +1,251 @@
+"""Supervision of the agent's MCP servers: health checks, restarts and recycling.
+
+A server that hangs (e.g. on a pathological expression blocking its event
+loop) or crashes would otherwise stall every call to it until the calls
+time out, for as long as the agent runs. ServerSupervisor watches each
+started server every interval seconds:
+
+- it pings the server; a ping that fails or takes longer than
+  latency_threshold is a failed check, and after failures failed checks
+  in a row the server is restarted. A server whose process exited is
+  restarted at once. Calls made during a restart wait for the new server
+- restarts stop the old process with SIGTERM, then SIGKILL if it is still
+  running stop_grace seconds later. A server that fails to start again is
+  retried with exponential backoff, up to restart_attempts times; after
+  that it is left stopped ("failed") until the next call starts it
+- it samples the resident memory and CPU use of each server process (with
+  its workers, on Linux). A server over max_rss_mb is recycled: a fresh
+  one takes new calls at once, and the old one finishes its calls first
+
+Servers not started yet (lazy or stopped when idle) aren't touched, and
+replicas of remote servers have their own health checks (ReplicaSet).
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from pydantic import BaseModel
+
+from mcpclient import ManagedServer, process_group
+from mcpserver.metrics import METRICS
+from mcpserver.resilience import backoff_delay
+
+logger = logging.getLogger("agent_supervisor")
+
+SERVER_PING_DURATION = "agent_server_ping_duration_seconds"
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+class SupervisorConfig(BaseModel):
+    """Settings of server supervision"""
+    # Seconds between checks of each server; 0 turns supervision off
+    interval: float = 10.0
+    # Pings slower than this count as failed checks
+    latency_threshold: float = 2.0
+    # Failed checks in a row before a server is restarted
+    failures: int = 3
+    # Seconds a stopping server process gets to exit before SIGTERM, and between SIGTERM and SIGKILL
+    stop_grace: float = 3.0
+    backoff_base: float = 0.5
+    backoff_max: float = 30.0
+    # Start attempts of one restart before the server is left stopped
+    restart_attempts: int = 5
+    # Resident memory, with workers, above which a server is recycled; 0 never recycles
+    max_rss_mb: float = 0.0
+    # Seconds a recycled server has to finish its calls in flight
+    drain: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "SupervisorConfig":
+        """Build the config from AGENT_SUPERVISOR_* variables, keeping defaults for unset ones"""
+        env = {
+            field: os.environ.get(f"AGENT_SUPERVISOR_{field.upper()}")
+            for field in cls.model_fields
+        }
+        return cls(**{key: value for key, value in env.items() if value})
+
+class ServerStats(BaseModel):
+    """What the supervisor last saw of one server"""
+    state: str = "stopped"
+    pid: Optional[int] = None
+    ping_ms: Optional[float] = None
+    failed_checks: int = 0
+    rss_mb: Optional[float] = None
+    cpu_percent: Optional[float] = None
+    restarts: int = 0
+    recycles: int = 0
+
+def process_usage(pid: int) -> Optional[Tuple[int, float]]:
+    """Resident bytes and CPU seconds of a process and the rest of its group.
+
+    None where /proc isn't available.
+    """
+    pgid = process_group(pid)
+    pids = [pid]
+    if pgid is not None:
+        try:
+            pids = [int(entry) for entry in os.listdir("/proc") if entry.isdigit()]
+        except OSError:
+            return None
+    rss = 0
+    cpu = 0.0
+    found = False
+    for member in pids:
+        try:
+            with open(f"/proc/{member}/stat") as stat:
+                # Fields after the command, which may contain spaces and parentheses
+                fields = stat.read().rpartition(")")[2].split()
+        except OSError:
+            continue
+        if pgid is not None and int(fields[2]) != pgid:
+            continue
+        found = True
+        cpu += (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS
+        rss += int(fields[21]) * _PAGE_SIZE
+    return (rss, cpu) if found else None
+
+class ServerSupervisor:
+    """Health checks, restarts and recycling of managed servers; see the module docstring"""
+
+    def __init__(self, servers: Dict[str, ManagedServer], config: SupervisorConfig):
+        self.servers = servers
+        self.config = config
+        self.stats = {name: ServerStats() for name in servers}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # Restarts in a row without a passing check, for the backoff between them
+        self._streaks = {name: 0 for name in servers}
+        self._cpu: Dict[str, Tuple[int, float, float]] = {}
+
+    def start(self) -> None:
+        if self.config.interval <= 0:
+            return
+        for name, server in self.servers.items():
+            self._tasks[name] = asyncio.create_task(
+                self._watch(name, server), name=f"supervise-{name}"
+            )
+
+    async def stop(self) -> None:
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
+
+    def snapshot(self) -> Dict[str, ServerStats]:
+        return {name: stats.model_copy() for name, stats in self.stats.items()}
+
+    def _backoff(self, name: str, attempt: int) -> float:
+        """Seconds before start attempt number attempt of a restart.
+
+        None for the first restart in a while.
+        """
+        attempt += self._streaks[name]
+        if attempt == 0:
+            return 0.0
+        return backoff_delay(attempt - 1, self.config.backoff_base, self.config.backoff_max)
+
+    async def _watch(self, name: str, server: ManagedServer) -> None:
+        while True:
+            await asyncio.sleep(self.config.interval)
+            try:
+                await self.check(name, server)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception(f"Error supervising MCP server {name}")
+
+    async def check(self, name: str, server: ManagedServer) -> None:
+        """Check one server, restarting or recycling it if needed"""
+        stats = self.stats[name]
+        handle = server.handle
+        if handle is None or not handle.alive:
+            # A server given up on stays "failed" until a call starts it again
+            if stats.state != "failed":
+                stats.state = "stopped"
+            stats.pid = stats.ping_ms = stats.rss_mb = stats.cpu_percent = None
+            return
+        stats.pid = handle.process.pid if handle.process is not None else None
+
+        if handle.exited:
+            code = handle.process.returncode
+            logger.warning(f"MCP server {name} exited with code {code}, restarting it")
+            await self._restart(name, server)
+            return
+
+        error = await self._ping(name, handle.session)
+        if error is None:
+            stats.failed_checks = 0
+            self._streaks[name] = 0
+            stats.state = "healthy"
+        else:
+            stats.failed_checks += 1
+            stats.state = "unhealthy"
+            logger.warning(
+                f"MCP server {name} failed a health check "
+                f"({stats.failed_checks} of {self.config.failures}): {error}"
+            )
+            if stats.failed_checks >= self.config.failures:
+                await self._restart(name, server)
+                return
+
+        if stats.pid is not None:
+            self._sample(name, stats.pid)
+            limit = self.config.max_rss_mb
+            if limit > 0 and stats.rss_mb is not None and stats.rss_mb > limit:
+                logger.info(f"Recycling MCP server {name} at {stats.rss_mb:.0f} MB resident")
+                if await server.recycle(self.config.drain):
+                    stats.recycles += 1
+                    self._cpu.pop(name, None)
+
+    async def _ping(self, name: str, session) -> Optional[str]:
+        """None if the server answered a ping within the latency threshold, or what went wrong"""
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(session.send_ping(), self.config.latency_threshold)
+        except asyncio.TimeoutError:
+            return f"no ping response within {self.config.latency_threshold:g}s"
+        except Exception as e:
+            return f"ping failed: {e!r}"
+        seconds = time.perf_counter() - started
+        self.stats[name].ping_ms = round(seconds * 1000, 2)
+        METRICS.record(SERVER_PING_DURATION, seconds, server=name)
+        return None
+
+    def _sample(self, name: str, pid: int) -> None:
+        stats = self.stats[name]
+        usage = process_usage(pid)
+        if usage is None:
+            return
+        rss, cpu = usage
+        now = time.monotonic()
+        stats.rss_mb = round(rss / 2**20, 1)
+        previous = self._cpu.get(name)
+        if previous is not None and previous[0] == pid and now > previous[2]:
+            stats.cpu_percent = round(max(cpu - previous[1], 0.0) / (now - previous[2]) * 100, 1)
+        self._cpu[name] = (pid, cpu, now)
+
+    async def _restart(self, name: str, server: ManagedServer) -> None:
+        stats = self.stats[name]
+        stats.state = "restarting"
+        started = time.perf_counter()
+        self._cpu.pop(name, None)
+        stats.failed_checks = 0
+        try:
+            await server.restart(
+                lambda attempt: self._backoff(name, attempt), self.config.restart_attempts
+            )
+        except Exception as e:
+            self._streaks[name] += 1
+            logger.error(
+                f"Giving up restarting MCP server {name} "
+                f"after {self.config.restart_attempts} attempts: {e}"
+            )
+            stats.state = "failed"
+            return
+        logger.info(f"Restarted MCP server {name} in {time.perf_counter() - started:.2f}s")
+        self._streaks[name] += 1
+        stats.restarts += 1
+        stats.state = "healthy"
@@ -0,0 +1,108 @@
+"""Keys, TTLs and invalidation of the answer cache"""
+
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.tools import StructuredTool
+
+from answers import AnswerCache
+from mcpserver.cache import CacheConfig
+
+PROMPT = "You are a helpful assistant."
+
+
+def make_tool(name: str, description: str = "A tool") -> StructuredTool:
+    async def run(query: str) -> str:
+        return query
+
+    return StructuredTool.from_function(coroutine=run, name=name, description=description)
+
+TOOLS = [make_tool("search_web"), make_tool("calculate")]
+
+def run_with(*tool_messages: ToolMessage, answer: str = "answer"):
+    calls = []
+
+    async def run():
+        calls.append(1)
+        return [HumanMessage(content="question"), *tool_messages, AIMessage(content=answer)]
+
+    return run, calls
+
+def tool_message(name: str, status: str = "success") -> ToolMessage:
+    return ToolMessage(content="result", name=name, tool_call_id=f"call-{name}", status=status)
+
+def test_keys_ignore_trivial_differences():
+    cache = AnswerCache(CacheConfig(ttl=60), PROMPT, TOOLS)
+    assert cache.key("What is 2+2?") == cache.key("  what is   2+2 ")
+    assert cache.key("What is 2+2?") != cache.key("What is 2+3?")
+
+def test_new_prompt_or_tools_invalidate_keys():
+    key = AnswerCache(CacheConfig(ttl=60), PROMPT, TOOLS).key("question")
+    assert AnswerCache(CacheConfig(ttl=60), PROMPT, list(reversed(TOOLS))).key("question") == key
+    assert AnswerCache(CacheConfig(ttl=60), PROMPT + " Be brief.", TOOLS).key("question") != key
+    changed = [make_tool("search_web", "Search the web"), make_tool("calculate")]
+    assert AnswerCache(CacheConfig(ttl=60), PROMPT, changed).key("question") != key
+    assert AnswerCache(CacheConfig(ttl=60), PROMPT, TOOLS[:1]).key("question") != key
+
+def test_ttl_is_shortest_of_tools_used():
+    cache = AnswerCache(CacheConfig(ttl=60), PROMPT, TOOLS, {"calculate": 5000})
+    entry = {"tools": [], "failed_tools": 0}
+    assert cache.ttl(entry) == 60
+    assert cache.ttl({**entry, "tools": ["calculate"]}) == 5000
+    assert cache.ttl({**entry, "tools": ["calculate", "search_web"]}) == 900
+    assert cache.ttl({**entry, "tools": ["unknown"]}) == 60
+    assert cache.ttl({**entry, "tools": ["calculate", "tavily_stats"]}) == 0
+    assert cache.ttl({"tools": ["calculate"], "failed_tools": 1}) == 0
+
+def test_repeated_queries_answered_from_cache():
+    cache = AnswerCache(CacheConfig(ttl=60), PROMPT, TOOLS)
+    run, calls = run_with(tool_message("calculate"), answer="4")
+
+    async def ask():
+        return [await cache.get_or_answer(query, run) for query in ("2+2?", "2+2", "2 + 2")]
+
+    assert asyncio.run(ask()) == ["4", "4", "4"]
+    # "2 + 2" normalizes differently
+    assert len(calls) == 2
+    assert cache.snapshot().hits == 1
+
+def test_answers_after_failed_tools_not_cached():
+    cache = AnswerCache(CacheConfig(ttl=60), PROMPT, TOOLS)
+    run, calls = run_with(tool_message("search_web", status="error"))
+
+    async def ask():
+        for _ in range(2):
+            await cache.get_or_answer("question", run)
+
+    asyncio.run(ask())
+    assert len(calls) == 2
+    assert cache.snapshot().size == 0
+
+def test_concurrent_queries_share_one_run():
+    cache = AnswerCache(CacheConfig(ttl=60), PROMPT, TOOLS)
+    calls = []
+
+    async def run():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return [AIMessage(content="answer")]
+
+    async def ask():
+        return await asyncio.gather(*(cache.get_or_answer("question", run) for _ in range(3)))
+
+    assert asyncio.run(ask()) == ["answer"] * 3
+    assert len(calls) == 1
+
+def test_from_env(monkeypatch):
+    monkeypatch.delenv("AGENT_ANSWER_CACHE_TTL", raising=False)
+    assert AnswerCache.from_env(PROMPT, TOOLS) is None
+    monkeypatch.setenv("AGENT_ANSWER_CACHE_TTL", "0")
+    assert AnswerCache.from_env(PROMPT, TOOLS) is None
+
+    monkeypatch.setenv("AGENT_ANSWER_CACHE_TTL", "600")
+    monkeypatch.setenv("AGENT_ANSWER_CACHE_TOOL_TTL", "30,search_web=10")
+    cache = AnswerCache.from_env(PROMPT, TOOLS)
+    assert cache.default_ttl == 600
+    assert cache.tool_ttls["search_web"] == 10
+    assert cache.tool_ttls["calculate"] == 86400
+    assert "*" not in cache.tool_ttls
@@ -0,0 +1,66 @@
+"""Resuming batch runs"""
+
+import asyncio
+import json
+
+from batch import ends_mid_line, read_done_ids, run_batch_files
+
+
+class FakeRuntime:
+    """Answers every query with its upper-cased text"""
+
+    prefetcher = None
+    answers = None
+
+    def __init__(self):
+        self.asked = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return None
+
+    async def ask(self, query: str) -> str:
+        self.asked.append(query)
+        return query.upper()
+
+def write_lines(path, lines):
+    path.write_text("".join(lines), encoding="utf-8")
+
+def test_only_answered_ids_are_done(tmp_path):
+    output = tmp_path / "out.jsonl"
+    write_lines(output, [
+        json.dumps({"id": "1", "query": "a", "answer": "A"}) + "\n",
+        json.dumps({"id": "2", "query": "b", "error": "rate limited"}) + "\n",
+        '{"id": "3", "query": "c", "ans',
+    ])
+    assert read_done_ids(str(output)) == {"1"}
+    assert ends_mid_line(str(output))
+
+def test_resume_retries_failed_and_cut_queries(tmp_path):
+    source = tmp_path / "in.jsonl"
+    output = tmp_path / "out.jsonl"
+    write_lines(source, [
+        json.dumps({"id": str(index), "query": query}) + "\n"
+        for index, query in enumerate("abc", 1)
+    ])
+    write_lines(output, [
+        json.dumps({"id": "1", "query": "a", "answer": "A"}) + "\n",
+        json.dumps({"id": "2", "query": "b", "error": "rate limited"}) + "\n",
+        '{"id": "3", "query": "c", "ans',
+    ])
+
+    runtime = FakeRuntime()
+    summary = asyncio.run(run_batch_files(runtime, str(source), str(output), workers=2))
+
+    assert sorted(runtime.asked) == ["b", "c"]
+    assert summary["skipped"] == 1
+    assert read_done_ids(str(output)) == {"1", "2", "3"}
+    assert not ends_mid_line(str(output))
+
+def test_empty_or_missing_output_is_not_mid_line(tmp_path):
+    output = tmp_path / "out.jsonl"
+    assert not ends_mid_line(str(output))
+    output.write_text("")
+    assert not ends_mid_line(str(output))
@@ -0,0 +1,183 @@
+"""TTL, LRU, stale reads and single-flight coalescing of the response cache"""
+
+import asyncio
+
+import pytest
+
+from mcpserver import cache
+from mcpserver.cache import CacheConfig, ResponseCache, SingleFlight
+
+
+class Clock:
+    """Stands in for the time module in mcpserver.cache"""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache, "time", clock)
+    return clock
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_cache(request, tmp_path):
+    caches = []
+
+    def make(**settings) -> ResponseCache:
+        path = str(tmp_path / "cache.sqlite") if request.param == "sqlite" else None
+        response_cache = ResponseCache(CacheConfig(path=path, **settings))
+        caches.append(response_cache)
+        return response_cache
+
+    yield make
+    for response_cache in caches:
+        response_cache.close()
+
+def fetcher(value="value"):
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return value
+
+    return fetch, calls
+
+def test_entries_expire_after_ttl(make_cache, clock):
+    response_cache = make_cache(ttl=10, stale_ttl=0)
+    fetch, calls = fetcher()
+
+    async def run():
+        assert await response_cache.get_or_fetch("key", fetch) == "value"
+        clock.now += 9
+        assert await response_cache.get_or_fetch("key", fetch) == "value"
+        assert len(calls) == 1
+        clock.now += 2
+        assert await response_cache.get_or_fetch("key", fetch) == "value"
+        assert len(calls) == 2
+
+    asyncio.run(run())
+    stats = response_cache.snapshot()
+    assert (stats.hits, stats.misses, stats.expirations, stats.size) == (1, 2, 1, 1)
+
+def test_ttl_from_value(make_cache, clock):
+    response_cache = make_cache(ttl=10)
+    fetch, calls = fetcher([])
+
+    async def run():
+        # e.g. empty results aren't cached
+        for _ in range(2):
+            await response_cache.get_or_fetch("key", fetch, ttl=lambda value: 60 if value else 0)
+
+    asyncio.run(run())
+    assert len(calls) == 2
+    assert response_cache.snapshot().size == 0
+
+def test_least_recently_used_evicted(make_cache, clock):
+    response_cache = make_cache(max_entries=2)
+
+    async def run():
+        for key in ("a", "b"):
+            await response_cache.get_or_fetch(key, fetcher(key)[0])
+            clock.now += 1
+        # Reading a makes b the least recently used
+        await response_cache.get_or_fetch("a", fetcher()[0])
+        clock.now += 1
+        await response_cache.get_or_fetch("c", fetcher("c")[0])
+        fetch, calls = fetcher("b again")
+        clock.now += 1
+        assert await response_cache.get_or_fetch("a", fetcher()[0]) == "a"
+        assert await response_cache.get_or_fetch("b", fetch) == "b again"
+        assert len(calls) == 1
+
+    asyncio.run(run())
+    assert response_cache.stats.evictions == 2
+    assert response_cache.snapshot().size == 2
+
+def test_stale_reads(make_cache, clock):
+    response_cache = make_cache(ttl=10, stale_ttl=100)
+
+    async def run():
+        await response_cache.get_or_fetch("key", fetcher()[0])
+
+    asyncio.run(run())
+    assert response_cache.get_stale("missing") == (False, None)
+    clock.now += 50
+    # Expired entries are only served on request, e.g. when the upstream fails
+    assert response_cache._backend.get("key") == (False, None)
+    assert response_cache.get_stale("key") == (True, "value")
+    clock.now += 61
+    assert response_cache.get_stale("key") == (False, None)
+    assert response_cache.stats.stale_hits == 1
+    assert response_cache.stats.expirations == 1
+    assert response_cache.snapshot().size == 0
+
+def test_disabled_cache_always_fetches(make_cache, clock):
+    response_cache = make_cache(ttl=0)
+    fetch, calls = fetcher()
+
+    async def run():
+        for _ in range(3):
+            await response_cache.get_or_fetch("key", fetch)
+
+    asyncio.run(run())
+    assert len(calls) == 3
+    assert response_cache.get_stale("key") == (False, None)
+
+def test_concurrent_misses_coalesced():
+    response_cache = ResponseCache(CacheConfig())
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "value"
+
+    async def run():
+        return await asyncio.gather(*(response_cache.get_or_fetch("key", fetch) for _ in range(5)))
+
+    assert asyncio.run(run()) == ["value"] * 5
+    assert len(calls) == 1
+    assert (response_cache.stats.misses, response_cache.stats.coalesced) == (1, 4)
+
+def test_cancelled_caller_leaves_call_running():
+    flight = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "value"
+
+    async def run():
+        first = asyncio.create_task(flight.do("key", fetch))
+        second = asyncio.create_task(flight.do("key", fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert await second == "value"
+        assert "key" not in flight
+
+    asyncio.run(run())
+    assert len(calls) == 1
+
+def test_failed_call_not_cached():
+    flight = SingleFlight()
+
+    async def fail():
+        raise RuntimeError("upstream down")
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await flight.do("key", fail)
+        assert "key" not in flight
+        assert await flight.do("key", fetcher()[0]) == "value"
+
+    asyncio.run(run())
@@ -0,0 +1,54 @@
+"""Cancelling tool calls that time out on the server too"""
+
+import asyncio
+from typing import List
+
+from mcp.server.fastmcp import Context, FastMCP
+
+from mcpclient import ManagedServer
+
+# Ids of the requests whose tool was cancelled on the server, and all started
+CANCELLED: List[str] = []
+STARTED: List[str] = []
+
+def create_server() -> FastMCP:
+    """Server for in-process connections to this module"""
+    mcp = FastMCP("Slow")
+
+    @mcp.tool()
+    async def sleep(seconds: float, ctx: Context) -> str:
+        """Sleep for seconds"""
+        STARTED.append(str(ctx.request_id))
+        try:
+            await asyncio.sleep(seconds)
+        except asyncio.CancelledError:
+            CANCELLED.append(str(ctx.request_id))
+            raise
+        return "done"
+
+    return mcp
+
+def test_timed_out_calls_are_cancelled_on_the_server():
+    async def run():
+        CANCELLED.clear()
+        STARTED.clear()
+        server = ManagedServer(
+            "slow",
+            {"transport": "in_process", "module": __name__},
+            tool_timeouts={"sleep": 0.5},
+        )
+        try:
+            # A finished call first, so the ids don't start at the beginning
+            assert (await server.call_tool("sleep", {"seconds": 0})).content[0].text == "done"
+            calls = [server.call_tool("sleep", {"seconds": 30}) for _ in range(3)]
+            results = await asyncio.gather(*calls)
+            assert all(result.isError for result in results)
+            for _ in range(100):
+                if len(CANCELLED) == 3:
+                    break
+                await asyncio.sleep(0.02)
+            assert sorted(CANCELLED) == sorted(STARTED[1:])
+        finally:
+            await server.stop()
+
+    asyncio.run(run())
@@ -0,0 +1,138 @@
+"""Limits of the math server's expression engine"""
+
+import asyncio
+import time
+
+import pytest
+
+from mcpserver import math_server
+from mcpserver.expression import (
+    MAX_EXPONENT,
+    MAX_ROUND_DIGITS,
+    EvaluationPool,
+    ExpressionError,
+    compile_expression,
+)
+
+
+def slow_evaluation(expression: str) -> float:
+    """Stands in for an evaluation that is slow despite the limits.
+
+    Module level, so workers can import it.
+    """
+    time.sleep(10)
+    return 0.0
+
+def nap(expression: str) -> float:
+    """An evaluation that takes a while but stays within the timeout"""
+    time.sleep(1.0)
+    return 1.0
+
+def slow_many(expressions):
+    time.sleep(10)
+    return [], {}
+
+def evaluate(expression: str) -> float:
+    return compile_expression(expression).evaluate()
+
+def test_pow_within_limits():
+    assert evaluate("2^10") == 1024
+    assert evaluate("(-8)^2") == 64
+
+@pytest.mark.parametrize("expression", [f"2^{MAX_EXPONENT + 1}", "10^5000", "9^(9^9)"])
+def test_pow_over_limits(expression):
+    started = time.perf_counter()
+    with pytest.raises(ExpressionError):
+        evaluate(expression)
+    assert time.perf_counter() - started < 1
+
+def test_round_within_limits():
+    assert evaluate("round(2.567, 2)") == 2.57
+    assert evaluate("round(1234, -2)") == 1200
+    assert evaluate("round(2.5)") == 2
+
+@pytest.mark.parametrize(
+    "expression", ["round(7, -(10^7))", "round(7, -(10^8))", f"round(1, {MAX_ROUND_DIGITS + 1})"]
+)
+def test_round_over_limits(expression):
+    started = time.perf_counter()
+    with pytest.raises(ExpressionError, match="exceed the limit"):
+        evaluate(expression)
+    assert time.perf_counter() - started < 1
+
+def test_round_digits_must_be_integers():
+    with pytest.raises(ExpressionError):
+        evaluate("round(2.5, 1.5)")
+
+def test_pool_timeout():
+    async def run():
+        pool = EvaluationPool(max_workers=1, timeout=0.5)
+        try:
+            started = time.perf_counter()
+            with pytest.raises(ExpressionError, match="timed out"):
+                await pool.run(slow_evaluation, "1")
+            assert time.perf_counter() - started < 5
+            # The killed pool is replaced on the next call
+            assert await pool.run(math_server.evaluate_expression, "1 + 1") == 2
+        finally:
+            pool.close()
+
+    asyncio.run(run())
+
+def test_pool_timeout_spares_other_workers():
+    async def run():
+        pool = EvaluationPool(max_workers=2, timeout=30.0)
+        try:
+            # Start both workers, so spawning doesn't count against the timeout
+            await asyncio.gather(pool.run(nap, "1"), pool.run(nap, "1"))
+            pool.timeout = 3.0
+            slow = asyncio.ensure_future(pool.run(slow_evaluation, "1"))
+            await asyncio.sleep(2.5)
+            # Still running when the slow evaluation's worker is killed
+            assert await pool.run(nap, "1") == 1.0
+            with pytest.raises(ExpressionError, match="timed out"):
+                await slow
+        finally:
+            pool.close()
+
+    asyncio.run(run())
+
+def test_calculate_runs_in_pool_with_timeout(monkeypatch):
+    monkeypatch.setenv("MATH_TIMEOUT", "0.5")
+    monkeypatch.setenv("MATH_POOL_WORKERS", "1")
+
+    async def run():
+        server = math_server.create_server()
+        async with server.settings.lifespan(server):
+            _, result = await server.call_tool("calculate", {"expression": "6 * 7"})
+            assert result["result"] == 42
+
+            monkeypatch.setattr(math_server, "evaluate_expression", slow_evaluation)
+            started = time.perf_counter()
+            with pytest.raises(Exception, match="timed out"):
+                await server.call_tool("calculate", {"expression": "1 + 1"})
+            assert time.perf_counter() - started < 5
+
+    asyncio.run(run())
+
+def test_calculate_many_runs_in_pool_with_timeout(monkeypatch):
+    monkeypatch.setenv("MATH_TIMEOUT", "0.5")
+    monkeypatch.setenv("MATH_POOL_WORKERS", "1")
+
+    async def run():
+        server = math_server.create_server()
+        async with server.settings.lifespan(server):
+            arguments = {"expressions": ["1 + 1", "2 * 3"]}
+            _, result = await server.call_tool("calculate_many", arguments)
+            assert result["results"] == [2, 6]
+            arguments = {"expression": "x * 2", "variables": {"x": [1, 2]}}
+            _, result = await server.call_tool("calculate_many", arguments)
+            assert result["results"] == [2, 4]
+
+            monkeypatch.setattr(math_server, "evaluate_many", slow_many)
+            started = time.perf_counter()
+            with pytest.raises(Exception, match="timed out"):
+                await server.call_tool("calculate_many", {"expressions": ["1 + 1"]})
+            assert time.perf_counter() - started < 5
+
+    asyncio.run(run())
@@ -0,0 +1,90 @@
+"""Incremental parsing of streamed JSON bodies"""
+
+import json
+
+import pytest
+
+from mcpserver.jsonstream import ArrayItems, ResponseTooLarge
+
+BODY = {
+    "answer": 'skipped, with {braces} and [brackets] and a "quote"',
+    "results": [
+        {"title": "Braces {in} [strings]", "content": 'escaped " quote, backslash \\ and é'},
+        {"title": "Nested", "scores": [1, 2.5, -3e2, None, True], "meta": {"a": {"b": []}}},
+        "a bare string ending in a backslash \\",
+        12345.678,
+        False,
+    ],
+    "after": {"ignored": [1, 2, 3]},
+}
+
+def parse(body: bytes, chunk_size: int, key: str = "results", max_bytes=None) -> list:
+    parser = ArrayItems(key, max_bytes)
+    items = []
+    for start in range(0, len(body), chunk_size):
+        items.extend(parser.feed(body[start:start + chunk_size]))
+    items.extend(parser.finish())
+    return items
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 8, 13, 64, 100_000])
+def test_items_split_across_chunks(chunk_size):
+    body = json.dumps(BODY).encode()
+    assert parse(body, chunk_size) == BODY["results"]
+
+def test_escapes_and_braces_in_strings():
+    # Multi-byte characters split across chunks too
+    body = json.dumps(BODY, ensure_ascii=False).encode()
+    items = parse(body, 1)
+    assert items[0]["content"] == 'escaped " quote, backslash \\ and é'
+    assert items[0]["title"] == "Braces {in} [strings]"
+    assert items[2].endswith("\\")
+
+def test_items_returned_as_soon_as_complete():
+    parser = ArrayItems("results")
+    first = json.dumps(BODY["results"][0]).encode()
+    assert parser.feed(b'{"results": [' + first[:-1]) == []
+    assert parser.feed(b"}, ") == [BODY["results"][0]]
+
+def test_number_split_at_chunk_boundary():
+    parser = ArrayItems("results")
+    assert parser.feed(b'{"results": [12') == []
+    assert parser.feed(b"3.5") == []
+    assert parser.feed(b"]}") == [123.5]
+    assert parser.finish() == []
+
+def test_oversize_body_raises():
+    body = json.dumps(BODY).encode()
+    with pytest.raises(ResponseTooLarge):
+        parse(body, 16, max_bytes=len(body) - 1)
+    assert parse(body, 16, max_bytes=len(body)) == BODY["results"]
+
+def test_truncated_body_raises():
+    body = json.dumps(BODY).encode()
+    with pytest.raises(ValueError):
+        parse(body[:body.index(b"Nested")], 7)
+
+def test_not_an_object_raises():
+    with pytest.raises(ValueError, match="not a JSON object"):
+        parse(b"[1, 2]", 4)
+
+class CountingDecoder(json.JSONDecoder):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def raw_decode(self, s, idx=0):
+        self.calls += 1
+        return super().raw_decode(s, idx)
+
+def test_each_value_decoded_once():
+    item = {"title": "big", "parts": [{"index": index, "text": "{x} [y]"} for index in range(500)]}
+    body = json.dumps({"results": [item, item]}).encode()
+    parser = ArrayItems("results")
+    parser._decoder = decoder = CountingDecoder()
+    items = []
+    for start in range(0, len(body), 64):
+        items.extend(parser.feed(body[start:start + 64]))
+    items.extend(parser.finish())
+    assert items == [item, item]
+    # The member name and the two items
+    assert decoder.calls == 3
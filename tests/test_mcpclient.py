@@ -0,0 +1,27 @@
+"""Tool call options of the agent's MCP client"""
+
+from agent import ProcessTrackingClient, server_env
+from mcpclient import ManagedServer, parse_overrides
+
+
+def test_tool_timeouts_by_tool_then_server():
+    client = ProcessTrackingClient({}, tool_timeouts=parse_overrides("60,tavily=10,search_web=5"))
+    tavily = ManagedServer("tavily", {}, tool_timeouts=client.server_timeouts("tavily"))
+    math = ManagedServer("math", {}, tool_timeouts=client.server_timeouts("math"))
+
+    assert tavily.timeout("search_web") == 5
+    assert tavily.timeout("search_news") == 10
+    assert math.timeout("calculate") == 60
+
+def test_zero_timeout_is_no_limit():
+    server = ManagedServer("math", {}, tool_timeouts=parse_overrides("0"))
+    assert server.timeout("calculate") is None
+
+def test_stdio_servers_receive_runtime_settings(monkeypatch):
+    monkeypatch.setenv("MCP_DRAIN_TIMEOUT", "3")
+    monkeypatch.setenv("MATH_TIMEOUT", "2")
+    monkeypatch.setenv("TAVILY_API_KEY", "secret")
+    env = server_env("math")
+    assert env["MCP_DRAIN_TIMEOUT"] == "3"
+    assert env["MATH_TIMEOUT"] == "2"
+    assert "TAVILY_API_KEY" not in env
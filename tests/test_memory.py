@@ -0,0 +1,59 @@
+"""Pruning of session checkpoints"""
+
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import START, MessagesState, StateGraph
+
+from memory import ConversationMemory, MemoryConfig, open_checkpointer
+
+
+def answer(state: MessagesState) -> dict:
+    return {"messages": [AIMessage(content=f"answer {len(state['messages'])}")]}
+
+async def checkpoint_ids(checkpointer, session_id: str) -> list:
+    config = {"configurable": {"thread_id": session_id}}
+    return [
+        item.config["configurable"]["checkpoint_id"] async for item in checkpointer.alist(config)
+    ]
+
+async def prune_sessions(path: str) -> None:
+    async with open_checkpointer(path) as checkpointer:
+        builder = StateGraph(MessagesState)
+        builder.add_node("answer", answer)
+        builder.add_edge(START, "answer")
+        graph = builder.compile(checkpointer=checkpointer)
+        memory = ConversationMemory(MemoryConfig(path=path), None, checkpointer)
+
+        for session_id in ("a", "b"):
+            config = {"configurable": {"thread_id": session_id}}
+            for turn in range(3):
+                question = HumanMessage(content=f"question {turn}")
+                await graph.ainvoke({"messages": [question]}, config)
+        config = {"configurable": {"thread_id": "a"}}
+        before = (await graph.aget_state(config)).values["messages"]
+        assert len(await checkpoint_ids(checkpointer, "a")) > 1
+
+        await memory.prune("a")
+        assert len(await checkpoint_ids(checkpointer, "a")) == 1
+        assert (await graph.aget_state(config)).values["messages"] == before
+        # Other sessions are untouched
+        assert len(await checkpoint_ids(checkpointer, "b")) > 1
+
+        # The session continues from the kept checkpoint; pruning a pruned session is a no-op
+        await graph.ainvoke({"messages": [HumanMessage(content="question 3")]}, config)
+        await memory.prune("a")
+        messages = (await graph.aget_state(config)).values["messages"]
+        assert messages[:len(before)] == before
+        assert messages[-1].content == "answer 7"
+        await memory.prune("a")
+        assert len(await checkpoint_ids(checkpointer, "a")) == 1
+        await memory.prune("missing")
+
+def test_prune_in_memory():
+    asyncio.run(prune_sessions(":memory:"))
+
+def test_prune_sqlite(tmp_path):
+    pytest.importorskip("langgraph.checkpoint.sqlite.aio")
+    asyncio.run(prune_sessions(str(tmp_path / "sessions.sqlite")))
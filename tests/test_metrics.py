@@ -0,0 +1,96 @@
+"""Histogram percentiles and the Prometheus exposition format"""
+
+import asyncio
+import inspect
+
+import pytest
+
+from mcpserver.metrics import BUCKETS, Histogram, MetricsRegistry
+
+
+def test_quantiles_interpolate_within_buckets():
+    histogram = Histogram()
+    assert histogram.quantile(0.5) is None
+    for _ in range(90):
+        histogram.observe(0.02)
+    for _ in range(10):
+        histogram.observe(0.8)
+    # Rank 50 of the 90 observations in (0.01, 0.025]
+    assert histogram.quantile(0.5) == pytest.approx(0.01 + 0.015 * 50 / 90)
+    # Interpolation in (0.75, 1.0] would give 0.875, more than was observed
+    assert histogram.quantile(0.95) == pytest.approx(0.8)
+    assert histogram.quantile(0.99) == pytest.approx(0.8)
+
+def test_overflow_bucket_uses_largest_observation():
+    histogram = Histogram()
+    histogram.observe(0.5)
+    histogram.observe(BUCKETS[-1] * 2)
+    assert histogram.counts[-1] == 1
+    # Interpolated between the last bound and the largest observation
+    assert histogram.quantile(1.0) == pytest.approx(BUCKETS[-1] * 2)
+    assert histogram.quantile(0.99) == pytest.approx(BUCKETS[-1] * 1.98)
+
+def test_snapshot_in_milliseconds():
+    registry = MetricsRegistry()
+    for _ in range(100):
+        registry.record("tool_duration_seconds", 0.003, tool="add")
+    registry.observe("tool_duration_seconds", (("tool", "add"),), 0.003, error=True)
+    [snapshot] = registry.snapshot().histograms
+    assert snapshot.labels == {"tool": "add"}
+    assert (snapshot.count, snapshot.errors) == (101, 1)
+    assert snapshot.sum_ms == pytest.approx(303.0)
+    assert snapshot.p50_ms == snapshot.p99_ms == 3.0
+
+def test_prometheus_output():
+    registry = MetricsRegistry()
+    registry.record("tool_duration_seconds", 0.003, server='say "hi"', tool="add")
+    registry.observe("tool_duration_seconds", (("server", 'say "hi"'), ("tool", "add")), 0.02, True)
+    registry.record("tool_duration_seconds", 30.0, server="other", tool="add")
+    lines = registry.render_prometheus().splitlines()
+
+    assert lines[0] == "# TYPE tool_duration_seconds histogram"
+    labels = 'server="say \\"hi\\"",tool="add"'
+    assert f'tool_duration_seconds_bucket{{{labels},le="0.001"}} 0' in lines
+    assert f'tool_duration_seconds_bucket{{{labels},le="0.005"}} 1' in lines
+    assert f'tool_duration_seconds_bucket{{{labels},le="0.025"}} 2' in lines
+    assert f'tool_duration_seconds_bucket{{{labels},le="+Inf"}} 2' in lines
+    assert f"tool_duration_seconds_count{{{labels}}} 2" in lines
+    sums = [line for line in lines if line.startswith(f"tool_duration_seconds_sum{{{labels}}}")]
+    assert float(sums[0].split()[-1]) == pytest.approx(0.023)
+    assert 'tool_duration_seconds_bucket{server="other",tool="add",le="10.0"} 0' in lines
+    assert 'tool_duration_seconds_bucket{server="other",tool="add",le="+Inf"} 1' in lines
+
+    assert "# TYPE tool_errors_total counter" in lines
+    assert f"tool_errors_total{{{labels}}} 1" in lines
+    assert 'tool_errors_total{server="other",tool="add"} 0' in lines
+    # One bucket line per bound plus +Inf for each series
+    buckets = [line for line in lines if line.startswith("tool_duration_seconds_bucket")]
+    assert len(buckets) == 2 * (len(BUCKETS) + 1)
+
+def test_instrument_records_errors_and_keeps_signature():
+    registry = MetricsRegistry()
+
+    @registry.instrument_tool("math")
+    async def divide(a: float, b: float) -> float:
+        return a / b
+
+    assert list(inspect.signature(divide).parameters) == ["a", "b"]
+    assert asyncio.run(divide(1, 2)) == 0.5
+    with pytest.raises(ZeroDivisionError):
+        asyncio.run(divide(1, 0))
+    [snapshot] = registry.snapshot().histograms
+    assert snapshot.labels == {"server": "math", "tool": "divide"}
+    assert (snapshot.count, snapshot.errors) == (2, 1)
+
+def test_disabled_registry_records_nothing():
+    registry = MetricsRegistry(enabled=False)
+
+    async def tool() -> None:
+        pass
+
+    assert registry.instrument("tool_duration_seconds")(tool) is tool
+    with registry.span("tool_duration_seconds", tool="add"):
+        pass
+    registry.record("tool_duration_seconds", 1.0)
+    assert registry.snapshot().histograms == []
+    assert registry.render_prometheus() == "\n"
@@ -0,0 +1,14 @@
+"""Prefetch rules against the agent's system prompt"""
+
+from agent import SYSTEM_PROMPT
+from prefetch import RULES, classify
+
+
+def test_rules_use_tools_the_prompt_asks_for():
+    # A rule guessing a tool the prompt steers the model away from would only waste calls
+    for tool, _, _ in RULES:
+        assert tool in SYSTEM_PROMPT
+
+def test_weather_goes_to_the_weather_tool():
+    assert classify("What's the weather in Paris?") == ("get_weather", {"location": "Paris"})
+    assert "get_weather tool" in SYSTEM_PROMPT
@@ -0,0 +1,64 @@
+"""Failover of tool calls between replicas of a server"""
+
+import asyncio
+import pathlib
+import sys
+
+from mcpclient import ReplicaSet
+
+FAULTY_SERVER = pathlib.Path(__file__).resolve().parent.parent / "benchmarks" / "faulty_server.py"
+
+def replica() -> dict:
+    return {"command": sys.executable, "args": [str(FAULTY_SERVER)], "transport": "stdio"}
+
+def test_call_fails_over_when_replica_dies_mid_call():
+    async def run():
+        replicas = ReplicaSet("faulty", [replica(), replica()], health_interval=0, stop_grace=1.0)
+        try:
+            # Connect both, so the call isn't slowed down by a start
+            for server in replicas.replicas:
+                await server.session()
+            call = asyncio.ensure_future(replicas.call_tool("hang", {"seconds": 1}))
+            while not any(server.handle.calls for server in replicas.replicas):
+                await asyncio.sleep(0.01)
+            serving = next(
+                index for index, server in enumerate(replicas.replicas) if server.handle.calls
+            )
+            await asyncio.sleep(0.2)
+            replicas.replicas[serving].handle.process.kill()
+
+            result = await asyncio.wait_for(call, 30)
+            assert not result.isError
+            assert result.content[0].text == "Slept 1.0s"
+            assert replicas.healthy[serving] is False
+            assert replicas.healthy[1 - serving] is True
+        finally:
+            await replicas.stop()
+
+    asyncio.run(run())
+
+def test_tool_errors_keep_replicas_healthy():
+    async def run():
+        replicas = ReplicaSet("faulty", [replica(), replica()], health_interval=0, stop_grace=1.0)
+        try:
+            result = await replicas.call_tool("no_such_tool", {})
+            assert result.isError
+            assert all(replicas.healthy)
+        finally:
+            await replicas.stop()
+
+    asyncio.run(run())
+
+def test_call_skips_replica_that_cannot_start():
+    async def run():
+        broken = {**replica(), "args": [str(FAULTY_SERVER.with_name("no_such_server.py"))]}
+        replicas = ReplicaSet("faulty", [broken, replica()], health_interval=0, stop_grace=1.0)
+        try:
+            for _ in range(3):
+                result = await replicas.call_tool("echo", {"text": "hi"})
+                assert result.content[0].text == "hi"
+            assert replicas.healthy == [False, True]
+        finally:
+            await replicas.stop()
+
+    asyncio.run(run())
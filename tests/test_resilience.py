@@ -0,0 +1,189 @@
+"""Rate limiting, adaptive concurrency and circuit breaking of upstream requests"""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from mcpserver import resilience
+from mcpserver.resilience import (
+    AdaptiveConcurrency,
+    CircuitBreaker,
+    CircuitOpenError,
+    ResilienceConfig,
+    TokenBucket,
+    UpstreamGuard,
+)
+
+
+class Clock:
+    """Stands in for the time module in mcpserver.resilience"""
+
+    def __init__(self):
+        self.now = 1_000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilience, "time", clock)
+    return clock
+
+def status_error(status: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("GET", "https://api.example.com/search")
+    response = httpx.Response(status, request=request)
+    return httpx.HTTPStatusError(f"HTTP {status}", request=request, response=response)
+
+def test_token_bucket_allows_bursts_then_rate():
+    bucket = TokenBucket(rate=50, burst=5)
+
+    async def acquire(count: int) -> float:
+        started = time.monotonic()
+        for _ in range(count):
+            await bucket.acquire()
+        return time.monotonic() - started
+
+    async def run():
+        assert await acquire(5) < 0.05
+        # Five more tokens at 50 per second
+        assert 0.08 <= await acquire(5) < 0.5
+
+    asyncio.run(run())
+
+def test_token_bucket_hold():
+    bucket = TokenBucket(rate=0)
+
+    async def run():
+        started = time.monotonic()
+        await bucket.acquire()
+        assert time.monotonic() - started < 0.05
+        bucket.hold(0.1)
+        await bucket.acquire()
+        assert time.monotonic() - started >= 0.1
+
+    asyncio.run(run())
+
+def test_concurrency_increases_additively_and_halves_once_per_burst(clock):
+    concurrency = AdaptiveConcurrency(max_limit=8)
+    concurrency.on_overload()
+    assert concurrency.limit == 4
+    # Errors from the same burst were sent at the old limit
+    concurrency.on_overload()
+    assert concurrency.limit == 4
+    for _ in range(4):
+        concurrency.on_success()
+    assert 4.9 < concurrency.limit < 5
+    concurrency.on_success()
+    assert int(concurrency.limit) == 5
+
+    for _ in range(5):
+        clock.now += resilience.DECREASE_INTERVAL
+        concurrency.on_overload()
+    assert concurrency.limit == concurrency.min_limit
+    for _ in range(100):
+        concurrency.on_success()
+    assert concurrency.limit == concurrency.max_limit
+
+def test_concurrency_limit_blocks_requests():
+    concurrency = AdaptiveConcurrency(max_limit=1)
+    events = []
+
+    async def request(name: str) -> None:
+        async with concurrency:
+            events.append(f"{name} started")
+            await asyncio.sleep(0.02)
+            events.append(f"{name} done")
+
+    async def run():
+        await asyncio.gather(request("a"), request("b"))
+
+    asyncio.run(run())
+    assert events == ["a started", "a done", "b started", "b done"]
+    assert concurrency.in_flight == 0
+
+def test_circuit_opens_half_opens_and_closes(clock):
+    breaker = CircuitBreaker(threshold=3, reset_timeout=30)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError, match="retry in 30s"):
+        breaker.before_call()
+
+    # One probe once the reset timeout has passed; a failed probe opens it again
+    clock.now += 30
+    breaker.before_call()
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpenError, match="probe"):
+        breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock.now += 30
+    breaker.before_call()
+    breaker.record_success()
+    assert (breaker.state, breaker.failures) == ("closed", 0)
+    breaker.before_call()
+
+def test_lost_probe_expires(clock):
+    breaker = CircuitBreaker(threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    clock.now += 10
+    # e.g. the probe request was cancelled and never reported back
+    breaker.before_call()
+    clock.now += 5
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    clock.now += 5
+    breaker.before_call()
+    assert breaker.state == "half_open"
+
+def test_breaker_disabled_with_zero_threshold():
+    breaker = CircuitBreaker(threshold=0, reset_timeout=10)
+    for _ in range(10):
+        breaker.record_failure()
+        breaker.before_call()
+    assert breaker.state == "closed"
+
+def test_guard_opens_circuit_on_outages_not_throttling():
+    guard = UpstreamGuard(ResilienceConfig(retries=0, breaker_threshold=2))
+
+    async def send(status: int):
+        raise status_error(status)
+
+    async def run():
+        for _ in range(3):
+            with pytest.raises(httpx.HTTPStatusError):
+                await guard.request(lambda: send(429))
+        assert guard.breaker.state == "closed"
+        for _ in range(2):
+            with pytest.raises(httpx.HTTPStatusError):
+                await guard.request(lambda: send(503))
+        with pytest.raises(CircuitOpenError):
+            await guard.request(lambda: send(503))
+
+    asyncio.run(run())
+    stats = guard.snapshot()
+    assert (stats.circuit, stats.requests, stats.rate_limited, stats.rejected) == ("open", 5, 3, 1)
+    assert stats.concurrency_limit < 20
+
+def test_guard_bad_request_not_retried():
+    guard = UpstreamGuard(ResilienceConfig(retries=3, breaker_threshold=1))
+    calls = []
+
+    async def send():
+        calls.append(1)
+        raise status_error(400)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(guard.request(send))
+    assert len(calls) == 1
+    assert guard.breaker.state == "closed"
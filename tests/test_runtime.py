@@ -0,0 +1,20 @@
+"""Hooks of the server runtime into the mcp library"""
+
+import pytest
+from mcp.server.fastmcp import FastMCP
+
+from mcpserver.runtime import CallTracker
+
+
+def test_call_tracker_wraps_server():
+    mcp = FastMCP("Test")
+    calls = CallTracker(mcp)
+    assert calls.in_flight == 0
+    assert mcp._mcp_server._handle_request.__name__ == "counted"
+
+def test_call_tracker_fails_without_hooks():
+    mcp = FastMCP("Test")
+    # As in mcp 2.x, where the handlers moved
+    del mcp._mcp_server.request_handlers
+    with pytest.raises(RuntimeError, match="install mcp>=1.10,<2"):
+        CallTracker(mcp)
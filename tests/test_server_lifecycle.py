@@ -0,0 +1,81 @@
+"""Stopping, recycling and restarting managed MCP servers"""
+
+import asyncio
+import pathlib
+import sys
+import time
+
+import pytest
+
+from mcpclient import ManagedServer, ServerHandle
+
+FAULTY_SERVER = pathlib.Path(__file__).resolve().parent.parent / "benchmarks" / "faulty_server.py"
+
+def connection(**env: str) -> dict:
+    return {
+        "command": sys.executable,
+        "args": [str(FAULTY_SERVER)],
+        "transport": "stdio",
+        "env": env,
+    }
+
+def test_graceful_stop_closes_input_before_signalling():
+    async def run():
+        # A server that ignores SIGTERM is only stopped quickly if it isn't signalled first
+        server = ManagedServer("faulty", connection(FAULTY_IGNORE_SIGTERM="1"), stop_grace=5.0)
+        await server.call_tool("echo", {"text": "hi"})
+        process = server.handle.process
+        started = time.perf_counter()
+        await server.stop()
+        assert time.perf_counter() - started < 4
+        assert process.returncode == 0
+
+    asyncio.run(run())
+
+def test_graceful_stop_kills_hung_server_after_grace():
+    async def run():
+        server = ManagedServer("faulty", connection(FAULTY_IGNORE_SIGTERM="1"), stop_grace=0.5)
+        await server.call_tool("echo", {"text": "hi"})
+        process = server.handle.process
+        hung = asyncio.ensure_future(server.call_tool("hang", {"seconds": 30}))
+        await asyncio.sleep(0.3)
+        started = time.perf_counter()
+        await server.stop()
+        assert time.perf_counter() - started < 10
+        assert process.returncode is not None and process.returncode < 0
+        hung.cancel()
+        await asyncio.gather(hung, return_exceptions=True)
+
+    asyncio.run(run())
+
+def test_wait_idle_follows_calls():
+    async def run():
+        handle = ServerHandle("faulty", {})
+        await asyncio.wait_for(handle.wait_idle(), 1)
+        handle.begin_call()
+        handle.begin_call()
+        waiting = asyncio.ensure_future(handle.wait_idle())
+        handle.end_call()
+        await asyncio.sleep(0)
+        assert not waiting.done()
+        handle.end_call()
+        await asyncio.wait_for(waiting, 1)
+
+    asyncio.run(run())
+
+def test_restart_gives_up_after_attempts():
+    async def run():
+        broken = {**connection(), "args": [str(FAULTY_SERVER.with_name("no_such_server.py"))]}
+        server = ManagedServer("broken", broken, stop_grace=0.5)
+        delays = []
+
+        def backoff(attempt: int) -> float:
+            delays.append(attempt)
+            return 0.0
+
+        with pytest.raises(Exception):
+            await server.restart(backoff, attempts=3)
+        assert delays == [0, 1, 2]
+        assert server.handle is None
+
+    asyncio.run(run())
@@ -0,0 +1,153 @@
+"""Health checks, restarts and recycling by ServerSupervisor, with fake servers"""
+
+import asyncio
+import os
+from typing import List, Optional
+
+import pytest
+
+import supervisor
+from supervisor import ServerSupervisor, SupervisorConfig
+
+
+class FakeProcess:
+    def __init__(self):
+        self.pid = os.getpid()
+        self.returncode: Optional[int] = None
+
+class FakeSession:
+    def __init__(self):
+        # Seconds a ping takes, or an exception it raises
+        self.ping: object = 0.0
+
+    async def send_ping(self) -> None:
+        if isinstance(self.ping, Exception):
+            raise self.ping
+        await asyncio.sleep(self.ping)
+
+class FakeHandle:
+    def __init__(self):
+        self.process = FakeProcess()
+        self.session = FakeSession()
+        self.alive = True
+
+    @property
+    def exited(self) -> bool:
+        return self.process.returncode is not None
+
+class FakeServer:
+    """Stands in for a ManagedServer: restart and recycle replace the handle"""
+
+    def __init__(self):
+        self.handle: Optional[FakeHandle] = FakeHandle()
+        self.restart_error: Optional[Exception] = None
+        self.backoffs: List[float] = []
+        self.drains: List[float] = []
+
+    async def restart(self, backoff, attempts: int) -> None:
+        self.backoffs.append(backoff(0))
+        if self.restart_error is not None:
+            self.handle = None
+            raise self.restart_error
+        self.handle = FakeHandle()
+
+    async def recycle(self, drain: float) -> bool:
+        self.drains.append(drain)
+        self.handle = FakeHandle()
+        return True
+
+def supervise(**settings):
+    server = FakeServer()
+    config = SupervisorConfig(latency_threshold=0.05, failures=3, **settings)
+    return ServerSupervisor({"math": server}, config), server
+
+def test_healthy_server():
+    watcher, server = supervise()
+    asyncio.run(watcher.check("math", server))
+    stats = watcher.stats["math"]
+    assert (stats.state, stats.pid, stats.failed_checks) == ("healthy", os.getpid(), 0)
+    assert stats.ping_ms is not None
+    assert server.backoffs == []
+
+def test_restart_after_failed_checks():
+    watcher, server = supervise()
+    server.handle.session.ping = RuntimeError("connection reset")
+
+    async def run():
+        for _ in range(2):
+            await watcher.check("math", server)
+            assert watcher.stats["math"].state == "unhealthy"
+        # Too slow counts as failed too
+        server.handle.session.ping = 1.0
+        await watcher.check("math", server)
+
+    asyncio.run(run())
+    stats = watcher.stats["math"]
+    assert (stats.state, stats.failed_checks, stats.restarts) == ("healthy", 0, 1)
+    # No backoff for the first restart in a while
+    assert server.backoffs == [0.0]
+
+def test_passing_check_resets_failures():
+    watcher, server = supervise()
+
+    async def run():
+        failure = RuntimeError("timeout")
+        for ping in (failure, failure, 0.0, failure):
+            server.handle.session.ping = ping
+            await watcher.check("math", server)
+
+    asyncio.run(run())
+    assert watcher.stats["math"].failed_checks == 1
+    assert server.backoffs == []
+
+def test_exited_server_restarted_at_once():
+    watcher, server = supervise()
+    server.handle.process.returncode = 1
+
+    async def run():
+        await watcher.check("math", server)
+        # Restarted again before a check passed: backoff
+        server.handle.process.returncode = 1
+        await watcher.check("math", server)
+        await watcher.check("math", server)
+        server.handle.process.returncode = 1
+        await watcher.check("math", server)
+
+    asyncio.run(run())
+    assert watcher.stats["math"].restarts == 3
+    assert server.backoffs[0] == 0.0
+    assert server.backoffs[1] > 0.0
+    # A passing check in between resets the backoff
+    assert server.backoffs[2] == 0.0
+
+def test_failed_restart_leaves_server_failed():
+    watcher, server = supervise()
+    server.handle.process.returncode = 1
+    server.restart_error = RuntimeError("command not found")
+
+    async def run():
+        await watcher.check("math", server)
+        assert watcher.stats["math"].state == "failed"
+        await watcher.check("math", server)
+
+    asyncio.run(run())
+    stats = watcher.stats["math"]
+    assert (stats.state, stats.pid, stats.restarts) == ("failed", None, 0)
+
+def test_servers_not_started_left_alone():
+    watcher, server = supervise()
+    server.handle = None
+    asyncio.run(watcher.check("math", server))
+    assert watcher.stats["math"].state == "stopped"
+    assert server.backoffs == []
+
+@pytest.mark.parametrize("rss_mb, recycled", [(50, False), (200, True)])
+def test_recycle_over_memory_limit(monkeypatch, rss_mb, recycled):
+    watcher, server = supervise(max_rss_mb=100, drain=7)
+    monkeypatch.setattr(supervisor, "process_usage", lambda pid: (rss_mb * 2**20, 1.0))
+    asyncio.run(watcher.check("math", server))
+    stats = watcher.stats["math"]
+    assert stats.rss_mb == rss_mb
+    assert stats.recycles == int(recycled)
+    assert server.drains == ([7] if recycled else [])
+    assert stats.restarts == 0
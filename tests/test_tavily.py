@@ -0,0 +1,76 @@
+"""Shaping of Tavily results to a token budget"""
+
+from mcpserver.tavily import (
+    BatchSearchResponse,
+    QuerySearchResult,
+    SearchResponse,
+    SearchResult,
+    shape_batch,
+    shape_response,
+)
+
+
+def results(query: str, count: int = 5) -> list:
+    sentence = f"This sentence is about {query} and goes on for a while to take up some space."
+    return [
+        SearchResult(
+            title=f"{query} {index}",
+            url=f"https://example.com/{query}/{index}",
+            content=" ".join([sentence] * 20),
+        )
+        for index in range(count)
+    ]
+
+def batch_of(queries: list) -> BatchSearchResponse:
+    return BatchSearchResponse(
+        searches=[QuerySearchResult(query=query, results=results(query)) for query in queries]
+    )
+
+def distinct_results(query: str, count: int = 5) -> list:
+    """Results no two of which are near-duplicates"""
+    vocabulary = "alpha bravo charlie delta echo foxtrot golf hotel india juliet kilo lima".split()
+    shaped = []
+    for index in range(count):
+        words = vocabulary[index:] + vocabulary[:index]
+        sentence = f"The {query} report {' '.join(words)} ends here."
+        shaped.append(SearchResult(
+            title=f"{query} {index}",
+            url=f"https://example.com/{index}",
+            content=" ".join([sentence] * 10),
+        ))
+    return shaped
+
+def test_batch_budget_smaller_than_query_count_still_shapes():
+    shaped = shape_batch(batch_of([f"topic{index}" for index in range(5)]), max_tokens=4)
+    assert shaped.shaping.bytes_saved > 0
+    assert shaped.shaping.returned_bytes < shaped.shaping.original_bytes // 10
+
+def test_batch_budget_zero_returns_full_results():
+    shaped = shape_batch(batch_of(["topic"]), max_tokens=0)
+    assert shaped.shaping.bytes_saved == 0
+
+def test_shaping_keeps_stale_flag():
+    response = SearchResponse(results=results("topic"), stale=True)
+    shaped = shape_response("topic", response, max_tokens=50)
+    assert shaped.stale
+    assert shaped.shaping.bytes_saved > 0
+
+def test_tiny_budget_keeps_top_result():
+    response = SearchResponse(results=distinct_results("topic"))
+    shaped = shape_response("topic", response, max_tokens=1)
+    assert shaped.shaping.near_duplicates_removed == 0
+    assert [result.title for result in shaped.results] == ["topic 0"]
+    assert shaped.shaping.results_dropped == 4
+
+def test_budget_for_titles_only_truncates_top_result():
+    top = results("topic")[0]
+    budget_chars = len(top.title) + len(top.url) + 40 + 30
+    response = SearchResponse(results=results("topic"))
+    shaped = shape_response("topic", response, max_tokens=budget_chars // 4)
+    assert len(shaped.results) == 1
+    assert shaped.results[0].content.endswith("…")
+    assert 0 < len(shaped.results[0].content) <= 30
+
+def test_batch_keeps_a_result_per_query():
+    shaped = shape_batch(batch_of([f"topic{index}" for index in range(5)]), max_tokens=4)
+    assert [len(search.results) for search in shaped.searches] == [1] * 5